@@ -0,0 +1,74 @@
+"""
+Aho-Corasick multi-pattern matcher.
+Finds every occurrence of many patterns (product names, SKUs) in one linear pass over a text.
+"""
+
+from collections import deque
+from typing import Dict, Hashable, Iterable, Iterator, List, Tuple
+
+
+class AhoCorasick:
+    """
+    Automaton over a fixed set of patterns, each carrying a payload.
+
+    Build cost is linear in the total pattern length; a search is linear in
+    the text length plus the number of matches, independent of how many
+    patterns there are.
+    """
+
+    def __init__(self, patterns: Iterable[Tuple[str, Hashable]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Hashable]] = [[]]
+        # Nearest node on the fail chain that has outputs (-1 if none)
+        self._output_link: List[int] = [-1]
+        self.pattern_count = 0
+
+        for pattern, payload in patterns:
+            if pattern:
+                self._add(pattern, payload)
+        self._link()
+
+    def _add(self, pattern: str, payload: Hashable) -> None:
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._output_link.append(-1)
+                self._goto[node][ch] = nxt
+            node = nxt
+        self._output[node].append(payload)
+        self.pattern_count += 1
+
+    def _link(self) -> None:
+        """Breadth-first construction of failure and output links."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                link = self._fail[child]
+                self._output_link[child] = link if self._output[link] else self._output_link[link]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, Hashable]]:
+        """Yield (end_index, payload) for every pattern occurrence in ``text``."""
+        goto, fail, output, output_link = self._goto, self._fail, self._output, self._output_link
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            hit = node if output[node] else output_link[node]
+            while hit > 0:
+                for payload in output[hit]:
+                    yield i, payload
+                hit = output_link[hit]
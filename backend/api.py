@@ -1,8 +1,16 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, AsyncIterator, Literal, Tuple
 from uuid import uuid4
+import asyncio
+import functools
+import hashlib
+import hmac
+import json
+import os
 import time
 import logging
 from dotenv import load_dotenv
@@ -15,10 +23,28 @@ from main import (
     promoselect_agent,
     suitup_agent,
     create_initial_context,
+    history_compactor,
+    PromoProAgentContext,
+    slot_extractor,
+    use_file_search_tools,
 )
+from tools import (
+    CATALOG_WATCHER,
+    SEARCH_EXECUTOR,
+    WARMUP_DONE,
+    WARMUP_STATUS,
+    card_text,
+    cards_from_output,
+    current_catalogs,
+    expand_image_handles,
+    start_warmup,
+)
+from conversation_store import ConversationStore, TieredConversationStore
+from guardrail_cache import normalize_message
 
 from agents import (
     Runner,
+    RunResultStreaming,
     ItemHelpers,
     MessageOutputItem,
     HandoffOutputItem,
@@ -26,13 +52,37 @@ from agents import (
     ToolCallOutputItem,
     InputGuardrailTripwireTriggered,
     Handoff,
+    RawResponsesStreamEvent,
+    RunItemStreamEvent,
+    AgentUpdatedStreamEvent,
+    RunContextWrapper,
 )
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+async def _warm_up() -> None:
+    """Load catalogs and indexes off the event loop; search tools degrade until each stage is ready."""
+    start_warmup()
+    # Polled rather than awaited on a thread so shutdown never waits for a slow warmup
+    while not WARMUP_DONE.is_set():
+        await asyncio.sleep(0.1)
+    if use_file_search_tools():
+        logger.info("Agents given vector store search alongside the local search tools")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warmup = asyncio.create_task(_warm_up())
+    yield
+    warmup.cancel()
+    CATALOG_WATCHER.stop()
+    SEARCH_EXECUTOR.shutdown()
+    # Flush pending conversation writes before the worker exits
+    logger.info(f"Conversation store stats: {conversation_store.stats()}")
+    conversation_store.close()
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS configuration (adjust as needed for deployment)
 app.add_middleware(
@@ -47,13 +97,21 @@ app.add_middleware(
 # Models
 # =========================
 
+class ChatAction(BaseModel):
+    """Structured UI action, routed without asking the triage model."""
+    type: Literal["select_business_unit"]
+    value: Literal["promoselect", "suitup"]
+
 class ChatRequest(BaseModel):
     conversation_id: Optional[str] = None
-    message: str
+    message: str = ""
+    action: Optional[ChatAction] = None
 
 class MessageResponse(BaseModel):
     content: str
     agent: str
+    type: str = "text"  # "text" or "card" (a product/kit card from a search tool)
+    card: Optional[Dict[str, Any]] = None
 
 class AgentEvent(BaseModel):
     id: str
@@ -70,6 +128,7 @@ class GuardrailCheck(BaseModel):
     reasoning: str
     passed: bool
     timestamp: float
+    tier: Optional[str] = None  # which tier decided: fast_path, cache, local or llm
 
 class ChatResponse(BaseModel):
     conversation_id: str
@@ -81,27 +140,22 @@ class ChatResponse(BaseModel):
     guardrails: List[GuardrailCheck] = []
 
 # =========================
-# In-memory store for conversation state
+# Conversation state store
 # =========================
 
-class ConversationStore:
-    def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
-        pass
-
-    def save(self, conversation_id: str, state: Dict[str, Any]):
-        pass
-
-class InMemoryConversationStore(ConversationStore):
-    _conversations: Dict[str, Dict[str, Any]] = {}
-
-    def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
-        return self._conversations.get(conversation_id)
-
-    def save(self, conversation_id: str, state: Dict[str, Any]):
-        self._conversations[conversation_id] = state
+CONVERSATION_DB_PATH = os.getenv(
+    "CONVERSATION_DB_PATH", os.path.join(os.path.dirname(__file__), "conversations.db")
+)
 
-# TODO: when deploying this app in scale, switch to your own production-ready implementation
-conversation_store = InMemoryConversationStore()
+conversation_store: ConversationStore = TieredConversationStore(
+    CONVERSATION_DB_PATH,
+    context_type=PromoProAgentContext,
+    max_conversations=int(os.getenv("CONVERSATION_CACHE_MAX_SIZE", "10000")),
+    ttl_seconds=float(os.getenv("CONVERSATION_CACHE_TTL_SECONDS", "1800")),
+    flush_interval=float(os.getenv("CONVERSATION_FLUSH_INTERVAL_SECONDS", "0.5")),
+    batch_size=int(os.getenv("CONVERSATION_FLUSH_BATCH_SIZE", "256")),
+    snapshot_every=int(os.getenv("CONVERSATION_SNAPSHOT_EVERY", "20")),
+)
 
 # =========================
 # Helpers
@@ -129,21 +183,6 @@ def _get_guardrail_name(g) -> str:
         return fn_name.replace("_", " ").title()
     return str(g)
 
-def _parse_separate_messages(text: str) -> List[str]:
-    """Parse formatted tool result and extract individual messages."""
-    messages = []
-    lines = text.split('\n')
-    
-    for line in lines:
-        # Look for message patterns (MENSAJE 1A:, MENSAJE 1B:, etc.)
-        if line.strip().startswith('MENSAJE ') and ':' in line:
-            # Extract the message content after the colon
-            message_content = line.split(':', 1)[1].strip()
-            if message_content:
-                messages.append(message_content)
-    
-    return messages
-
 def _build_agents_list() -> List[Dict[str, Any]]:
     """Build a list of all available agents and their metadata."""
     def make_agent_dict(agent):
@@ -160,213 +199,591 @@ def _build_agents_list() -> List[Dict[str, Any]]:
         make_agent_dict(suitup_agent),
     ]
 
+def _handoff_events(from_agent: Any, to_agent: Any, ho: Optional[Handoff] = None) -> List[AgentEvent]:
+    """Events for a handoff (``ho``, by default the source agent's handoff to the target)."""
+    events = [
+        AgentEvent(
+            id=uuid4().hex,
+            type="handoff",
+            agent=from_agent.name,
+            content=f"{from_agent.name} -> {to_agent.name}",
+            metadata={"source_agent": from_agent.name, "target_agent": to_agent.name},
+        )
+    ]
+    # If there is an on_handoff callback defined for this handoff, show it as a tool call
+    ho = ho or _find_handoff(from_agent, to_agent)
+    if ho:
+        fn = ho.on_invoke_handoff
+        # Newer SDKs wrap the handoff function in a partial (error redaction)
+        while isinstance(fn, functools.partial):
+            fn = next((arg for arg in fn.args if callable(arg)), fn.func)
+        fv = getattr(getattr(fn, "__code__", None), "co_freevars", ())
+        cl = getattr(fn, "__closure__", None) or []
+        if "on_handoff" in fv:
+            idx = fv.index("on_handoff")
+            if idx < len(cl) and cl[idx].cell_contents:
+                cb = cl[idx].cell_contents
+                cb_name = getattr(cb, "__name__", repr(cb))
+                events.append(
+                    AgentEvent(
+                        id=uuid4().hex,
+                        type="tool_call",
+                        agent=to_agent.name,
+                        content=cb_name,
+                    )
+                )
+    return events
+
+def _find_handoff(from_agent: Any, to_agent: Any) -> Optional[Handoff]:
+    """The Handoff object on the source agent matching the target."""
+    return next(
+        (h for h in getattr(from_agent, "handoffs", [])
+         if isinstance(h, Handoff) and getattr(h, "agent_name", None) == to_agent.name),
+        None,
+    )
+
+def _events_for_item(item: Any) -> Tuple[List[MessageResponse], List[AgentEvent]]:
+    """
+    Convert one run item into the chat messages and agent events it produces.
+    Image handles the model saw (img:...) are expanded to URLs here.
+    """
+    messages: List[MessageResponse] = []
+    events: List[AgentEvent] = []
+
+    if isinstance(item, MessageOutputItem):
+        text = expand_image_handles(ItemHelpers.text_message_output(item))
+        messages.append(MessageResponse(content=text, agent=item.agent.name))
+        events.append(AgentEvent(id=uuid4().hex, type="message", agent=item.agent.name, content=text))
+    # Handle handoff output
+    elif isinstance(item, HandoffOutputItem):
+        events.extend(_handoff_events(item.source_agent, item.target_agent))
+    elif isinstance(item, ToolCallItem):
+        tool_name = getattr(item.raw_item, "name", None)
+        raw_args = getattr(item.raw_item, "arguments", None)
+        tool_args: Any = raw_args
+        if isinstance(raw_args, str):
+            try:
+                tool_args = json.loads(raw_args)
+            except Exception:
+                pass
+        events.append(
+            AgentEvent(
+                id=uuid4().hex,
+                type="tool_call",
+                agent=item.agent.name,
+                content=tool_name or "",
+                metadata={"tool_args": tool_args},
+            )
+        )
+        # If the tool is display_business_selector, send a special message so the UI can render the business selector.
+        if tool_name == "display_business_selector":
+            messages.append(
+                MessageResponse(
+                    content="DISPLAY_BUSINESS_SELECTOR",
+                    agent=item.agent.name,
+                )
+            )
+    elif isinstance(item, ToolCallOutputItem):
+        output = expand_image_handles(item.output)
+        events.append(
+            AgentEvent(
+                id=uuid4().hex,
+                type="tool_output",
+                agent=item.agent.name,
+                content=str(output),
+                metadata={"tool_result": output},
+            )
+        )
+        # Search results go to the UI as cards straight from the tool, not re-typed by the model
+        for card in cards_from_output(output):
+            messages.append(MessageResponse(content=card_text(card), agent=item.agent.name, type="card", card=card))
+            events.append(
+                AgentEvent(id=uuid4().hex, type="card", agent=item.agent.name, content=card_text(card), metadata={"card": card})
+            )
+
+    return messages, events
+
+def _guardrail_check(guardrail: Any, message: str, output_info: Any = None, passed: bool = True) -> GuardrailCheck:
+    """Build the GuardrailCheck shown in the UI; reasoning is only surfaced for failures."""
+    return GuardrailCheck(
+        id=uuid4().hex,
+        name=_get_guardrail_name(guardrail),
+        input=message,
+        reasoning=("" if passed else getattr(output_info, "reasoning", "")),
+        passed=passed,
+        timestamp=time.time() * 1000,
+        tier=getattr(output_info, "tier", None),
+    )
+
+def _context_changes(old_context: Dict[str, Any], new_context: Dict[str, Any]) -> Dict[str, Any]:
+    """Context fields whose value changed during a turn."""
+    return {k: new_context[k] for k in new_context if old_context.get(k) != new_context[k]}
+
+def _new_guardrail_checks(result: RunResultStreaming, emitted: Dict[str, GuardrailCheck], message: str) -> List[GuardrailCheck]:
+    """Checks for guardrail results that completed since the last call."""
+    checks: List[GuardrailCheck] = []
+    for r in getattr(result, "input_guardrail_results", []):
+        name = _get_guardrail_name(r.guardrail)
+        if name not in emitted and not r.output.tripwire_triggered:
+            emitted[name] = _guardrail_check(r.guardrail, message, r.output.output_info)
+            checks.append(emitted[name])
+    return checks
+
 # =========================
-# Main Chat Endpoint
+# Business unit fast path
 # =========================
 
-@app.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(req: ChatRequest):
+_BUSINESS_UNIT_AGENTS = {"promoselect": promoselect_agent, "suitup": suitup_agent}
+_BUSINESS_UNIT_LABELS = {"promoselect": "Promoselect", "suitup": "SuitUp"}
+
+# Selector button texts sent as plain messages (older clients), by normalized message
+_BUSINESS_UNIT_MESSAGES = {"promoselect": "promoselect", "suitup": "suitup", "suit up": "suitup"}
+
+def _selected_business_unit(req: ChatRequest, current_agent: Any) -> Optional[str]:
+    """Business unit chosen by this request, if it is a selector choice."""
+    if req.action is not None and req.action.type == "select_business_unit":
+        return req.action.value
+    # A bare unit name typed to the triage agent means the same thing as the button
+    if current_agent is triage_agent:
+        return _BUSINESS_UNIT_MESSAGES.get(normalize_message(req.message))
+    return None
+
+async def _route_business_unit(unit: str, context: Any, current_agent: Any) -> Tuple[Any, List[AgentEvent]]:
     """
-    Main chat endpoint for agent orchestration.
-    Handles conversation state, agent routing, and guardrail checks.
+    Apply the triage agent's handoff to ``unit`` without running the triage
+    model: the on_handoff hook updates the context and the specialist answers
+    the turn. Returns (specialist agent, handoff events).
     """
-    # Initialize or retrieve conversation state
-    is_new = not req.conversation_id or conversation_store.get(req.conversation_id) is None
-    if is_new:
+    target = _BUSINESS_UNIT_AGENTS[unit]
+    if current_agent is target:
+        return target, []
+    ho = _find_handoff(triage_agent, target)
+    if ho is not None:
+        await ho.on_invoke_handoff(RunContextWrapper(context=context), None)
+    logger.info(f"Routed business unit selection '{unit}' to {target.name} without triage")
+    return target, _handoff_events(current_agent, target, ho)
+
+# =========================
+# Turn pipeline (shared by /chat and /chat/stream)
+# =========================
+
+# Reply to a message rejected by an input guardrail
+GUARDRAIL_REFUSAL = (
+    "Lo siento, solo puedo ayudarte con productos promocionales, regalos corporativos "
+    "y kits de Promoselect y SuitUp. ¿Qué producto estás buscando?"
+)
+
+async def _execute_turn(req: ChatRequest, cancel: Optional[asyncio.Event] = None) -> AsyncIterator[Tuple[str, BaseModel]]:
+    """
+    Run one chat turn with the streamed runner and yield its events as they happen.
+    Setting ``cancel`` stops the run; only the user message is kept in the history.
+
+    Yields ``(kind, payload)`` pairs where kind is one of:
+        message_delta: AgentEvent with a chunk of model text (streaming only, not in the final response;
+            image handles are only expanded in the complete message)
+        message: MessageResponse (model text, or a result card from a search tool)
+        event: AgentEvent (message, handoff, tool_call, tool_output, context_update, or
+            guardrail_tripped: discard the text and messages streamed so far, the refusal follows)
+        guardrail: GuardrailCheck
+        done: the complete ChatResponse, always last
+    """
+    if req.action is not None and not req.message.strip():
+        # The history records the choice as the button's label
+        req = req.model_copy(update={"message": _BUSINESS_UNIT_LABELS[req.action.value]})
+
+    # Initialize or retrieve conversation state (a private copy: a failed or cancelled
+    # turn changes nothing in the store, append_turn commits it)
+    state: Optional[Dict[str, Any]] = conversation_store.get(req.conversation_id) if req.conversation_id else None
+    if state is None:
         conversation_id: str = uuid4().hex
-        ctx = create_initial_context()
+        ctx = create_initial_context(conversation_id)
         current_agent_name = triage_agent.name
-        state: Dict[str, Any] = {
+        state = {
             "input_items": [],
             "context": ctx,
             "current_agent": current_agent_name,
         }
         if req.message.strip() == "":
             conversation_store.save(conversation_id, state)
-            return ChatResponse(
+            yield "done", ChatResponse(
                 conversation_id=conversation_id,
                 current_agent=current_agent_name,
                 messages=[],
                 events=[],
-                context=ctx.dict(),
+                context=ctx.model_dump(),
                 agents=_build_agents_list(),
                 guardrails=[],
             )
+            return
     else:
         conversation_id = req.conversation_id  # type: ignore
-        state = conversation_store.get(conversation_id)
 
     current_agent = _get_agent_by_name(state["current_agent"])
+    history_length = len(state["input_items"])
     state["input_items"].append({"content": req.message, "role": "user"})
-    old_context = state["context"].dict().copy()
-    guardrail_checks: List[GuardrailCheck] = []
+    # Also restored when a guardrail rejects the message, undoing its routing and slots
+    old_context = state["context"].model_dump()
+    # The agents see a token-budgeted view of the history; the full history stays in the store
+    previous_summary = state.get("history_summary")
+    run_input, summary = await history_compactor.compact(state["input_items"], previous_summary)
+    updates = {"history_summary": summary} if summary is not previous_summary else None
+    if updates:
+        state.update(updates)
+    emitted_guardrails: Dict[str, GuardrailCheck] = {}
+    messages: List[MessageResponse] = []
+    events: List[AgentEvent] = []
 
+    unit = _selected_business_unit(req, current_agent)
+    if unit is not None:
+        current_agent, handoff_events = await _route_business_unit(unit, state["context"], current_agent)
+        for event in handoff_events:
+            events.append(event)
+            yield "event", event
+    # Budget/product type stated in the message skip the agent's save_* tool round trips
+    slots = slot_extractor.fill(state["context"], req.message)
+    if slots:
+        logger.info(f"Filled slots locally for {conversation_id}: {slots}")
+    # Cards wait for the model's lead-in so the UI shows "intro, then results"
+    pending_cards: List[MessageResponse] = []
+
+    result = Runner.run_streamed(current_agent, run_input, context=state["context"])
+    # Agent whose model output is currently streaming (differs from current_agent mid-handoff)
+    speaking_agent = current_agent
+    cancelled = False
     try:
-        result = await Runner.run(current_agent, state["input_items"], context=state["context"])
+        async for stream_event in result.stream_events():
+            if cancel is not None and cancel.is_set():
+                # Superseded by a newer message: drop this run's partial output
+                logger.info(f"Cancelling superseded run for conversation {conversation_id}")
+                result.cancel()
+                cancelled = True
+                messages = []
+                break
+            if isinstance(stream_event, RawResponsesStreamEvent):
+                data = stream_event.data
+                if getattr(data, "type", None) == "response.output_text.delta" and data.delta:
+                    yield "message_delta", AgentEvent(
+                        id=uuid4().hex,
+                        type="message_delta",
+                        agent=speaking_agent.name,
+                        content=data.delta,
+                        metadata={"item_id": getattr(data, "item_id", None)},
+                    )
+            elif isinstance(stream_event, AgentUpdatedStreamEvent):
+                speaking_agent = stream_event.new_agent
+            elif isinstance(stream_event, RunItemStreamEvent):
+                item_messages, item_events = _events_for_item(stream_event.item)
+                for msg in item_messages:
+                    if msg.type == "card":
+                        pending_cards.append(msg)
+                        continue
+                    for ready in [msg] + pending_cards:
+                        messages.append(ready)
+                        yield "message", ready
+                    pending_cards = []
+                for event in item_events:
+                    events.append(event)
+                    yield "event", event
+                if isinstance(stream_event.item, HandoffOutputItem):
+                    current_agent = stream_event.item.target_agent
+            for check in _new_guardrail_checks(result, emitted_guardrails, req.message):
+                yield "guardrail", check
     except InputGuardrailTripwireTriggered as e:
         failed = e.guardrail_result.guardrail
         gr_output = e.guardrail_result.output.output_info
-        gr_reasoning = getattr(gr_output, "reasoning", "")
-        gr_input = req.message
-        gr_timestamp = time.time() * 1000
+        # Text, cards and tool events may already have streamed; tell the client to drop them
+        tripped = AgentEvent(
+            id=uuid4().hex,
+            type="guardrail_tripped",
+            agent=current_agent.name,
+            content=_get_guardrail_name(failed),
+            metadata={"guardrail": _get_guardrail_name(failed), "discard_draft": True},
+        )
+        events.append(tripped)
+        yield "event", tripped
         for g in current_agent.input_guardrails:
-            guardrail_checks.append(GuardrailCheck(
-                id=uuid4().hex,
-                name=_get_guardrail_name(g),
-                input=gr_input,
-                reasoning=(gr_reasoning if g == failed else ""),
-                passed=(g != failed),
-                timestamp=gr_timestamp,
-            ))
-        refusal = "Sorry, I can only answer questions related to airline travel."
+            name = _get_guardrail_name(g)
+            if g == failed:
+                emitted_guardrails[name] = _guardrail_check(g, req.message, gr_output, passed=False)
+            elif name in emitted_guardrails:
+                continue
+            else:
+                emitted_guardrails[name] = _guardrail_check(g, req.message)
+            yield "guardrail", emitted_guardrails[name]
+        refusal = GUARDRAIL_REFUSAL
         state["input_items"].append({"role": "assistant", "content": refusal})
-        return ChatResponse(
+        # A rejected message changes nothing: business unit, slots and budget go back
+        state["context"] = PromoProAgentContext.model_validate(old_context)
+        conversation_store.append_turn(conversation_id, state, state["input_items"][history_length:], {}, updates)
+        refusal_message = MessageResponse(content=refusal, agent=current_agent.name)
+        yield "message", refusal_message
+        yield "done", ChatResponse(
             conversation_id=conversation_id,
-            current_agent=current_agent.name,
-            messages=[MessageResponse(content=refusal, agent=current_agent.name)],
-            events=[],
+            current_agent=state["current_agent"],
+            messages=[refusal_message],
+            events=events,
             context=state["context"].model_dump(),
             agents=_build_agents_list(),
-            guardrails=guardrail_checks,
+            guardrails=[emitted_guardrails[_get_guardrail_name(g)] for g in current_agent.input_guardrails],
         )
-
-    messages: List[MessageResponse] = []
-    events: List[AgentEvent] = []
-
-    for item in result.new_items:
-        if isinstance(item, MessageOutputItem):
-            text = ItemHelpers.text_message_output(item)
-            
-            # Check if this is a tool result with special formatting instructions for separate messages
-            if "IMPORTANTE: Envía cada mensaje por separado" in text:
-                # Parse and split into separate messages
-                separate_messages = _parse_separate_messages(text)
-                for msg in separate_messages:
-                    if msg.strip():  # Only add non-empty messages
-                        messages.append(MessageResponse(content=msg.strip(), agent=item.agent.name))
-                        events.append(AgentEvent(id=uuid4().hex, type="message", agent=item.agent.name, content=msg.strip()))
-            else:
-                # Normal single message handling
-                messages.append(MessageResponse(content=text, agent=item.agent.name))
-                events.append(AgentEvent(id=uuid4().hex, type="message", agent=item.agent.name, content=text))
-        # Handle handoff output and agent switching
-        elif isinstance(item, HandoffOutputItem):
-            # Record the handoff event
-            events.append(
-                AgentEvent(
-                    id=uuid4().hex,
-                    type="handoff",
-                    agent=item.source_agent.name,
-                    content=f"{item.source_agent.name} -> {item.target_agent.name}",
-                    metadata={"source_agent": item.source_agent.name, "target_agent": item.target_agent.name},
-                )
-            )
-            # If there is an on_handoff callback defined for this handoff, show it as a tool call
-            from_agent = item.source_agent
-            to_agent = item.target_agent
-            # Find the Handoff object on the source agent matching the target
-            ho = next(
-                (h for h in getattr(from_agent, "handoffs", [])
-                 if isinstance(h, Handoff) and getattr(h, "agent_name", None) == to_agent.name),
-                None,
-            )
-            if ho:
-                fn = ho.on_invoke_handoff
-                fv = fn.__code__.co_freevars
-                cl = fn.__closure__ or []
-                if "on_handoff" in fv:
-                    idx = fv.index("on_handoff")
-                    if idx < len(cl) and cl[idx].cell_contents:
-                        cb = cl[idx].cell_contents
-                        cb_name = getattr(cb, "__name__", repr(cb))
-                        events.append(
-                            AgentEvent(
-                                id=uuid4().hex,
-                                type="tool_call",
-                                agent=to_agent.name,
-                                content=cb_name,
-                            )
-                        )
-            current_agent = item.target_agent
-        elif isinstance(item, ToolCallItem):
-            tool_name = getattr(item.raw_item, "name", None)
-            raw_args = getattr(item.raw_item, "arguments", None)
-            tool_args: Any = raw_args
-            if isinstance(raw_args, str):
-                try:
-                    import json
-                    tool_args = json.loads(raw_args)
-                except Exception:
-                    pass
-            events.append(
-                AgentEvent(
-                    id=uuid4().hex,
-                    type="tool_call",
-                    agent=item.agent.name,
-                    content=tool_name or "",
-                    metadata={"tool_args": tool_args},
-                )
-            )
-            # If the tool is display_business_selector, send a special message so the UI can render the business selector.
-            if tool_name == "display_business_selector":
-                messages.append(
-                    MessageResponse(
-                        content="DISPLAY_BUSINESS_SELECTOR",
-                        agent=item.agent.name,
-                    )
-                )
-        elif isinstance(item, ToolCallOutputItem):
-            events.append(
-                AgentEvent(
-                    id=uuid4().hex,
-                    type="tool_output",
-                    agent=item.agent.name,
-                    content=str(item.output),
-                    metadata={"tool_result": item.output},
-                )
-            )
-
-    new_context = state["context"].dict()
-    changes = {k: new_context[k] for k in new_context if old_context.get(k) != new_context[k]}
+        return
+    finally:
+        # Client went away (or the run failed): stop the background run
+        if not result.is_complete:
+            result.cancel()
+
+    if not cancelled:
+        # Results the model did not introduce (e.g. the run ended on the tool call)
+        for msg in pending_cards:
+            messages.append(msg)
+            yield "message", msg
+
+    changes = _context_changes(old_context, state["context"].model_dump())
     if changes:
-        events.append(
-            AgentEvent(
-                id=uuid4().hex,
-                type="context_update",
-                agent=current_agent.name,
-                content="",
-                metadata={"changes": changes},
-            )
+        event = AgentEvent(
+            id=uuid4().hex,
+            type="context_update",
+            agent=current_agent.name,
+            content="",
+            metadata={"changes": changes},
         )
+        events.append(event)
+        yield "event", event
 
-    state["input_items"] = result.to_input_list()
+    if not cancelled:
+        state["input_items"].extend(result.to_input_list()[len(run_input):])
     state["current_agent"] = current_agent.name
-    conversation_store.save(conversation_id, state)
+    # Only this turn's items and context diff are written, not the whole history
+    conversation_store.append_turn(conversation_id, state, state["input_items"][history_length:], changes, updates)
 
-    # Build guardrail results: mark failures (if any), and any others as passed
+    # Build guardrail results: report the current agent's guardrails, passed unless already failed
+    for check in _new_guardrail_checks(result, emitted_guardrails, req.message):
+        yield "guardrail", check
     final_guardrails: List[GuardrailCheck] = []
     for g in getattr(current_agent, "input_guardrails", []):
         name = _get_guardrail_name(g)
-        failed = next((gc for gc in guardrail_checks if gc.name == name), None)
-        if failed:
-            final_guardrails.append(failed)
-        else:
-            final_guardrails.append(GuardrailCheck(
-                id=uuid4().hex,
-                name=name,
-                input=req.message,
-                reasoning="",
-                passed=True,
-                timestamp=time.time() * 1000,
-            ))
-
-    return ChatResponse(
+        if name not in emitted_guardrails:
+            emitted_guardrails[name] = _guardrail_check(g, req.message)
+            yield "guardrail", emitted_guardrails[name]
+        final_guardrails.append(emitted_guardrails[name])
+
+    yield "done", ChatResponse(
         conversation_id=conversation_id,
         current_agent=current_agent.name,
         messages=messages,
         events=events,
-        context=state["context"].dict(),
+        context=state["context"].model_dump(),
         agents=_build_agents_list(),
         guardrails=final_guardrails,
     )
- 
\ No newline at end of file
+
+# =========================
+# Per-conversation serialization and coalescing
+# =========================
+
+# Identical messages for a conversation within this window (or while the first is still
+# running) share one run instead of starting another (double submits, client retries)
+COALESCE_WINDOW_SECONDS = float(os.getenv("CHAT_COALESCE_WINDOW_SECONDS", "5"))
+
+# When true, a new message for a conversation cancels its in-flight run
+CANCEL_SUPERSEDED_RUNS = os.getenv("CHAT_CANCEL_SUPERSEDED_RUNS", "false").lower() == "true"
+
+class _ConversationTurns:
+    """Turn lock for one conversation plus its most recently started turn."""
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+        self.last_digest: Optional[str] = None
+        self.last_result: Optional[asyncio.Future] = None
+        self.last_finished = 0.0
+        self.running_cancel: Optional[asyncio.Event] = None
+
+    def idle(self, now: float) -> bool:
+        return self.users == 0 and now - self.last_finished > COALESCE_WINDOW_SECONDS
+
+_conversation_turns: Dict[str, _ConversationTurns] = {}
+
+def _turns_for(conversation_id: str) -> _ConversationTurns:
+    turns = _conversation_turns.get(conversation_id)
+    if turns is None:
+        if len(_conversation_turns) >= 1024:
+            now = time.monotonic()
+            for key in [k for k, t in _conversation_turns.items() if t.idle(now)]:
+                del _conversation_turns[key]
+        turns = _conversation_turns[conversation_id] = _ConversationTurns()
+    return turns
+
+def _message_digest(message: str) -> str:
+    return hashlib.sha1(" ".join(message.split()).casefold().encode("utf-8")).hexdigest()
+
+def _mark_retrieved(future: asyncio.Future) -> None:
+    # Avoid "exception was never retrieved" warnings when no duplicate was waiting
+    if not future.cancelled():
+        future.exception()
+
+async def _run_turn(req: ChatRequest) -> AsyncIterator[Tuple[str, BaseModel]]:
+    """
+    Run a chat turn, one at a time per conversation.
+
+    A message identical to the conversation's latest one, still running or
+    finished less than COALESCE_WINDOW_SECONDS ago, does not start a new run:
+    it waits for that turn and yields its final response.
+    """
+    if not req.conversation_id:
+        async for kind, payload in _execute_turn(req):
+            yield kind, payload
+        return
+
+    turns = _turns_for(req.conversation_id)
+    turns.users += 1
+    result_future: Optional[asyncio.Future] = None
+    try:
+        digest = _message_digest(req.message)
+        previous = turns.last_result
+        if (
+            previous is not None
+            and turns.last_digest == digest
+            and (not previous.done() or time.monotonic() - turns.last_finished <= COALESCE_WINDOW_SECONDS)
+        ):
+            await asyncio.wait({previous})
+            if not previous.cancelled() and previous.exception() is None:
+                logger.info(f"Coalesced duplicate message for conversation {req.conversation_id}")
+                yield "done", previous.result()
+                return
+
+        if CANCEL_SUPERSEDED_RUNS and turns.running_cancel is not None:
+            turns.running_cancel.set()
+        result_future = asyncio.get_running_loop().create_future()
+        result_future.add_done_callback(_mark_retrieved)
+        turns.last_digest, turns.last_result = digest, result_future
+
+        async with turns.lock:
+            cancel = asyncio.Event()
+            turns.running_cancel = cancel
+            try:
+                async for kind, payload in _execute_turn(req, cancel):
+                    if kind == "done":
+                        result_future.set_result(payload)
+                    yield kind, payload
+            except Exception as e:
+                result_future.set_exception(e)
+                raise
+            finally:
+                if turns.running_cancel is cancel:
+                    turns.running_cancel = None
+    finally:
+        turns.users -= 1
+        if result_future is not None:
+            if not result_future.done():
+                result_future.cancel()
+            turns.last_finished = time.monotonic()
+
+# =========================
+# Main Chat Endpoints
+# =========================
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat_endpoint(req: ChatRequest):
+    """
+    Main chat endpoint for agent orchestration.
+    Handles conversation state, agent routing, and guardrail checks.
+    Returns the whole turn at once; see /chat/stream for incremental delivery.
+    """
+    response: Optional[ChatResponse] = None
+    async for kind, payload in _run_turn(req):
+        if kind == "done":
+            response = payload  # type: ignore[assignment]
+    return response
+
+def _sse(kind: str, payload: BaseModel) -> str:
+    """Format one server-sent event."""
+    return f"event: {kind}\ndata: {payload.model_dump_json()}\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(req: ChatRequest):
+    """
+    Streaming chat endpoint (server-sent events).
+    Emits message_delta, message, event and guardrail events while the turn runs,
+    then a final ``done`` event carrying the same ChatResponse as /chat.
+    """
+    async def event_stream():
+        try:
+            async for kind, payload in _run_turn(req):
+                yield _sse(kind, payload)
+        except Exception as e:
+            logger.exception("Streaming chat turn failed")
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# =========================
+# Health Endpoints
+# =========================
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving (warmup may still be running)."""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """
+    Readiness: 200 once the catalogs and local search indexes are loaded, 503 before.
+    OpenAI vector stores are reported but not required (agents fall back to local search).
+    """
+    ready = WARMUP_STATUS["catalogs"] == "ready" and WARMUP_STATUS["local_vectors"] == "ready"
+    body = {
+        "status": "ready" if ready else "warming_up",
+        "stages": dict(WARMUP_STATUS),
+        "catalog_version": current_catalogs().version,
+    }
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+# =========================
+# Admin Endpoints
+# =========================
+
+# Admin endpoints require a matching X-Admin-Token header; without ADMIN_TOKEN they are disabled
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+def _check_admin(token: Optional[str]) -> None:
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN is not set)")
+    if not hmac.compare_digest((token or "").encode("utf-8"), ADMIN_TOKEN.encode("utf-8")):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+def _catalog_status() -> Dict[str, Any]:
+    catalogs = current_catalogs()
+    return {
+        "catalog_version": catalogs.version,
+        "promo_rows": catalogs.promo_index.size,
+        "suitup_rows": catalogs.suitup_index.size,
+        "watcher": CATALOG_WATCHER.stats(),
+    }
+
+@app.get("/admin/catalogs")
+async def catalog_status(x_admin_token: Optional[str] = Header(default=None)):
+    """Catalog version in use and reload statistics."""
+    _check_admin(x_admin_token)
+    return _catalog_status()
+
+@app.post("/admin/catalogs/reload", status_code=202)
+async def reload_catalogs_endpoint(x_admin_token: Optional[str] = Header(default=None)):
+    """
+    Queue a catalog reload on the watcher thread and return immediately.
+    Poll GET /admin/catalogs for the new version.
+    """
+    _check_admin(x_admin_token)
+    CATALOG_WATCHER.request_reload()
+    return {"status": "reload_requested", **_catalog_status()}
+
+@app.get("/admin/search")
+async def search_status(x_admin_token: Optional[str] = Header(default=None)):
+    """Search pool load: running and queued searches, timeouts, rejections and latency."""
+    _check_admin(x_admin_token)
+    return SEARCH_EXECUTOR.stats()
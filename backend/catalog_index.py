@@ -0,0 +1,504 @@
+"""
+Shared, pre-indexed query engine over the product catalogs.
+Built once per catalog so search tools never copy the DataFrame per call.
+Also provides BM25-ranked keyword search over an inverted index.
+"""
+
+import math
+import re
+import unicodedata
+import logging
+from collections import Counter
+from typing import Any, List, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from aho_corasick import AhoCorasick
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"\w+")
+_REGEX_META = set(".^$*+?{}[]\\|()")
+
+# BM25 parameters (standard defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Spanish function words that carry no signal in product queries
+STOPWORDS = {
+    "a", "al", "con", "de", "del", "el", "en", "la", "las", "lo", "los",
+    "o", "para", "por", "que", "se", "sin", "su", "un", "una", "y",
+}
+
+
+def fold_text(text: str) -> str:
+    """Lowercase and strip accents (e.g. 'Vacío' -> 'vacio')."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def tokenize(text: str) -> List[str]:
+    """Split accent-folded text into word tokens."""
+    return _TOKEN_RE.findall(fold_text(text))
+
+
+def stem(token: str) -> str:
+    """Very light plural stripping so 'termos' and 'termo' share a term."""
+    if len(token) > 3 and token.endswith("s"):
+        return token[:-1]
+    return token
+
+
+def search_terms(text: str) -> List[str]:
+    """Terms used by BM25: folded, stemmed tokens without stopwords."""
+    return [stem(token) for token in tokenize(text) if token not in STOPWORDS]
+
+
+def _pack_postings(postings: Dict[str, tuple]) -> tuple:
+    """Concatenate per-term arrays into (terms, offsets, *arrays) CSR form."""
+    terms = list(postings)
+    lengths = [len(postings[term][0]) for term in terms]
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    width = len(next(iter(postings.values()))) if postings else 1
+    arrays = tuple(
+        np.concatenate([postings[term][i] for term in terms]) if terms else np.empty(0)
+        for i in range(width)
+    )
+    return (terms, offsets, *arrays)
+
+
+def _unpack_postings(terms: List[str], offsets: np.ndarray, *arrays: np.ndarray):
+    """Yield (term, arrays) pairs from CSR form; arrays are views, not copies."""
+    bounds = offsets.tolist()
+    for i, term in enumerate(terms):
+        lo, hi = bounds[i], bounds[i + 1]
+        yield term, tuple(array[lo:hi] for array in arrays)
+
+
+class LazyStringColumn:
+    """
+    Read-only string column stored as one UTF-8 byte pool plus row offsets.
+
+    Values are decoded only when read, so a pool memory-mapped from a
+    snapshot costs no resident memory until rows are accessed. Used for
+    bulky columns that are only shown, never searched (image URLs).
+    """
+
+    def __init__(self, pool: np.ndarray, offsets: np.ndarray, present: np.ndarray):
+        self.pool = pool
+        self.offsets = offsets
+        self.present = present
+
+    @classmethod
+    def from_values(cls, values: Iterable[Any]) -> "LazyStringColumn":
+        encoded: List[bytes] = []
+        present: List[bool] = []
+        for value in values:
+            missing = bool(pd.isna(value))
+            present.append(not missing)
+            encoded.append(b"" if missing else str(value).encode("utf-8"))
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        pool = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(pool, offsets, np.array(present, dtype=bool))
+
+    def __len__(self) -> int:
+        return len(self.present)
+
+    def get(self, row: int) -> Any:
+        """Value of one row (NaN when missing)."""
+        if not self.present[row]:
+            return np.nan
+        return self.pool[self.offsets[row]:self.offsets[row + 1]].tobytes().decode("utf-8")
+
+    def values(self) -> List[Any]:
+        return [self.get(row) for row in range(len(self))]
+
+
+def _lowered_values(series: pd.Series) -> np.ndarray:
+    """Lowercased ``str`` of every value; categorical columns share one string per category."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = np.array([str(value).lower() for value in series.cat.categories] + [""], dtype=object)
+        # Code -1 (missing) picks the trailing "" (fillna("") semantics)
+        return categories[series.cat.codes.to_numpy()]
+    return np.array([str(value).lower() for value in series.fillna("")], dtype=object)
+
+
+class CatalogIndex:
+    """
+    Read-only view over a catalog DataFrame with precomputed search structures.
+
+    Keeps lowercased text columns (for substring matching with the same
+    semantics as ``str.contains(..., case=False)``), a sorted price array for
+    range filters, an inverted index of accent-folded tokens used to prune
+    candidate rows before verifying matches, and BM25 postings for ranked
+    keyword search.
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        text_columns: Iterable[str],
+        result_columns: Iterable[str],
+        structures: Optional[Dict[str, tuple]] = None,
+        side_columns: Optional[Dict[str, LazyStringColumn]] = None,
+    ):
+        """
+        Args:
+            df: Catalog rows (with ``price_numeric`` for price filters)
+            text_columns: Columns searched by keyword
+            result_columns: Columns returned in result records
+            structures: Posting lists from ``export_structures`` (e.g. a
+                memory-mapped catalog snapshot); built from ``df`` when omitted
+            side_columns: Display-only columns kept out of ``df`` and decoded
+                per row when records are materialized
+        """
+        self.df = df
+        self.size = len(df)
+        self.side_columns = side_columns or {}
+        self._row_lookup: Dict[str, Dict[str, int]] = {}
+        self.text_columns = [col for col in text_columns if col in df.columns]
+        self.result_columns = [
+            col for col in result_columns if col in df.columns or col in self.side_columns
+        ]
+
+        # Lowercased columns and their not-null masks (str.contains(..., na=False) semantics)
+        self._lower: Dict[str, np.ndarray] = {}
+        self._present: Dict[str, np.ndarray] = {}
+        for col in self.text_columns:
+            series = df[col]
+            self._present[col] = series.notna().to_numpy()
+            self._lower[col] = _lowered_values(series)
+
+        # Sorted prices for O(log n) range filters
+        if "price_numeric" in df.columns and self.size:
+            prices = df["price_numeric"].to_numpy(dtype=float)
+        else:
+            prices = np.full(self.size, np.nan)
+        self._price_order = np.argsort(prices, kind="stable")
+        self._sorted_prices = prices[self._price_order]
+
+        if structures is not None:
+            # Inverted index and BM25 postings as views into the exported arrays
+            self._postings = {term: rows for term, (rows,) in _unpack_postings(*structures["postings"])}
+            self._bm25 = {term: (rows, weights) for term, (rows, weights) in _unpack_postings(*structures["bm25"])}
+        else:
+            # Inverted index: folded token -> sorted row ids
+            postings: Dict[str, set] = {}
+            for col in self.text_columns:
+                for row, text in enumerate(self._lower[col]):
+                    for token in tokenize(text):
+                        postings.setdefault(token, set()).add(row)
+            self._postings = {
+                token: np.array(sorted(rows), dtype=np.int64) for token, rows in postings.items()
+            }
+
+            # BM25 postings: term -> (row ids, precomputed per-row term weights)
+            self._bm25 = {}
+            self._build_bm25()
+        self._vocabulary = list(self._postings)
+
+        # Multi-pattern matchers over whole field values, built on first use
+        self._matchers: Dict[Tuple[str, ...], AhoCorasick] = {}
+
+        logger.info(f"Indexed {self.size} rows, {len(self._postings)} tokens over {self.text_columns}")
+
+    def _build_bm25(self) -> None:
+        """Precompute BM25 impact weights so queries are a posting-list merge."""
+        term_counts = [Counter(search_terms(text)) for text in self.documents()]
+        if not term_counts:
+            return
+
+        doc_lengths = np.array([sum(counts.values()) for counts in term_counts], dtype=np.float32)
+        avg_length = float(doc_lengths.mean()) or 1.0
+        length_norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_lengths / avg_length)
+
+        postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        for row, counts in enumerate(term_counts):
+            for term, tf in counts.items():
+                rows, tfs = postings.setdefault(term, ([], []))
+                rows.append(row)
+                tfs.append(tf)
+
+        for term, (rows, tfs) in postings.items():
+            rows = np.array(rows, dtype=np.int64)
+            tfs = np.array(tfs, dtype=np.float32)
+            idf = math.log(1 + (self.size - len(rows) + 0.5) / (len(rows) + 0.5))
+            weights = idf * tfs * (BM25_K1 + 1) / (tfs + length_norm[rows])
+            self._bm25[term] = (rows, weights.astype(np.float32))
+
+    def export_structures(self) -> Dict[str, tuple]:
+        """
+        Posting lists as flat arrays, for ``CatalogIndex(..., structures=...)``.
+
+        Each entry is (terms, offsets, rows[, weights]): the postings of
+        ``terms[i]`` are ``rows[offsets[i]:offsets[i + 1]]``.
+        """
+        return {
+            "postings": _pack_postings({term: (rows,) for term, rows in self._postings.items()}),
+            "bm25": _pack_postings(self._bm25),
+        }
+
+    @property
+    def empty(self) -> bool:
+        return self.size == 0
+
+    def documents(self) -> List[str]:
+        """One lowercased text document per row (text columns joined)."""
+        return [
+            " - ".join(self._lower[col][row] for col in self.text_columns)
+            for row in range(self.size)
+        ]
+
+    def vocabulary(self, min_document_frequency: int = 1) -> set:
+        """BM25 terms that occur in at least ``min_document_frequency`` rows."""
+        return {term for term, (rows, _) in self._bm25.items() if len(rows) >= min_document_frequency}
+
+    def lowered(self, column: str) -> np.ndarray:
+        """Lowercased string values of ``column`` (computed once, then cached)."""
+        if column not in self._lower:
+            if column in self.df.columns:
+                values = self.df[column]
+            elif column in self.side_columns:
+                values = pd.Series(self.side_columns[column].values(), dtype=object)
+            else:
+                values = pd.Series([""] * self.size)
+            self._lower[column] = np.array([str(value).lower() for value in values], dtype=object)
+            self._present[column] = values.notna().to_numpy()
+        return self._lower[column]
+
+    def all_rows(self) -> np.ndarray:
+        """Mask selecting every row."""
+        return np.ones(self.size, dtype=bool)
+
+    def price_mask(self, min_price: float | None = None, max_price: float | None = None) -> np.ndarray:
+        """Mask of rows whose price falls inside [min_price, max_price]."""
+        if min_price is None and max_price is None:
+            return self.all_rows()
+        lo = 0
+        hi = int(np.searchsorted(self._sorted_prices, np.inf, side="right"))  # NaN prices sort last
+        if min_price is not None:
+            lo = int(np.searchsorted(self._sorted_prices, min_price, side="left"))
+        if max_price is not None:
+            hi = min(hi, int(np.searchsorted(self._sorted_prices, max_price, side="right")))
+        mask = np.zeros(self.size, dtype=bool)
+        if hi > lo:
+            mask[self._price_order[lo:hi]] = True
+        return mask
+
+    def _candidate_rows(self, needle: str) -> Optional[np.ndarray]:
+        """
+        Rows that may contain ``needle`` as a substring, using the token index.
+
+        Every word fragment of the needle must be a substring of some token in
+        a matching row, so the longest fragment selects a superset of matches.
+        Returns None when the index cannot narrow the search.
+        """
+        fragments = tokenize(needle)
+        if not fragments:
+            return None
+        fragment = max(fragments, key=len)
+        matching = [self._postings[token] for token in self._vocabulary if fragment in token]
+        if not matching:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(matching))
+
+    def contains(self, pattern: str, columns: Iterable[str] | None = None) -> np.ndarray:
+        """
+        Mask of rows where any of ``columns`` contains ``pattern``.
+
+        Equivalent to OR-ing ``df[col].str.contains(pattern, case=False, na=False)``
+        over the columns, without touching the original frame.
+        """
+        columns = [col for col in (columns or self.text_columns) if col in self._lower]
+        mask = np.zeros(self.size, dtype=bool)
+        if not columns or self.empty:
+            return mask
+
+        if any(ch in _REGEX_META for ch in pattern):
+            regex = re.compile(pattern, re.IGNORECASE)
+            for col in columns:
+                values = self._lower[col]
+                present = self._present[col]
+                mask |= np.fromiter(
+                    (bool(p and regex.search(v)) for v, p in zip(values, present)),
+                    dtype=bool,
+                    count=self.size,
+                )
+            return mask
+
+        needle = pattern.lower()
+        rows = self._candidate_rows(needle)
+        if rows is None:
+            rows = np.arange(self.size)
+        for col in columns:
+            values = self._lower[col]
+            present = self._present[col]
+            hits = [row for row in rows if present[row] and needle in values[row]]
+            mask[hits] = True
+        return mask
+
+    def bm25_scores(self, query_weights: Dict[str, float]) -> np.ndarray:
+        """
+        BM25 score of every row for weighted query terms.
+
+        Each term contributes its precomputed posting weights, so the cost is
+        proportional to the posting lists touched, not the catalog size.
+        """
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term, weight in query_weights.items():
+            posting = self._bm25.get(term)
+            if posting is not None:
+                rows, weights = posting
+                scores[rows] += weight * weights
+        return scores
+
+    def query_weights(self, query: str, expansions: Iterable[str] = (), expansion_weight: float = 0.5) -> Dict[str, float]:
+        """Build BM25 query terms; expansion terms count less than the user's own words."""
+        weights: Dict[str, float] = {}
+        for text in expansions:
+            for term in search_terms(text):
+                weights[term] = max(weights.get(term, 0.0), expansion_weight)
+        for term in search_terms(query):
+            weights[term] = 1.0
+        return weights
+
+    def rank(
+        self,
+        query: str,
+        mask: np.ndarray | None = None,
+        limit: int = 6,
+        expansions: Iterable[str] = (),
+    ) -> np.ndarray:
+        """
+        Row ids of the best BM25 matches for ``query`` restricted to ``mask``.
+
+        Ties keep catalog order. Rows that score zero are never returned.
+        """
+        if self.empty or limit <= 0:
+            return np.empty(0, dtype=np.int64)
+        scores = self.bm25_scores(self.query_weights(query, expansions))
+        if mask is not None:
+            scores = np.where(mask, scores, 0)
+        matched = np.flatnonzero(scores > 0)
+        if matched.size > limit:
+            # Partial selection first, then a stable sort of the survivors
+            top = np.argpartition(-scores[matched], limit - 1)[:limit]
+            cutoff = scores[matched[top]].min()
+            matched = matched[scores[matched] >= cutoff]
+        order = np.argsort(-scores[matched], kind="stable")
+        return matched[order][:limit]
+
+    def _matcher(self, columns: Tuple[str, ...]) -> AhoCorasick:
+        matcher = self._matchers.get(columns)
+        if matcher is None:
+            patterns = (
+                (value, row)
+                for col in columns
+                for row, value in enumerate(self.lowered(col))
+            )
+            matcher = AhoCorasick(patterns)
+            self._matchers[columns] = matcher
+            logger.info(f"Built matcher over {matcher.pattern_count} values of {list(columns)}")
+        return matcher
+
+    def mentioned_rows(self, text: str, columns: Iterable[str] = ("nombre", "sku"), mask: np.ndarray | None = None) -> List[int]:
+        """
+        Rows whose value in any of ``columns`` appears verbatim in ``text``.
+
+        Matching is case-insensitive and done in a single pass per line. Rows
+        are ordered by the line they are first mentioned on, then by catalog
+        order, and each row is returned once.
+        """
+        matcher = self._matcher(tuple(columns))
+        found: List[int] = []
+        seen = set()
+        for line in text.lower().split("\n"):
+            if not line.strip():
+                continue
+            rows = sorted({row for _, row in matcher.iter_matches(line)} - seen)
+            for row in rows:
+                seen.add(row)
+                if mask is None or mask[row]:
+                    found.append(row)
+        return found
+
+    def first_rows(self, mask: np.ndarray, limit: int) -> np.ndarray:
+        """Row ids of the first ``limit`` selected rows, in catalog order."""
+        return np.flatnonzero(mask)[:max(limit, 0)]
+
+    def records(self, rows: Iterable[int], columns: Iterable[str] | None = None) -> List[Dict]:
+        """Materialize the given rows as result dicts (only these rows are copied or decoded)."""
+        columns = [
+            col for col in (columns or self.result_columns) if col in self.df.columns or col in self.side_columns
+        ]
+        rows = [int(row) for row in rows]
+        if not rows:
+            return []
+        frame_columns = [col for col in columns if col in self.df.columns]
+        # to_dict gives no rows at all for a frame without columns
+        framed = self.df.iloc[rows][frame_columns].to_dict(orient="records") if frame_columns else [{} for _ in rows]
+        if not any(col in self.side_columns for col in columns):
+            return framed
+        return [
+            {col: self.side_columns[col].get(row) if col in self.side_columns else record[col] for col in columns}
+            for row, record in zip(rows, framed)
+        ]
+
+    def row_of(self, column: str, value: str) -> Optional[int]:
+        """First row whose ``column`` equals ``value`` (e.g. a SKU), or None."""
+        if column not in self._row_lookup:
+            if column not in self.df.columns:
+                return None
+            rows: Dict[str, int] = {}
+            for row, key in enumerate(self.df[column]):
+                if not pd.isna(key):
+                    rows.setdefault(str(key), row)
+            self._row_lookup[column] = rows
+        return self._row_lookup[column].get(value)
+
+    def side_value(self, column: str, key_column: str, key: str) -> Any:
+        """One side-column value looked up by key (e.g. image URLs by SKU); None when unknown."""
+        row = self.row_of(key_column, key)
+        if row is None or column not in self.side_columns:
+            return None
+        return self.side_columns[column].get(row)
+
+    def full_frame(self) -> pd.DataFrame:
+        """The catalog with side columns decoded back in (a temporary copy for exports)."""
+        if not self.side_columns:
+            return self.df
+        return self.df.assign(**{col: column.values() for col, column in self.side_columns.items()})
+
+    def search(
+        self,
+        keyword: str | None = None,
+        columns: Iterable[str] | None = None,
+        min_price: float | None = None,
+        max_price: float | None = None,
+        limit: int = 6,
+        ranked: bool = False,
+        mask: np.ndarray | None = None,
+    ) -> List[Dict]:
+        """
+        Keyword + price filter.
+
+        By default returns the first ``limit`` substring matches in catalog
+        order. With ``ranked=True`` results are ordered by BM25 relevance,
+        falling back to substring matching for partial words the index cannot
+        resolve (e.g. 'ter').
+        """
+        if self.empty:
+            return []
+        filters = self.price_mask(min_price, max_price)
+        if mask is not None:
+            filters &= mask
+        if not keyword:
+            return self.records(self.first_rows(filters, limit))
+        if ranked:
+            rows = self.rank(keyword, filters, limit)
+            if rows.size:
+                return self.records(rows)
+        return self.records(self.first_rows(filters & self.contains(keyword, columns), limit))
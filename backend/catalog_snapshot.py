@@ -0,0 +1,358 @@
+"""
+Columnar catalog snapshots.
+Each CSV catalog is validated and normalized once into a versioned directory of .npy columns
+(UTF-8 string pools, categorical codes for low-cardinality columns, numeric arrays, derived
+price column) plus its search postings, which servers memory-map at startup instead of
+re-parsing the CSV and re-tokenizing every row. Bulky display-only columns (image URL lists)
+stay in a side table decoded per row when results are shown.
+
+Build ahead of deployment with ``python catalog_snapshot.py``; a missing or stale snapshot
+is also rebuilt on first load.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from catalog_index import BM25_B, BM25_K1, STOPWORDS, CatalogIndex, LazyStringColumn
+from vector_index import texts_fingerprint
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 2
+SNAPSHOT_ROOT = os.getenv("CATALOG_SNAPSHOT_DIR", str(Path(__file__).parent / "catalog_snapshots"))
+
+# Separator between values in a string pool (never present in CSV text)
+_SEPARATOR = "\x00"
+
+# String columns with at most this many distinct values per row are stored as categoricals
+CATEGORICAL_MAX_RATIO = float(os.getenv("CATALOG_CATEGORICAL_MAX_RATIO", "0.5"))
+
+DATA_DIR = Path(__file__).parent / "../data"
+
+# Catalogs served by the search tools
+CATALOGS: Dict[str, Dict[str, Any]] = {
+    "promo": {
+        "csv_path": os.getenv("PROMO_CSV_PATH", str(DATA_DIR / "promo.csv")),
+        "text_columns": ["nombre", "descripcion", "categorias"],
+        "result_columns": ["sku", "nombre", "categorias", "precio", "descripcion", "imagenes_url"],
+        "required_columns": ["sku", "nombre", "precio"],
+        "side_columns": ["imagenes_url"],
+    },
+    "suitup": {
+        "csv_path": os.getenv("SUITUP_CSV_PATH", str(DATA_DIR / "suitup.csv")),
+        "text_columns": ["nombre", "descripcion", "productos"],
+        "result_columns": ["nombre", "descripcion", "productos", "precio", "imagen"],
+        "required_columns": ["nombre", "precio"],
+        "side_columns": ["imagen"],
+    },
+}
+
+
+# =========================
+# CSV normalization
+# =========================
+
+def parse_prices(prices: pd.Series) -> pd.Series:
+    """'$1,234.50 MXN' -> 1234.5; unparseable prices become NaN instead of failing the load."""
+    cleaned = prices.astype(str).str.replace(r"[^\d.]", "", regex=True)
+    return pd.to_numeric(cleaned, errors="coerce").astype(float)
+
+
+def read_catalog_csv(csv_path: str, required_columns: Iterable[str] = ()) -> pd.DataFrame:
+    """
+    Read and validate a catalog CSV and add derived columns.
+
+    Raises:
+        ValueError: if a required column is missing
+    """
+    df = pd.read_csv(csv_path)
+    df.columns = [str(col).lstrip("\ufeff").strip() for col in df.columns]
+    missing = [col for col in required_columns if col not in df.columns]
+    if missing:
+        raise ValueError(f"{csv_path} is missing columns {missing}")
+    df = df.dropna(how="all").reset_index(drop=True)
+    if "precio" in df.columns:
+        df["price_numeric"] = parse_prices(df["precio"])
+        invalid = int(df["price_numeric"].isna().sum())
+        if invalid:
+            logger.warning(f"{csv_path}: {invalid} rows have no parseable price")
+    return df
+
+
+# =========================
+# Column storage
+# =========================
+
+def _save_strings(directory: Path, name: str, values: pd.Series) -> None:
+    present = values.notna().to_numpy()
+    texts = [str(v) if p else "" for v, p in zip(values, present)]
+    if any(_SEPARATOR in text for text in texts):
+        raise ValueError(f"Column {name} contains NUL characters")
+    pool = np.frombuffer(_SEPARATOR.join(texts).encode("utf-8"), dtype=np.uint8)
+    np.save(directory / f"{name}.pool.npy", pool)
+    np.save(directory / f"{name}.present.npy", present)
+
+
+def _mmap(path: Path) -> np.ndarray:
+    # Plain ndarray view of the mapping: np.memmap slicing is much slower
+    return np.load(path, mmap_mode="r").view(np.ndarray)
+
+
+def _load_strings(directory: Path, name: str) -> List[Any]:
+    """Values of a string pool, NaN where the value was missing."""
+    pool = _mmap(directory / f"{name}.pool.npy")
+    present = _mmap(directory / f"{name}.present.npy")
+    texts = pool.tobytes().decode("utf-8").split(_SEPARATOR)
+    return [text if p else np.nan for text, p in zip(texts, present)]
+
+
+def _save_categorical(directory: Path, name: str, values: pd.Series) -> None:
+    categorical = pd.Categorical(values)
+    _save_strings(directory, f"{name}.categories", pd.Series(categorical.categories, dtype=object))
+    np.save(directory / f"{name}.codes.npy", categorical.codes)
+
+
+def _load_categorical(directory: Path, name: str) -> pd.Categorical:
+    categories = _load_strings(directory, f"{name}.categories")
+    codes = _mmap(directory / f"{name}.codes.npy")
+    return pd.Categorical.from_codes(codes, categories=pd.Index(categories, dtype=object))
+
+
+def _save_side(directory: Path, name: str, values: pd.Series) -> None:
+    column = LazyStringColumn.from_values(values)
+    np.save(directory / f"{name}.pool.npy", column.pool)
+    np.save(directory / f"{name}.offsets.npy", column.offsets)
+    np.save(directory / f"{name}.present.npy", column.present)
+
+
+def _load_side(directory: Path, name: str) -> LazyStringColumn:
+    # Stays memory-mapped: pages are only touched for the rows being shown
+    return LazyStringColumn(*(_mmap(directory / f"{name}.{part}.npy") for part in ("pool", "offsets", "present")))
+
+
+def _is_categorical(values: pd.Series) -> bool:
+    return len(values) > 0 and values.nunique() <= len(values) * CATEGORICAL_MAX_RATIO
+
+
+def split_side_columns(df: pd.DataFrame, side_columns: Iterable[str]) -> tuple[pd.DataFrame, Dict[str, LazyStringColumn]]:
+    """Move display-only columns out of ``df`` into byte-pool side columns."""
+    side = {col: LazyStringColumn.from_values(df[col]) for col in side_columns if col in df.columns}
+    return df.drop(columns=list(side)), side
+
+
+def _index_params(text_columns: List[str]) -> Dict[str, Any]:
+    """Everything besides the CSV that the stored postings depend on."""
+    return {
+        "text_columns": text_columns,
+        "bm25": [BM25_K1, BM25_B],
+        "stopwords": sorted(STOPWORDS),
+    }
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _catalog_dir(csv_path: str, root: Optional[str]) -> Path:
+    return Path(root or SNAPSHOT_ROOT) / Path(csv_path).stem
+
+
+# =========================
+# Build / load
+# =========================
+
+def build_snapshot(
+    csv_path: str,
+    text_columns: List[str],
+    result_columns: List[str],
+    required_columns: Iterable[str] = (),
+    root: Optional[str] = None,
+    keep_versions: int = 2,
+    side_columns: Iterable[str] = (),
+) -> Path:
+    """
+    Write a new snapshot version for ``csv_path`` and make it current.
+
+    Returns:
+        The version directory
+    """
+    started = time.perf_counter()
+    source = Path(csv_path)
+    stat = source.stat()
+    sha256 = _file_sha256(source)
+    side_columns = set(side_columns)
+    params = _index_params(list(text_columns))
+
+    df = read_catalog_csv(csv_path, required_columns)
+    index = CatalogIndex(df, text_columns, result_columns)
+
+    params_digest = hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+    version = f"{sha256[:12]}-{params_digest[:8]}"
+    catalog_dir = _catalog_dir(csv_path, root)
+    version_dir = catalog_dir / version
+    tmp_dir = catalog_dir / f".{version}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    columns = []
+    for i, col in enumerate(df.columns):
+        name = f"c{i}"
+        if pd.api.types.is_numeric_dtype(df[col]):
+            np.save(tmp_dir / f"{name}.npy", df[col].to_numpy())
+            columns.append({"name": col, "file": name, "kind": "numeric"})
+        elif col in side_columns:
+            _save_side(tmp_dir, name, df[col])
+            columns.append({"name": col, "file": name, "kind": "side"})
+        elif _is_categorical(df[col]):
+            _save_categorical(tmp_dir, name, df[col])
+            columns.append({"name": col, "file": name, "kind": "categorical"})
+        else:
+            _save_strings(tmp_dir, name, df[col])
+            columns.append({"name": col, "file": name, "kind": "string"})
+
+    structures = index.export_structures()
+    for key, (terms, offsets, *arrays) in structures.items():
+        _save_strings(tmp_dir, f"{key}.terms", pd.Series(terms, dtype=object))
+        np.save(tmp_dir / f"{key}.offsets.npy", offsets)
+        for i, array in enumerate(arrays):
+            np.save(tmp_dir / f"{key}.{i}.npy", array)
+
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "version": version,
+        "rows": len(df),
+        "columns": columns,
+        "structures": {key: len(arrays) - 2 for key, arrays in structures.items()},
+        "index": params,
+        "documents_fingerprint": texts_fingerprint(index.documents()),
+        "source": {"path": str(source), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256},
+        "built_at": time.time(),
+    }
+    (tmp_dir / "manifest.json").write_text(json.dumps(manifest, ensure_ascii=False, indent=2))
+
+    shutil.rmtree(version_dir, ignore_errors=True)
+    os.replace(tmp_dir, version_dir)
+    pointer_tmp = catalog_dir / f".CURRENT.tmp-{os.getpid()}"
+    pointer_tmp.write_text(version)
+    os.replace(pointer_tmp, catalog_dir / "CURRENT")
+
+    # Drop old versions (other workers may still have the previous one mapped)
+    versions = sorted(
+        (d for d in catalog_dir.iterdir() if d.is_dir() and not d.name.startswith(".")),
+        key=lambda d: d.stat().st_mtime,
+        reverse=True,
+    )
+    for old in versions[keep_versions:]:
+        shutil.rmtree(old, ignore_errors=True)
+
+    logger.info(f"Built catalog snapshot {version_dir} ({len(df)} rows) in {time.perf_counter() - started:.2f}s")
+    return version_dir
+
+
+def _current_manifest(csv_path: str, text_columns: List[str], root: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Manifest of the current snapshot if it matches the CSV and index parameters."""
+    catalog_dir = _catalog_dir(csv_path, root)
+    try:
+        version = (catalog_dir / "CURRENT").read_text().strip()
+        manifest = json.loads((catalog_dir / version / "manifest.json").read_text())
+    except (OSError, json.JSONDecodeError):
+        return None
+    if manifest.get("format") != SNAPSHOT_FORMAT or manifest.get("index") != _index_params(text_columns):
+        return None
+    stat = Path(csv_path).stat()
+    source = manifest["source"]
+    if (stat.st_size, stat.st_mtime_ns) != (source["size"], source["mtime_ns"]):
+        # Touched but possibly unchanged (e.g. a fresh checkout): compare contents
+        if stat.st_size != source["size"] or _file_sha256(Path(csv_path)) != source["sha256"]:
+            return None
+    manifest["dir"] = str(catalog_dir / version)
+    return manifest
+
+
+def load_snapshot(manifest: Dict[str, Any], text_columns: List[str], result_columns: List[str]) -> CatalogIndex:
+    """Memory-map a snapshot's columns and postings into a CatalogIndex."""
+    directory = Path(manifest["dir"])
+    rows = manifest["rows"]
+    data = {}
+    side = {}
+    for column in manifest["columns"]:
+        if column["kind"] == "numeric":
+            data[column["name"]] = _mmap(directory / f"{column['file']}.npy")
+        elif column["kind"] == "side":
+            side[column["name"]] = _load_side(directory, column["file"])
+        elif column["kind"] == "categorical":
+            data[column["name"]] = _load_categorical(directory, column["file"])
+        else:
+            data[column["name"]] = pd.Series(_load_strings(directory, column["file"]), dtype=object if not rows else None)
+    df = pd.DataFrame(data, index=pd.RangeIndex(rows))
+
+    structures = {}
+    for key, width in manifest["structures"].items():
+        terms = _load_strings(directory, f"{key}.terms")
+        offsets = _mmap(directory / f"{key}.offsets.npy")
+        arrays = [_mmap(directory / f"{key}.{i}.npy") for i in range(width)]
+        structures[key] = (terms, offsets, *arrays)
+    return CatalogIndex(df, text_columns, result_columns, structures, side)
+
+
+def load_catalog(
+    csv_path: str,
+    text_columns: List[str],
+    result_columns: List[str],
+    required_columns: Iterable[str] = (),
+    root: Optional[str] = None,
+    side_columns: Iterable[str] = (),
+) -> tuple[CatalogIndex, Optional[str]]:
+    """
+    Catalog index for ``csv_path`` from its snapshot, (re)building the snapshot if needed.
+
+    Falls back to parsing the CSV in memory when the snapshot cannot be
+    written or read (e.g. a corrupt column file), and to an empty catalog
+    when the CSV cannot be read.
+
+    Returns:
+        (index, documents fingerprint or None when not known)
+    """
+    try:
+        manifest = _current_manifest(csv_path, text_columns, root)
+        if manifest is None:
+            build_snapshot(csv_path, text_columns, result_columns, required_columns, root, side_columns=side_columns)
+            manifest = _current_manifest(csv_path, text_columns, root)
+        if manifest is not None:
+            index = load_snapshot(manifest, text_columns, result_columns)
+            logger.info(f"Loaded {index.size} rows from catalog snapshot {manifest['version']}")
+            return index, manifest["documents_fingerprint"]
+    except Exception as e:
+        # An unreadable CSV fails again below and is reported there
+        logger.warning(f"Catalog snapshot unavailable for {csv_path}, parsing CSV: {e}")
+
+    try:
+        df = read_catalog_csv(csv_path, required_columns)
+    except Exception as e:
+        logger.error(f"Failed to load catalog {csv_path}: {e}")
+        df = pd.DataFrame()
+    df, side = split_side_columns(df, side_columns)
+    return CatalogIndex(df, text_columns, result_columns, side_columns=side), None
+
+
+if __name__ == "__main__":
+    # Build snapshots for the configured catalogs ahead of deployment
+    logging.basicConfig(level=logging.INFO)
+    for spec in CATALOGS.values():
+        build_snapshot(
+            spec["csv_path"], spec["text_columns"], spec["result_columns"], spec["required_columns"],
+            side_columns=spec["side_columns"],
+        )
@@ -0,0 +1,117 @@
+"""
+Catalog file watcher.
+Polls the catalog CSVs for changes (size + mtime) on a background thread and triggers a reload
+once a change has settled; reloads can also be requested explicitly (admin endpoint).
+"""
+
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Signature = Tuple[Optional[Tuple[int, int]], ...]
+
+
+class CatalogWatcher:
+    """
+    Calls ``on_change`` on its own thread whenever one of ``paths`` changes.
+
+    Files are polled every ``interval`` seconds (0 disables polling; explicit
+    requests still work). A change is acted on only after the files have
+    stayed the same for ``settle_seconds``, so a CSV still being copied is
+    not loaded half-written. Reloads never run concurrently.
+    """
+
+    def __init__(
+        self,
+        paths: List[str],
+        on_change: Callable[[], Any],
+        interval: float = 30.0,
+        settle_seconds: float = 1.0,
+    ):
+        self.paths = list(paths)
+        self.on_change = on_change
+        self.interval = interval
+        self.settle_seconds = settle_seconds
+
+        self._last: Optional[Signature] = None
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._forced = False
+        self._thread: Optional[threading.Thread] = None
+
+        self.reloads = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+
+    def _signature(self) -> Signature:
+        signature = []
+        for path in self.paths:
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_size, stat.st_mtime_ns))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _settled_signature(self) -> Signature:
+        """Signature once it has stopped changing for ``settle_seconds``."""
+        signature = self._signature()
+        while not self._stopped.wait(self.settle_seconds):
+            current = self._signature()
+            if current == signature:
+                break
+            signature = current
+        return signature
+
+    def start(self) -> None:
+        """Take the current files as the loaded baseline and start polling."""
+        if self._thread is not None:
+            return
+        self._last = self._signature()
+        self._thread = threading.Thread(target=self._run, name="catalog-watcher", daemon=True)
+        self._thread.start()
+
+    def request_reload(self) -> None:
+        """Reload on the watcher thread even if the files look unchanged."""
+        self._forced = True
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wake.wait(self.interval if self.interval > 0 else None)
+            self._wake.clear()
+            if self._stopped.is_set():
+                break
+            forced, self._forced = self._forced, False
+            if not forced and self._signature() == self._last:
+                continue
+            signature = self._settled_signature()
+            if self._stopped.is_set():
+                break
+            try:
+                self.on_change()
+                self.reloads += 1
+                self.last_error = None
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                logger.error(f"Catalog reload failed: {e}")
+            # Also on failure: retry on the next change rather than every poll
+            self._last = signature
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "interval": self.interval,
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,467 @@
+"""
+Conversation state storage.
+Bounded in-memory hot tier (LRU + idle TTL) in front of a SQLite cold tier (WAL mode)
+with batched write-behind, so memory stays flat and state survives restarts.
+Turns are stored as an append-only log of deltas on top of periodic snapshots.
+"""
+
+import copy
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationStore:
+    def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        pass
+
+    def save(self, conversation_id: str, state: Dict[str, Any]):
+        pass
+
+    def append_turn(
+        self,
+        conversation_id: str,
+        state: Dict[str, Any],
+        new_items: List[Any],
+        changes: Dict[str, Any],
+        updates: Optional[Dict[str, Any]] = None,
+    ):
+        """
+        Record one turn. ``state`` is the updated full state; ``new_items`` are
+        the input items added this turn, ``changes`` the context fields that
+        changed and ``updates`` any other top-level state keys set this turn.
+        Stores that keep whole states just save it.
+        """
+        self.save(conversation_id, state)
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+    def close(self) -> None:
+        pass
+
+
+class InMemoryConversationStore(ConversationStore):
+    """Unbounded process-local store; only suitable for development."""
+
+    def __init__(self):
+        self._conversations: Dict[str, Dict[str, Any]] = {}
+
+    def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        state = self._conversations.get(conversation_id)
+        return copy.deepcopy(state) if state is not None else None
+
+    def save(self, conversation_id: str, state: Dict[str, Any]):
+        self._conversations[conversation_id] = state
+
+    def stats(self) -> Dict[str, Any]:
+        return {"size": len(self._conversations)}
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class TieredConversationStore(ConversationStore):
+    """
+    Hot/cold conversation store backed by a snapshot plus a turn log.
+
+    At most ``max_conversations`` states are kept in memory; the least
+    recently used ones, and any idle for ``ttl_seconds``, are dropped from
+    memory and rebuilt from SQLite on demand (latest snapshot + the turns
+    logged after it).
+
+    ``save`` writes a full snapshot; ``append_turn`` only logs the turn's new
+    items and context changes, so its cost does not grow with conversation
+    length. Every ``snapshot_every`` turns a new snapshot is written instead
+    and the turns it covers are deleted.
+
+    Writes are serialized immediately and applied by a background thread in
+    one transaction per batch every ``flush_interval`` seconds
+    (``flush_interval=0`` writes through).
+
+    ``get`` returns a private copy: a turn edits its copy and nothing
+    changes in the store until ``save``/``append_turn`` commit it, so a
+    failed or cancelled turn leaves memory and the log in step. States
+    handed to ``save``/``append_turn`` belong to the store afterwards.
+
+    Several uvicorn workers may share one database file. Hot-tier hits are
+    served from memory after a single primary-key lookup of the logged head
+    seq; when another worker has logged newer turns the state is rebuilt
+    from SQLite instead. Turns are inserted with a plain ``INSERT``: when two
+    workers number a turn the same (both wrote before either flushed), the
+    later one is renumbered after the other's turns and its in-memory copy
+    dropped, so no turn is overwritten.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        context_type: Type[BaseModel],
+        max_conversations: int = 10000,
+        ttl_seconds: float = 1800,
+        flush_interval: float = 0.5,
+        batch_size: int = 256,
+        snapshot_every: int = 20,
+    ):
+        self.path = path
+        self.context_type = context_type
+        self.max_conversations = max_conversations
+        self.ttl_seconds = ttl_seconds
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.snapshot_every = snapshot_every
+
+        # conversation_id -> (last_access, seq, turns since snapshot, state)
+        self._hot: "OrderedDict[str, Tuple[float, int, int, Dict[str, Any]]]" = OrderedDict()
+        # conversation_id -> ordered ("snapshot", seq, state_json, turn or None) /
+        # ("turn", seq, items_json, changes_json, agent, updates_json); a snapshot written in
+        # place of a turn keeps that turn's (items, changes, agent, updates) for seq conflicts
+        self._pending: Dict[str, List[tuple]] = {}
+        self._pending_ops = 0
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._flush_requested = threading.Event()
+        self._closed = threading.Event()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.seq_conflicts = 0
+        self.cold_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.flushes = 0
+        self.snapshots_written = 0
+        self.turns_written = 0
+
+        self._db = self._connect()
+        self._create_schema()
+
+        self._writer: Optional[threading.Thread] = None
+        if flush_interval > 0:
+            self._writer = threading.Thread(target=self._write_behind, name="conversation-store-writer", daemon=True)
+            self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = sqlite3.connect(self.path, check_same_thread=False, timeout=5.0)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def _create_schema(self) -> None:
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS conversation_snapshots ("
+                " id TEXT PRIMARY KEY,"
+                " head_seq INTEGER NOT NULL,"
+                " snapshot_seq INTEGER NOT NULL,"
+                " state TEXT NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS conversation_turns ("
+                " conversation_id TEXT NOT NULL,"
+                " seq INTEGER NOT NULL,"
+                " items TEXT NOT NULL,"
+                " changes TEXT NOT NULL,"
+                " current_agent TEXT NOT NULL,"
+                " updates TEXT NOT NULL DEFAULT '{}',"
+                " PRIMARY KEY (conversation_id, seq))"
+            )
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(conversation_turns)")}
+            if "updates" not in columns:
+                self._db.execute("ALTER TABLE conversation_turns ADD COLUMN updates TEXT NOT NULL DEFAULT '{}'")
+            # Databases written before the turn log stored whole states only
+            legacy = self._db.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'conversations'"
+            ).fetchone()
+            if legacy:
+                self._db.execute(
+                    "INSERT OR IGNORE INTO conversation_snapshots (id, head_seq, snapshot_seq, state) "
+                    "SELECT id, 0, 0, state FROM conversations"
+                )
+                self._db.execute("DROP TABLE conversations")
+                logger.info("Migrated conversation states to the snapshot table")
+
+    # =========================
+    # Serialization
+    # =========================
+
+    def _dump(self, value: Any) -> str:
+        return json.dumps(value, default=_json_default, ensure_ascii=False, separators=(",", ":"))
+
+    def _rebuild(self, snapshot: str, turns: List[tuple]) -> Dict[str, Any]:
+        """Replay logged turns (items_json, changes_json, agent, updates_json) on top of a snapshot."""
+        state = json.loads(snapshot)
+        context = dict(state.get("context") or {})
+        for items, changes, current_agent, updates in turns:
+            state["input_items"].extend(json.loads(items))
+            context.update(json.loads(changes))
+            state["current_agent"] = current_agent
+            state.update(json.loads(updates))
+        state["context"] = self.context_type.model_validate(context)
+        return state
+
+    # =========================
+    # Hot tier
+    # =========================
+
+    def _evict(self, now: float) -> None:
+        while self._hot:
+            key, entry = next(iter(self._hot.items()))
+            if len(self._hot) > self.max_conversations or now - entry[0] > self.ttl_seconds:
+                del self._hot[key]
+                self.evictions += 1
+            else:
+                break
+
+    def _remember(self, conversation_id: str, seq: int, since_snapshot: int, state: Dict[str, Any]) -> None:
+        now = time.monotonic()
+        self._hot[conversation_id] = (now, seq, since_snapshot, state)
+        self._hot.move_to_end(conversation_id)
+        self._evict(now)
+
+    def _enqueue(self, conversation_id: str, op: tuple) -> None:
+        with self._lock:
+            self._pending.setdefault(conversation_id, []).append(op)
+            self._pending_ops += 1
+            backlog = self._pending_ops
+        if self._writer is None:
+            self.flush()
+        elif backlog >= self.batch_size:
+            self._flush_requested.set()
+
+    # =========================
+    # Cold tier
+    # =========================
+
+    def _head_seq(self, conversation_id: str) -> Optional[int]:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT head_seq FROM conversation_snapshots WHERE id = ?", (conversation_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def _read_cold(self, conversation_id: str) -> Optional[Tuple[int, int, Dict[str, Any]]]:
+        """(seq, turns since snapshot, state) rebuilt from the database, or None."""
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT snapshot_seq, state FROM conversation_snapshots WHERE id = ?", (conversation_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            snapshot_seq, snapshot = row
+            turns = self._db.execute(
+                "SELECT seq, items, changes, current_agent, updates FROM conversation_turns "
+                "WHERE conversation_id = ? AND seq > ? ORDER BY seq",
+                (conversation_id, snapshot_seq),
+            ).fetchall()
+        seq = turns[-1][0] if turns else snapshot_seq
+        return seq, len(turns), self._rebuild(snapshot, [t[1:] for t in turns])
+
+    def _insert_turn(self, conversation_id: str, seq: int, turn: tuple) -> None:
+        self._db.execute(
+            "INSERT INTO conversation_turns "
+            "(conversation_id, seq, items, changes, current_agent, updates) VALUES (?, ?, ?, ?, ?, ?)",
+            (conversation_id, seq, *turn),
+        )
+        self._db.execute(
+            "UPDATE conversation_snapshots SET head_seq = MAX(head_seq, ?) WHERE id = ?",
+            (seq, conversation_id),
+        )
+        self.turns_written += 1
+
+    def _apply(self, conversation_id: str, ops: List[tuple]) -> bool:
+        """Write one conversation's ops; returns False if another writer had taken one of their seqs."""
+        in_step = True
+        for op in ops:
+            head = self._db.execute(
+                "SELECT head_seq FROM conversation_snapshots WHERE id = ?", (conversation_id,)
+            ).fetchone()
+            head = head[0] if head else None
+            if op[0] == "snapshot":
+                _, seq, state, turn = op
+                if head is not None and head >= seq:
+                    # Another worker logged turns this state has not seen
+                    in_step = False
+                    self.seq_conflicts += 1
+                    if turn is not None:
+                        self._insert_turn(conversation_id, head + 1, turn)
+                        continue
+                    logger.warning(f"Conversation {conversation_id} saved over turns up to {head} from another writer")
+                    seq = head + 1
+                self._db.execute(
+                    "INSERT INTO conversation_snapshots (id, head_seq, snapshot_seq, state) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET head_seq = excluded.head_seq, "
+                    "snapshot_seq = excluded.snapshot_seq, state = excluded.state",
+                    (conversation_id, seq, seq, state),
+                )
+                self._db.execute(
+                    "DELETE FROM conversation_turns WHERE conversation_id = ? AND seq <= ?",
+                    (conversation_id, seq),
+                )
+                self.snapshots_written += 1
+            else:
+                _, seq, *turn = op
+                if head is not None and head >= seq:
+                    # Seq taken by another worker (maybe already folded into its snapshot): log after theirs
+                    in_step = False
+                    self.seq_conflicts += 1
+                    seq = head + 1
+                self._insert_turn(conversation_id, seq, tuple(turn))
+        return in_step
+
+    def flush(self) -> int:
+        """Write all pending snapshots and turns in one transaction; returns the number of operations."""
+        with self._lock:
+            batch, self._pending, count, self._pending_ops = self._pending, {}, self._pending_ops, 0
+        if not batch:
+            return 0
+        try:
+            with self._db_lock, self._db:
+                stale = [conversation_id for conversation_id, ops in batch.items() if not self._apply(conversation_id, ops)]
+        except sqlite3.Error as e:
+            logger.error(f"Conversation store flush failed ({count} operations): {e}")
+            with self._lock:
+                # Put the batch back in front of anything queued meanwhile
+                for conversation_id, ops in batch.items():
+                    self._pending[conversation_id] = ops + self._pending.get(conversation_id, [])
+                self._pending_ops += count
+            return 0
+        if stale:
+            # The copies in memory miss the other worker's turns; rebuild them on the next get
+            with self._lock:
+                for conversation_id in stale:
+                    if self._hot.pop(conversation_id, None) is not None:
+                        self.evictions += 1
+        self.flushes += 1
+        return count
+
+    def _write_behind(self) -> None:
+        while not self._closed.is_set():
+            self._flush_requested.wait(self.flush_interval)
+            self._flush_requested.clear()
+            self.flush()
+
+    # =========================
+    # ConversationStore API
+    # =========================
+
+    def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """A copy of the conversation state (edits are kept only once committed), or None."""
+        with self._lock:
+            entry = self._hot.get(conversation_id)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl_seconds:
+                del self._hot[conversation_id]
+                self.evictions += 1
+                entry = None
+        if entry is not None:
+            head = self._head_seq(conversation_id)
+            with self._lock:
+                entry = self._hot.get(conversation_id)
+                if entry is not None and (head is None or head <= entry[1]):
+                    _, seq, since_snapshot, state = entry
+                    self._remember(conversation_id, seq, since_snapshot, state)
+                    self.hits += 1
+                    return copy.deepcopy(state)
+                if entry is not None:
+                    # Another worker logged newer turns
+                    del self._hot[conversation_id]
+                    self.stale_hits += 1
+        with self._lock:
+            has_pending = conversation_id in self._pending
+
+        if has_pending:
+            # Evicted before its writes were flushed: flush, then read back
+            self.flush()
+        cold = self._read_cold(conversation_id)
+        with self._lock:
+            if cold is None:
+                self.misses += 1
+                return None
+            seq, since_snapshot, state = cold
+            self._remember(conversation_id, seq, since_snapshot, state)
+            self.cold_hits += 1
+        return copy.deepcopy(state)
+
+    def _last_seq(self, conversation_id: str) -> int:
+        """Latest turn number known for a conversation (memory, pending writes, then database)."""
+        with self._lock:
+            entry = self._hot.get(conversation_id)
+            pending = self._pending.get(conversation_id)
+        if entry is not None:
+            return entry[1]
+        if pending:
+            return pending[-1][1]
+        return self._head_seq(conversation_id) or 0
+
+    def _snapshot(self, conversation_id: str, state: Dict[str, Any], turn: Optional[tuple]) -> None:
+        seq = self._last_seq(conversation_id) + 1
+        raw = self._dump(state)
+        with self._lock:
+            self._remember(conversation_id, seq, 0, state)
+        self._enqueue(conversation_id, ("snapshot", seq, raw, turn))
+
+    def save(self, conversation_id: str, state: Dict[str, Any]):
+        self._snapshot(conversation_id, state, None)
+
+    def append_turn(
+        self,
+        conversation_id: str,
+        state: Dict[str, Any],
+        new_items: List[Any],
+        changes: Dict[str, Any],
+        updates: Optional[Dict[str, Any]] = None,
+    ):
+        with self._lock:
+            entry = self._hot.get(conversation_id)
+        turn = (self._dump(new_items), self._dump(changes), state["current_agent"], self._dump(updates or {}))
+        if entry is None or entry[2] + 1 >= self.snapshot_every:
+            # Unknown position in the log (evicted mid-turn) or time to compact
+            self._snapshot(conversation_id, state, turn)
+            return
+        seq, since_snapshot = entry[1] + 1, entry[2] + 1
+        op = ("turn", seq, *turn)
+        with self._lock:
+            self._remember(conversation_id, seq, since_snapshot, state)
+        self._enqueue(conversation_id, op)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.cold_hits + self.misses
+        return {
+            "hot_size": len(self._hot),
+            "pending_writes": self._pending_ops,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "seq_conflicts": self.seq_conflicts,
+            "cold_hits": self.cold_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "flushes": self.flushes,
+            "snapshots_written": self.snapshots_written,
+            "turns_written": self.turns_written,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        """Stop the writer thread and flush everything still pending."""
+        self._closed.set()
+        self._flush_requested.set()
+        if self._writer is not None:
+            self._writer.join(timeout=5)
+        self.flush()
+        with self._db_lock:
+            self._db.close()
@@ -1,9 +1,10 @@
 """
 File uploader utility for uploading CSV files to OpenAI.
-Called on startup; uploads each CSV once & returns file_id.
+Called on startup; uploads each CSV once (again when its content changes) & returns file_id.
 """
 
 from openai import OpenAI
+import hashlib
 import os
 import pathlib
 import json
@@ -11,9 +12,16 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
 def upload_if_needed(path: str) -> str:
     """
-    Upload a CSV file to OpenAI if not already uploaded.
+    Upload a CSV file to OpenAI unless this exact content was already uploaded.
     
     Args:
         path: Path to the CSV file
@@ -21,25 +29,28 @@ def upload_if_needed(path: str) -> str:
     Returns:
         file_id: OpenAI file ID for the uploaded file
     """
-    client = OpenAI()
     meta_path = pathlib.Path(path + ".meta.json")
+    sha256 = _sha256(path)
     
-    # Check if file was already uploaded
+    # Check if this content was already uploaded
     if meta_path.exists():
         try:
             meta_data = json.loads(meta_path.read_text())
-            logger.info(f"Using existing upload for {path}: {meta_data['file_id']}")
-            return meta_data["file_id"]
+            if meta_data.get("sha256") == sha256:
+                logger.info(f"Using existing upload for {path}: {meta_data['file_id']}")
+                return meta_data["file_id"]
+            logger.info(f"{path} changed since its last upload, re-uploading...")
         except (json.JSONDecodeError, KeyError):
             logger.warning(f"Invalid meta file for {path}, re-uploading...")
 
     # Upload the file
     logger.info(f"Uploading {path} to OpenAI...")
+    client = OpenAI()
     with open(path, "rb") as f:
         file = client.files.create(file=f, purpose="assistants")
     
     # Save metadata
-    meta_path.write_text(json.dumps({"file_id": file.id, "filename": os.path.basename(path)}))
+    meta_path.write_text(json.dumps({"file_id": file.id, "filename": os.path.basename(path), "sha256": sha256}))
     logger.info(f"Successfully uploaded {path} with file_id: {file.id}")
     
     return file.id 
\ No newline at end of file
@@ -0,0 +1,154 @@
+"""
+Guardrail verdict cache and fast path for trivial messages.
+Avoids LLM guardrail calls for greetings, acknowledgements and UI-generated messages.
+"""
+
+import hashlib
+import os
+import re
+from typing import Any, List, Optional, Tuple
+
+from catalog_index import tokenize
+from ttl_cache import TTLCache
+
+_REPEATED_CHARS_RE = re.compile(r"(.)\1{2,}")
+
+# Characters of code, markup and prompt-injection payloads (never in a trivial message)
+_CODE_SYMBOLS_RE = re.compile(r"[{}\[\]<>;=`\\|$#*/_%&^~@]")
+
+# Normalized messages that are always safe and relevant (conversational or sent by UI buttons)
+TRIVIAL_MESSAGES = {
+    # Greetings / farewells
+    "hola", "hola buenas", "buenas", "buenos dias", "buen dia", "buenas tardes", "buenas noches",
+    "hi", "hello", "hey", "adios", "bye", "hasta luego",
+    # Acknowledgements
+    "ok", "okay", "oki", "vale", "si", "no", "claro", "perfecto", "genial", "excelente",
+    "de acuerdo", "entendido", "listo", "esta bien", "muy bien", "sale",
+    "gracias", "muchas gracias", "mil gracias", "thanks", "thank you",
+    # Business unit selector buttons
+    "promoselect", "suitup", "suit up",
+}
+
+
+def normalize_message(text: str) -> str:
+    """
+    Canonical form of a user message for cache keys.
+
+    Case, accents, punctuation, emoji and whitespace are dropped and long
+    character runs squashed, so 'Hola!!', 'hola' and 'HOLAAA 👋' coincide.
+    """
+    words = [_REPEATED_CHARS_RE.sub(r"\1", word) for word in tokenize(text)]
+    return " ".join(words)
+
+
+def exact_message_key(text: str) -> str:
+    """
+    Cache key that only folds case and whitespace.
+
+    Used by the jailbreak guardrail, where punctuation and symbols are the
+    payload: 'ignore {rules}' and 'ignore rules;' must not share a verdict.
+    """
+    return " ".join(text.split()).casefold()
+
+
+def is_trivial_message(normalized: str) -> bool:
+    """True for messages that never need an LLM guardrail."""
+    return normalized in TRIVIAL_MESSAGES
+
+
+def has_code_symbols(text: str) -> bool:
+    """True when ``text`` contains symbols used in code or injection payloads."""
+    return bool(_CODE_SYMBOLS_RE.search(text))
+
+
+def _item_text(item: Any) -> str:
+    """Plain text of a message input item (string or list-of-parts content)."""
+    content = item.get("content")
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        parts: List[str] = [part.get("text", "") for part in content if isinstance(part, dict)]
+        return " ".join(p for p in parts if p)
+    return ""
+
+
+def latest_user_message(input: Any) -> str:
+    """Text of the most recent user message in a guardrail input."""
+    if isinstance(input, str):
+        return input
+    for item in reversed(list(input or [])):
+        if isinstance(item, dict) and item.get("role") == "user":
+            return _item_text(item)
+    return ""
+
+
+def guardrail_input(input: Any, context_chars: int = 300) -> List[dict]:
+    """
+    Minimal guardrail input: the latest user message, preceded by a truncated
+    copy of the assistant reply it answers (so 'sí' or '200 pesos' keep their
+    meaning). Size is independent of conversation length.
+    """
+    if isinstance(input, str):
+        return [{"role": "user", "content": input}]
+    items = list(input or [])
+    user_index = next(
+        (i for i in range(len(items) - 1, -1, -1)
+         if isinstance(items[i], dict) and items[i].get("role") == "user"),
+        None,
+    )
+    if user_index is None:
+        return items[-1:]
+    trimmed = [{"role": "user", "content": _item_text(items[user_index])}]
+    if context_chars > 0:
+        for item in reversed(items[:user_index]):
+            if isinstance(item, dict) and item.get("role") == "assistant":
+                previous = " ".join(_item_text(item).split())
+                if previous:
+                    if len(previous) > context_chars:
+                        previous = previous[:context_chars].rstrip() + "…"
+                    trimmed.insert(0, {"role": "assistant", "content": previous})
+                break
+    return trimmed
+
+
+def context_key(message_key: str, trimmed_input: List[dict]) -> str:
+    """
+    Cache key for a guardrail input from ``guardrail_input``. When the
+    previous assistant reply is sent as context, its digest is part of the
+    key: 'sí' answering different questions must not share a verdict.
+    """
+    context = " ".join(_item_text(item) for item in trimmed_input[:-1])
+    if not context:
+        return message_key
+    return f"{message_key}\0{hashlib.sha1(context.encode('utf-8')).hexdigest()[:16]}"
+
+
+class GuardrailVerdictCache:
+    """
+    Verdicts keyed on (guardrail name, message key). The key is chosen per
+    guardrail: ``normalize_message`` for relevance, ``exact_message_key``
+    for jailbreak detection.
+    """
+
+    def __init__(self, max_size: int = 4096, ttl_seconds: float = 3600):
+        self._cache: TTLCache[Tuple[Any, bool]] = TTLCache(max_size, ttl_seconds)
+        self.fast_path_hits = 0
+
+    def get(self, guardrail: str, key: str) -> Optional[Tuple[Any, bool]]:
+        """Cached (output_info, tripwire_triggered), or None."""
+        return self._cache.get((guardrail, key))
+
+    def set(self, guardrail: str, key: str, output_info: Any, tripwire_triggered: bool) -> None:
+        self._cache.set((guardrail, key), (output_info, tripwire_triggered))
+
+    def record_fast_path(self) -> None:
+        self.fast_path_hits += 1
+
+    def stats(self) -> dict:
+        return {**self._cache.stats(), "fast_path_hits": self.fast_path_hits}
+
+
+GUARDRAIL_CACHE = GuardrailVerdictCache(
+    max_size=int(os.getenv("GUARDRAIL_CACHE_MAX_SIZE", "4096")),
+    ttl_seconds=float(os.getenv("GUARDRAIL_CACHE_TTL_SECONDS", "3600")),
+)
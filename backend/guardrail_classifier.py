@@ -0,0 +1,113 @@
+"""
+Local first-tier guardrail classifier.
+Rule-based jailbreak detection plus a lexical relevance model built from catalog vocabulary;
+only messages it is unsure about are escalated to the LLM guardrails.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Iterable, Optional, Set
+
+from catalog_index import CatalogIndex, fold_text, search_terms
+
+# Obvious prompt-injection / code-injection attempts (matched on folded, lowercased text)
+JAILBREAK_PATTERNS = [re.compile(p) for p in (
+    r"system\s*prompt", r"prompt\s+del\s+sistema", r"developer\s+mode", r"jailbreak",
+    r"\bdan\b.*\bmode\b",
+    r"ignore\s+(all\s+)?(the\s+)?(previous|prior|above)\s+(instructions|rules)",
+    r"ignora\s+(todas\s+)?(las\s+)?(instrucciones|reglas)",
+    r"olvida\s+(todas\s+)?(tus|las)\s+(instrucciones|reglas)",
+    r"(reveal|show|print|repeat)\s+(me\s+)?(your|the)\s+(prompt|instructions|rules)",
+    r"(muestra|revela|dime|repite)(me)?\s+(tus|las)\s+(instrucciones|reglas)",
+    r"(cuales|what)\s+(son\s+tus|are\s+your)\s+(instrucciones|instructions)",
+    r"\bdrop\s+table\b", r"\bdelete\s+from\b", r"\bunion\s+select\b", r"\bselect\s+\*\s+from\b",
+    r"\binsert\s+into\b", r"<\s*script", r"\brm\s+-rf\b", r"\bos\.system\b", r"\beval\s*\(",
+    r"\bexec\s*\(", r"__import__", r";\s*--",
+)]
+
+# Characters and words that make a message worth a closer (LLM) look
+SUSPICIOUS_RE = re.compile(r"[<>{}`\\|;]|\b(prompt|instruc\w*|pretend|finge|roleplay|bypass|override)\b")
+
+# Requests aimed at the assistant itself rather than at the catalog ("escribe un poema sobre termos")
+ASSISTANT_DIRECTED_RE = re.compile(
+    r"\b(escribe\w*|redacta\w*|inventa\w*|cuenta(me)?|dime|explica\w*|traduce\w*|resume\w*|responde\w*|"
+    r"actua\w*|comportate|imagina\w*|finge|olvida\w*|ignora\w*|eres|sin\s+restricciones|configuracion|"
+    r"write|tell|explain|translate|act|pretend|forget|ignore|you\s+are)\b"
+)
+
+# Domain words that rarely appear in catalog text but are clearly on-topic
+DOMAIN_WORDS = (
+    "producto productos promocional promocionales regalo regalos obsequio corporativo corporativos "
+    "empresa empresarial evento eventos marca logo logotipo personalizar personalizado personalizados "
+    "grabado impresion bordado cotizacion cotizar precio precios presupuesto costo pesos mxn "
+    "cantidad piezas unidades pedido mayoreo entrega envio catalogo opciones modelo modelos color colores "
+    "busco buscando quiero necesito tienen tienes muestra muestrame recomienda recomiendas ideas "
+    "kit kits promoselect suitup clientes colaboradores empleados navidad aniversario"
+)
+
+
+def catalog_vocabulary(indexes: Iterable[CatalogIndex], min_document_frequency: int = 2) -> Set[str]:
+    """Domain words plus the terms found in at least ``min_document_frequency`` rows of any catalog."""
+    vocabulary = set(search_terms(DOMAIN_WORDS))
+    for index in indexes:
+        vocabulary |= index.vocabulary(min_document_frequency)
+    return vocabulary
+
+
+@dataclass
+class LocalVerdict:
+    """Local decision: ``passed`` is None when the classifier is not confident."""
+    passed: Optional[bool]
+    score: float
+    reasoning: str
+
+
+class LocalGuardrailClassifier:
+    """
+    Cheap pre-classifier that decides clear-cut cases without an LLM.
+
+    Relevance is the share of a message's content words found in the catalog
+    vocabulary (terms present in at least ``min_document_frequency`` rows)
+    plus a small list of domain words. A message only passes locally when
+    nearly all of it is catalog vocabulary and it asks nothing of the
+    assistant itself, so product words mixed into an off-topic request or an
+    injection do not carry it. The jailbreak check never passes a message:
+    it blocks known patterns and leaves everything else to the LLM.
+    """
+
+    def __init__(self, vocabulary: Set[str], relevance_threshold: float = 0.8):
+        self.vocabulary = vocabulary
+        self.relevance_threshold = relevance_threshold
+
+    @classmethod
+    def from_catalogs(cls, indexes: Iterable[CatalogIndex], min_document_frequency: int = 2, **kwargs) -> "LocalGuardrailClassifier":
+        return cls(catalog_vocabulary(indexes, min_document_frequency), **kwargs)
+
+    def update_catalogs(self, indexes: Iterable[CatalogIndex], min_document_frequency: int = 2) -> None:
+        """Replace the vocabulary with the one of newly loaded catalogs."""
+        self.vocabulary = catalog_vocabulary(indexes, min_document_frequency)
+
+    def relevance_score(self, message: str) -> float:
+        """Fraction of content words (numbers and 1-2 letter words excluded) known to the catalog."""
+        terms = [t for t in search_terms(message) if not t.isdigit() and len(t) > 2]
+        if not terms:
+            return 0.0
+        return sum(term in self.vocabulary for term in terms) / len(terms)
+
+    def check_relevance(self, message: str) -> LocalVerdict:
+        score = self.relevance_score(message)
+        if ASSISTANT_DIRECTED_RE.search(fold_text(message)):
+            return LocalVerdict(None, score, "Pide algo al asistente; requiere revisión.")
+        if score >= self.relevance_threshold:
+            return LocalVerdict(True, score, "El mensaje usa vocabulario del catálogo de productos.")
+        return LocalVerdict(None, score, "Relevancia incierta.")
+
+    def check_jailbreak(self, message: str) -> LocalVerdict:
+        text = " ".join(fold_text(message).split())
+        for pattern in JAILBREAK_PATTERNS:
+            if pattern.search(text):
+                return LocalVerdict(False, 1.0, f"Coincide con un patrón de jailbreak conocido ({pattern.pattern}).")
+        # Product words say nothing about intent, so there is no local pass here
+        if SUSPICIOUS_RE.search(text):
+            return LocalVerdict(None, 0.5, "Contiene caracteres o palabras sospechosas.")
+        return LocalVerdict(None, 0.0, "Sin señales claras.")
@@ -0,0 +1,155 @@
+"""
+Token-budgeted history compaction.
+Builds the model input for a turn from the full conversation history: old tool outputs are
+stubbed and, past the budget, old turns are folded into a rolling summary cached per conversation.
+"""
+
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Rough size of a token in characters (Spanish/English text, JSON-ish tool output)
+CHARS_PER_TOKEN = 4
+
+SUMMARY_PREFIX = "Resumen de la conversación anterior (los datos guardados del cliente siguen vigentes): "
+
+Summarizer = Callable[[str, str], Awaitable[str]]
+
+
+def estimate_tokens(item: Any) -> int:
+    """Approximate token count of an input item."""
+    return len(json.dumps(item, ensure_ascii=False, default=str)) // CHARS_PER_TOKEN + 1
+
+
+def _content_text(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return " ".join(p.get("text", "") for p in content if isinstance(p, dict) and p.get("text"))
+    return ""
+
+
+def _is_user_message(item: Any) -> bool:
+    return isinstance(item, dict) and item.get("role") == "user"
+
+
+def transcript(items: List[Any], max_chars_per_item: int = 400) -> str:
+    """Plain-text rendering of input items for the summarizer."""
+    lines: List[str] = []
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        kind = item.get("type")
+        if kind == "function_call":
+            text = f"[herramienta] {item.get('name', '')}({item.get('arguments', '')})"
+        elif kind == "function_call_output":
+            text = f"[resultado] {item.get('output', '')}"
+        elif item.get("role"):
+            text = f"{item['role']}: {_content_text(item.get('content'))}"
+        else:
+            continue
+        text = " ".join(str(text).split())
+        if len(text) > max_chars_per_item:
+            text = text[:max_chars_per_item].rstrip() + "…"
+        lines.append(text)
+    return "\n".join(lines)
+
+
+def local_summary(previous: str, items: List[Any], max_chars: int = 1200) -> str:
+    """Extractive fallback summary: the customer's own messages, newest kept when truncating."""
+    requests = [" ".join(_content_text(i.get("content")).split()) for i in items if _is_user_message(i)]
+    text = " | ".join([previous] + requests if previous else requests)
+    return text[-max_chars:]
+
+
+class HistoryCompactor:
+    """
+    Fits a conversation history into ``token_budget`` (approximate tokens).
+
+    1. Tool outputs older than the last ``keep_turns`` user turns are cut to
+       ``tool_output_chars`` characters (call/output pairs are kept).
+    2. If the history is still over budget, the oldest turns are folded into
+       a rolling summary until it fits in ``fold_ratio`` of the budget, so
+       the (slow) summarizer runs once per several turns rather than every
+       turn. The last ``keep_turns`` turns are never folded unless they alone
+       exceed the budget.
+
+    The summary state ``{"covered": n, "text": ...}`` says the first ``n``
+    history items are represented by ``text``; callers store it with the
+    conversation and pass it back next turn. Agent context slots are not part
+    of the history and are never touched.
+    """
+
+    def __init__(
+        self,
+        summarizer: Optional[Summarizer] = None,
+        token_budget: int = 6000,
+        keep_turns: int = 4,
+        tool_output_chars: int = 300,
+        fold_ratio: float = 0.6,
+    ):
+        self.summarizer = summarizer
+        self.token_budget = token_budget
+        self.keep_turns = keep_turns
+        self.tool_output_chars = tool_output_chars
+        self.fold_ratio = fold_ratio
+
+    def _stub(self, item: Any) -> Any:
+        if isinstance(item, dict) and item.get("type") == "function_call_output":
+            output = item.get("output")
+            if isinstance(output, str) and len(output) > self.tool_output_chars:
+                omitted = len(output) - self.tool_output_chars
+                return {**item, "output": f"{output[:self.tool_output_chars]}… [{omitted} caracteres omitidos]"}
+        return item
+
+    def _turn_starts(self, items: List[Any], start: int) -> List[int]:
+        return [i for i in range(start, len(items)) if _is_user_message(items[i])]
+
+    async def _summarize(self, previous: str, items: List[Any]) -> str:
+        if self.summarizer is not None:
+            try:
+                return await self.summarizer(previous, transcript(items))
+            except Exception as e:
+                logger.warning(f"History summarizer failed, using local summary: {e}")
+        return local_summary(previous, items)
+
+    async def compact(self, items: List[Any], summary: Optional[Dict[str, Any]] = None) -> Tuple[List[Any], Optional[Dict[str, Any]]]:
+        """
+        Build the model input for ``items`` (the full history, latest user message last).
+
+        Returns:
+            (model input items, summary state); the summary state is a new
+            dict when it changed this turn and the one passed in otherwise.
+        """
+        covered = summary["covered"] if summary and summary.get("covered", 0) <= len(items) else 0
+        summary_text = summary["text"] if covered else ""
+
+        turn_starts = self._turn_starts(items, covered)
+        recent_start = turn_starts[-self.keep_turns] if len(turn_starts) >= self.keep_turns else covered
+        compacted = [self._stub(item) for item in items[covered:recent_start]] + items[recent_start:]
+        sizes = [estimate_tokens(item) for item in compacted]
+        summary_tokens = len(summary_text) // CHARS_PER_TOKEN + 1 if summary_text else 0
+
+        if sum(sizes) + summary_tokens > self.token_budget and len(turn_starts) > 1:
+            # Fold whole turns, oldest first, until the rest fits the target
+            target = self.token_budget * self.fold_ratio
+            remaining = sum(sizes)
+            cut = covered
+            for start in turn_starts[1:]:
+                # Recent turns are only folded while still over the hard budget
+                if start > recent_start and remaining + summary_tokens <= self.token_budget:
+                    break
+                remaining -= sum(sizes[cut - covered:start - covered])
+                cut = start
+                if remaining + summary_tokens <= target:
+                    break
+            summary_text = await self._summarize(summary_text, items[covered:cut])
+            compacted = compacted[cut - covered:]
+            summary = {"covered": cut, "text": summary_text}
+            logger.info(f"Folded history items {covered}-{cut} into summary ({len(summary_text)} chars)")
+
+        if summary_text:
+            compacted = [{"role": "system", "content": SUMMARY_PREFIX + summary_text}] + compacted
+        return compacted, summary
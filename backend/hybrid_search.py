@@ -0,0 +1,107 @@
+"""
+Hybrid retrieval: BM25 keyword ranking + local vector search fused with reciprocal-rank fusion.
+Shared by the product and kit search tools.
+
+The lexical and semantic legs run one after the other on the calling thread
+rather than concurrently. The tools already call ``search`` on a
+SEARCH_EXECUTOR worker; submitting the semantic leg to that same bounded pool
+could deadlock once every worker waits on a nested task, and both legs are
+single array operations over an in-memory index, so running them in parallel
+would save little.
+"""
+
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from catalog_index import CatalogIndex
+from vector_index import LocalVectorIndex
+
+logger = logging.getLogger(__name__)
+
+# Standard RRF constant: dampens the advantage of the very top ranks
+RRF_K = 60
+
+# Cosine floor for vector candidates. The hashed n-gram embedder gives any query with a shared
+# n-gram a small positive score, so without a floor nonsense queries always "match" something
+VECTOR_MIN_SCORE = 0.3
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[int]],
+    k: int = RRF_K,
+    weights: Optional[Sequence[float]] = None,
+) -> List[Tuple[int, float]]:
+    """
+    Fuse ranked lists of row ids: score(row) = sum(weight / (k + rank)).
+
+    Returns (row, score) pairs sorted by fused score; ties keep the order in
+    which rows were first seen.
+    """
+    weights = weights or [1.0] * len(rankings)
+    fused: Dict[int, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, row in enumerate(ranking, 1):
+            fused[row] = fused.get(row, 0.0) + weight / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+class HybridRetriever:
+    """Single retrieval pipeline over one catalog's keyword and vector indexes."""
+
+    def __init__(
+        self,
+        index: CatalogIndex,
+        vectors: Optional[LocalVectorIndex],
+        depth: int = 50,
+        rrf_k: int = RRF_K,
+        min_score: float = VECTOR_MIN_SCORE,
+    ):
+        self.index = index
+        self.vectors = vectors
+        self.depth = depth
+        self.rrf_k = rrf_k
+        self.min_score = min_score
+
+    def _lexical(self, query: str, mask, expansions: Iterable[str]) -> List[int]:
+        return self.index.rank(query, mask, self.depth, expansions=expansions).tolist()
+
+    def _semantic(self, query: str, mask) -> List[int]:
+        if self.vectors is None or self.vectors.size != self.index.size:
+            return []
+        return [row for row, _ in self.vectors.search(query, self.depth, mask, self.min_score)]
+
+    def search(
+        self,
+        query: str,
+        min_price: float | None = None,
+        max_price: float | None = None,
+        limit: int = 3,
+        expansions: Iterable[str] = (),
+    ) -> List[int]:
+        """
+        Row ids of the best matches for ``query`` within the price range.
+
+        The price range is applied as a mask before candidate generation, so
+        both rankings only ever contain affordable rows. Both legs run on the
+        calling thread (a SEARCH_EXECUTOR worker for the tools), so a search
+        stays within that pool's bound and timeout.
+        """
+        if self.index.empty or limit <= 0:
+            return []
+        mask = self.index.price_mask(min_price, max_price)
+        if not mask.any():
+            return []
+
+        rankings = [self._lexical(query, mask, list(expansions)), self._semantic(query, mask)]
+
+        fused = reciprocal_rank_fusion(rankings, self.rrf_k)
+        logger.info(
+            f"Hybrid search '{query}': {len(rankings[0])} lexical + {len(rankings[1])} vector candidates, "
+            f"{len(fused)} fused"
+        )
+        return [row for row, _ in fused[:limit]]
+
+    def search_records(self, query: str, min_price: float | None = None, max_price: float | None = None,
+                       limit: int = 3, expansions: Iterable[str] = ()) -> List[Dict]:
+        """Like ``search`` but returns result dicts."""
+        return self.index.records(self.search(query, min_price, max_price, limit, expansions))
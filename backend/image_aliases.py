@@ -0,0 +1,119 @@
+"""
+Image URL aliases.
+Catalog image links are signed Airtable URLs several hundred characters long. Everything the
+model reads (tool outputs, vector store documents, and so the stored history) carries short
+stable handles such as ``img:ps22706-tl_035-1`` instead; the API expands them back to URLs
+before anything reaches the client.
+"""
+
+import logging
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from catalog_index import CatalogIndex, fold_text
+
+logger = logging.getLogger(__name__)
+
+IMAGE_URL_RE = re.compile(r"https?://[^\s,()]+")
+
+# img:<row key>-<image number>; the greedy key backtracks to the last "-<digits>". Models
+# sometimes echo handles in upper case, so matching ignores case and slugs are lowered.
+IMAGE_HANDLE_RE = re.compile(r"img:([a-z0-9_.-]+)-(\d+)", re.IGNORECASE)
+
+
+def image_urls(value: Any) -> List[str]:
+    """Image URLs in a catalog cell (comma-separated URLs or Airtable 'file.png (url)' attachments)."""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return []
+    return IMAGE_URL_RE.findall(str(value))
+
+
+def handle_key(key: Any) -> str:
+    """Handle-safe form of a row key (SKU or kit name): 'PS22706-TL 035' -> 'ps22706-tl_035'."""
+    return re.sub(r"[^a-z0-9.-]+", "_", fold_text(str(key))).strip("_.-")
+
+
+def image_handles(key: Any, value: Any) -> List[str]:
+    """Handles for the images of one catalog row."""
+    slug = handle_key(key) if key is not None and not pd.isna(key) else ""
+    if not slug:
+        return []
+    return [f"img:{slug}-{n}" for n in range(1, len(image_urls(value)) + 1)]
+
+
+class ImageAliasTable:
+    """
+    Resolves image handles of one catalog back to URLs.
+
+    Handles are derived from the row key alone, so they stay valid across
+    catalog reloads as long as the row keeps its key. The key -> row map is
+    built on first use and image cells are only decoded for the rows asked
+    for (they live in the catalog's lazy side table).
+    """
+
+    def __init__(self, index: CatalogIndex, key_column: str, image_column: str):
+        self.index = index
+        self.key_column = key_column
+        self.image_column = image_column
+        self._rows: Optional[Dict[str, int]] = None
+
+    def _row_map(self) -> Dict[str, int]:
+        if self._rows is None:
+            rows: Dict[str, int] = {}
+            if self.key_column in self.index.df.columns:
+                for row, key in enumerate(self.index.df[self.key_column]):
+                    if not pd.isna(key):
+                        rows.setdefault(handle_key(key), row)
+            self._rows = rows
+        return self._rows
+
+    def handles(self, record: Dict[str, Any]) -> List[str]:
+        """Handles for a result record of this catalog."""
+        return image_handles(record.get(self.key_column), record.get(self.image_column))
+
+    def aliased_frame(self) -> pd.DataFrame:
+        """Catalog frame (side columns decoded) with image URLs replaced by their handles."""
+        df = self.index.full_frame()
+        if self.image_column not in df.columns or self.key_column not in df.columns:
+            return df
+        handles = [
+            ", ".join(image_handles(key, value)) for key, value in zip(df[self.key_column], df[self.image_column])
+        ]
+        return df.assign(**{self.image_column: handles})
+
+    def resolve(self, slug: str, number: int) -> Optional[str]:
+        """URL of image ``number`` (1-based) of the row with key ``slug``, or None."""
+        row = self._row_map().get(slug)
+        if row is None or number < 1:
+            return None
+        record = self.index.records([row], [self.image_column])
+        urls = image_urls(record[0].get(self.image_column)) if record else []
+        return urls[number - 1] if number <= len(urls) else None
+
+
+def expand_handles(value: Any, tables: Iterable[ImageAliasTable]) -> Any:
+    """
+    Replace image handles with URLs in a string, or in the strings of a
+    (nested) list/dict. Handles no catalog knows are left as they are.
+    """
+    tables = [table for table in tables if table is not None]
+    if isinstance(value, str):
+        if "img:" not in value.lower():
+            return value
+
+        def _url(match: re.Match) -> str:
+            for table in tables:
+                url = table.resolve(match.group(1).lower(), int(match.group(2)))
+                if url is not None:
+                    return url
+            logger.debug(f"Unknown image handle {match.group(0)}")
+            return match.group(0)
+
+        return IMAGE_HANDLE_RE.sub(_url, value)
+    if isinstance(value, list):
+        return [expand_handles(item, tables) for item in value]
+    if isinstance(value, dict):
+        return {key: expand_handles(item, tables) for key, item in value.items()}
+    return value
@@ -1,5 +1,6 @@
 from __future__ import annotations as _annotations
 
+import os
 import random
 from pydantic import BaseModel
 import string
@@ -23,10 +24,24 @@ from agents.extensions.handoff_prompt import RECOMMENDED_PROMPT_PREFIX
 # Import the advanced search tools (precise + fuzzy search strategy)
 from tools import (
     search_and_format_products,
+    search_and_format_kits,
     get_product_info,
-    promo_file_search,
-    suitup_file_search,
+    add_catalog_listener,
+    file_search_tools,
 )
+from guardrail_cache import (
+    GUARDRAIL_CACHE,
+    context_key,
+    exact_message_key,
+    guardrail_input,
+    has_code_symbols,
+    is_trivial_message,
+    latest_user_message,
+    normalize_message,
+)
+from guardrail_classifier import LocalGuardrailClassifier
+from slot_extraction import SlotExtractor, format_price_range, parse_price_range
+from history_compaction import HistoryCompactor
 
 # =========================
 # CONTEXT
@@ -34,15 +49,19 @@ from tools import (
 
 class PromoProAgentContext(BaseModel):
     """Context for promotional products agents."""
+    conversation_id: str | None = None
     business_unit: str | None = None  # "promoselect" or "suitup"
     customer_name: str | None = None
     selected_products: list[dict] = []
     descripcion: str | None = None  # Product description/type they're looking for
     precio: str | None = None  # Budget/price range as string
+    categoria: str | None = None  # Catalog category guessed for descripcion
+    min_price: float | None = None  # Numeric budget parsed from precio
+    max_price: float | None = None
 
-def create_initial_context() -> PromoProAgentContext:
+def create_initial_context(conversation_id: str | None = None) -> PromoProAgentContext:
     """Factory for a new PromoProAgentContext."""
-    return PromoProAgentContext()
+    return PromoProAgentContext(conversation_id=conversation_id)
 
 # =========================
 # TOOLS
@@ -66,6 +85,8 @@ async def save_product_description(
 ) -> str:
     """Save the product description to context."""
     context.context.descripcion = descripcion
+    product = slot_extractor.product_type(descripcion)
+    context.context.categoria = product[1] if product else None
     return f"Guardado: buscando {descripcion}"
 
 @function_tool(
@@ -78,8 +99,46 @@ async def save_budget(
 ) -> str:
     """Save the budget/price range to context."""
     context.context.precio = precio
+    # The search tools filter on the numeric range; a budget without one ("lo más barato") lifts it
+    price_range = parse_price_range(precio, expecting_budget=True)
+    context.context.min_price, context.context.max_price = price_range if price_range is not None else (None, None)
     return f"Guardado: presupuesto {precio}"
 
+# =========================
+# SLOTS
+# =========================
+
+# Budget and product type read from the customer's messages before each run (see api.py),
+# so the agents only call save_* when the local extraction could not fill a slot
+slot_extractor = SlotExtractor.from_catalogs([])
+add_catalog_listener(
+    lambda catalogs: slot_extractor.update_catalogs([catalogs.promo_index, catalogs.suitup_index])
+)
+
+def captured_slots(context: PromoProAgentContext) -> str:
+    """Prompt note listing the slots already filled, or "" when none are."""
+    slots = []
+    if context.descripcion:
+        slots.append(f"- descripcion: {context.descripcion}")
+    if context.min_price is not None or context.max_price is not None:
+        slots.append(f"- precio: {format_price_range(context.min_price, context.max_price)}")
+    elif context.precio:
+        slots.append(f"- precio: {context.precio}")
+    if not slots:
+        return ""
+    return (
+        "\n    Already captured from the customer's messages (the search tools apply the budget automatically;"
+        " only call save_budget if the customer changes it). The description is the product phrase as the"
+        " customer wrote it: call save_product_description only to add details it misses or when the customer"
+        " changes what they are looking for.\n    " + "\n    ".join(slots) + "\n"
+    )
+
+def with_captured_slots(instructions: str):
+    """Dynamic agent instructions: the static prompt plus the slots captured so far."""
+    def _instructions(context: RunContextWrapper[PromoProAgentContext], agent: Agent) -> str:
+        return instructions + captured_slots(context.context)
+    return _instructions
+
 # =========================
 # HOOKS
 # =========================
@@ -96,6 +155,74 @@ async def on_suitup_handoff(context: RunContextWrapper[PromoProAgentContext]) ->
 # GUARDRAILS
 # =========================
 
+# "tiered": local classifier first, LLM only when it is unsure. "llm": always ask the LLM.
+GUARDRAIL_MODE = os.getenv("GUARDRAIL_MODE", "tiered")
+
+# Characters of the previous assistant reply sent to LLM guardrails as context (0 = none)
+GUARDRAIL_CONTEXT_CHARS = int(os.getenv("GUARDRAIL_CONTEXT_CHARS", "300"))
+
+# Domain words only until the catalogs finish loading in the background
+local_guardrail_classifier = LocalGuardrailClassifier.from_catalogs([])
+add_catalog_listener(
+    lambda catalogs: local_guardrail_classifier.update_catalogs([catalogs.promo_index, catalogs.suitup_index])
+)
+
+class GuardrailVerdict(BaseModel):
+    """Guardrail outcome reported to the API, including which tier decided it."""
+    reasoning: str
+    passed: bool
+    tier: str  # "fast_path", "cache", "local" or "llm"
+
+async def _tiered_guardrail_check(
+    checker: Agent,
+    input: str | list[TResponseInputItem],
+    context: RunContextWrapper,
+    output_type: type[BaseModel],
+    verdict_field: str,
+    local_check,
+    message_key=normalize_message,
+) -> GuardrailFunctionOutput:
+    """
+    Evaluate the latest user message, escalating through cheaper tiers first.
+
+    1. Fast path: trivial conversational and UI-generated messages pass.
+    2. Cache: earlier verdicts for the same ``message_key`` (and the same
+       assistant context, when one is sent) are reused.
+    3. Local: the rule/lexical classifier decides clear-cut cases.
+    4. LLM: the guardrail agent decides the rest; its verdict is cached.
+       It only sees the latest user turn, after a truncated copy of the
+       assistant reply it answers, not the whole history.
+    """
+    text = latest_user_message(input)
+    # Symbols never make a message trivial ("ok;" or "hola {{...}}" still get checked)
+    if is_trivial_message(normalize_message(text)) and not has_code_symbols(text):
+        GUARDRAIL_CACHE.record_fast_path()
+        verdict = GuardrailVerdict(reasoning="Mensaje conversacional o de la interfaz.", passed=True, tier="fast_path")
+        return GuardrailFunctionOutput(output_info=verdict, tripwire_triggered=False)
+
+    trimmed_input = guardrail_input(input, GUARDRAIL_CONTEXT_CHARS)
+    message = message_key(text)
+    key = context_key(message, trimmed_input) if message else ""
+    cached = GUARDRAIL_CACHE.get(checker.name, key) if key else None
+    if cached is not None:
+        verdict, tripped = cached
+        verdict = verdict.model_copy(update={"tier": "cache"})
+        return GuardrailFunctionOutput(output_info=verdict, tripwire_triggered=tripped)
+
+    if GUARDRAIL_MODE == "tiered":
+        local = local_check(text)
+        if local.passed is not None:
+            verdict = GuardrailVerdict(reasoning=local.reasoning, passed=local.passed, tier="local")
+            return GuardrailFunctionOutput(output_info=verdict, tripwire_triggered=not local.passed)
+
+    result = await Runner.run(checker, trimmed_input, context=context.context)
+    final = result.final_output_as(output_type)
+    passed = bool(getattr(final, verdict_field))
+    verdict = GuardrailVerdict(reasoning=final.reasoning, passed=passed, tier="llm")
+    if key:
+        GUARDRAIL_CACHE.set(checker.name, key, verdict, not passed)
+    return GuardrailFunctionOutput(output_info=verdict, tripwire_triggered=not passed)
+
 class RelevanceOutput(BaseModel):
     """Schema for relevance guardrail decisions."""
     reasoning: str
@@ -119,10 +246,10 @@ guardrail_agent = Agent(
 async def relevance_guardrail(
     context: RunContextWrapper[None], agent: Agent, input: str | list[TResponseInputItem]
 ) -> GuardrailFunctionOutput:
-    """Guardrail to check if input is relevant to airline topics."""
-    result = await Runner.run(guardrail_agent, input, context=context.context)
-    final = result.final_output_as(RelevanceOutput)
-    return GuardrailFunctionOutput(output_info=final, tripwire_triggered=not final.is_relevant)
+    """Guardrail to check if input is relevant to promotional products."""
+    return await _tiered_guardrail_check(
+        guardrail_agent, input, context, RelevanceOutput, "is_relevant", local_guardrail_classifier.check_relevance
+    )
 
 class JailbreakOutput(BaseModel):
     """Schema for jailbreak guardrail decisions."""
@@ -150,9 +277,41 @@ async def jailbreak_guardrail(
     context: RunContextWrapper[None], agent: Agent, input: str | list[TResponseInputItem]
 ) -> GuardrailFunctionOutput:
     """Guardrail to detect jailbreak attempts."""
-    result = await Runner.run(jailbreak_guardrail_agent, input, context=context.context)
-    final = result.final_output_as(JailbreakOutput)
-    return GuardrailFunctionOutput(output_info=final, tripwire_triggered=not final.is_safe)
+    return await _tiered_guardrail_check(
+        jailbreak_guardrail_agent, input, context, JailbreakOutput, "is_safe", local_guardrail_classifier.check_jailbreak,
+        # Symbols are the payload here, so only case and whitespace are folded
+        message_key=exact_message_key,
+    )
+
+# =========================
+# HISTORY COMPACTION
+# =========================
+
+history_summarizer_agent = Agent(
+    name="History Summarizer",
+    model="gpt-4.1-mini",
+    instructions=(
+        "Resume conversaciones entre un cliente y un asistente de ventas de productos promocionales. "
+        "Actualiza el resumen previo con la nueva parte de la conversación. "
+        "Conserva lo que el cliente busca, cantidades, presupuesto, fechas, productos o SKUs que le interesaron "
+        "y decisiones tomadas; omite saludos, URLs de imágenes y listados completos de resultados. "
+        "Responde solo con el resumen en español, en menos de 150 palabras."
+    ),
+)
+
+async def summarize_history(previous_summary: str, transcript: str) -> str:
+    """Fold a transcript of old turns into the rolling conversation summary."""
+    prompt = f"Resumen previo:\n{previous_summary or '(ninguno)'}\n\nNueva parte de la conversación:\n{transcript}"
+    result = await Runner.run(history_summarizer_agent, prompt)
+    return str(result.final_output).strip()
+
+# Approximate token budget for the history sent to the agents each turn
+history_compactor = HistoryCompactor(
+    summarize_history,
+    token_budget=int(os.getenv("HISTORY_TOKEN_BUDGET", "6000")),
+    keep_turns=int(os.getenv("HISTORY_KEEP_TURNS", "4")),
+    tool_output_chars=int(os.getenv("HISTORY_TOOL_OUTPUT_CHARS", "300")),
+)
 
 # =========================
 # AGENTS
@@ -162,31 +321,32 @@ promoselect_agent = Agent[PromoProAgentContext](
     name="Promoselect Agent",
     model="gpt-4.1",
     handoff_description="A helpful agent that can search for individual promotional products from Promoselect.",
-    instructions=f"""{RECOMMENDED_PROMPT_PREFIX}
+    instructions=with_captured_slots(f"""{RECOMMENDED_PROMPT_PREFIX}
     You are a friendly sales specialist at Promoselect, helping customers find perfect promotional products.
     Speak naturally as if you were a human sales representative who knows the catalog very well.
     Never mention technical details like search functions or database queries.
     
-    Search Strategy (VECTOR-ONLY APPROACH):
+    Search Strategy:
     1. First, ask what type of promotional product they're looking for, then use save_product_description tool
     2. Then ask about their budget or price range, then use save_budget tool
-    3. ONLY after you have both pieces of information (descripcion, precio), use your promo_file_search tool:
-       - This is the FileSearchTool that performs vector search on our product database
-       - Search using the descripcion from context as your query
-       - The tool finds products that match the semantic meaning of the request
+       (skip either step when that information is already listed as captured below)
+    3. ONLY after you have both pieces of information (descripcion, precio), use search_and_format_products:
+       - Search using the descripcion from context as the keyword
+       - It combines keyword and semantic search and applies the customer's budget automatically
+       - Always use it to show products; results are stored for follow-up questions
        
-    4. VECTOR SEARCH ONLY:
-       - Use promo_file_search tool directly - this is the FileSearchTool for semantic vector search
-       - Present results naturally as a sales representative would
-       - No fallback methods - pure vector search only
+    4. PRESENTING RESULTS:
+       - Results returned as cards are shown to the customer automatically: write only a short lead-in
+         (one or two sentences) and never repeat names, prices, descriptions or image links
+       - If you also have a file_search tool, use it only for catalog questions the cards and
+         get_product_info cannot answer (materials, uses, comparisons), never to list products
        
     5. FOLLOW-UP SUPPORT:
        - If customer asks for more details about a specific product, use get_product_info tool
        - This retrieves detailed information about products from the last search
-    
-    The new approach uses only vector search for maximum relevance and stores results for follow-up questions.
-    """,
-    tools=[save_product_description, save_budget, get_product_info] + ([promo_file_search] if promo_file_search else []),
+    """),
+    # Warmup adds the vector store FileSearchTool next to the local search (see use_file_search_tools)
+    tools=[save_product_description, save_budget, get_product_info, search_and_format_products],
     input_guardrails=[relevance_guardrail, jailbreak_guardrail],
 )
 
@@ -194,31 +354,31 @@ suitup_agent = Agent[PromoProAgentContext](
     name="SuitUp Agent", 
     model="gpt-4.1",
     handoff_description="A helpful agent that can search for promotional product kits from SuitUp.",
-    instructions=f"""{RECOMMENDED_PROMPT_PREFIX}
+    instructions=with_captured_slots(f"""{RECOMMENDED_PROMPT_PREFIX}
     You are a friendly sales specialist at SuitUp, helping customers find perfect promotional kits.
     Speak naturally as if you were a human sales representative who knows the catalog very well.
     Never mention technical details like search functions or database queries.
     
-    Search Strategy (VECTOR-ONLY APPROACH):
+    Search Strategy:
     1. First, ask what type of promotional kit they're looking for, then use save_product_description tool
     2. Then ask about their budget or price range, then use save_budget tool
-    3. ONLY after you have both pieces of information (descripcion, precio), use your suitup_file_search tool:
-       - This is the FileSearchTool that performs vector search on our kit database
-       - Search using the descripcion from context as your query
-       - The tool finds kits that match the semantic meaning of the request
+       (skip either step when that information is already listed as captured below)
+    3. ONLY after you have both pieces of information (descripcion, precio), use search_and_format_kits:
+       - Search using the descripcion from context as the keyword
+       - It combines keyword and semantic search and applies the customer's budget automatically
+       - Always use it to show kits; results are stored for follow-up questions
        
-    4. VECTOR SEARCH ONLY:
-       - Use suitup_file_search tool directly - this is the FileSearchTool for semantic vector search
-       - Present results naturally as a sales representative would
-       - No fallback methods - pure vector search only
+    4. PRESENTING RESULTS:
+       - Results returned as cards are shown to the customer automatically: write only a short lead-in
+         (one or two sentences) and never repeat names, prices, descriptions or image links
+       - If you also have a file_search tool, use it only for catalog questions the cards and
+         get_product_info cannot answer (contents, occasions, comparisons), never to list kits
        
     5. FOLLOW-UP SUPPORT:
        - If customer asks for more details about a specific kit, use get_product_info tool
        - This retrieves detailed information about kits from the last search
-    
-    The approach uses only vector search for maximum relevance and stores results for follow-up questions.
-    """,
-    tools=[save_product_description, save_budget, get_product_info] + ([suitup_file_search] if suitup_file_search else []),
+    """),
+    tools=[save_product_description, save_budget, get_product_info, search_and_format_kits],
     input_guardrails=[relevance_guardrail, jailbreak_guardrail],
 )
 
@@ -245,3 +405,21 @@ triage_agent = Agent[PromoProAgentContext](
 # Set up handoff relationships
 promoselect_agent.handoffs.append(triage_agent)
 suitup_agent.handoffs.append(triage_agent)
+
+
+def use_file_search_tools() -> bool:
+    """
+    Give the agents the vector-store FileSearchTools once warmup has resolved
+    them. The local search tools stay registered and remain the way results
+    are shown: they produce the cards, apply the parsed budget, store results
+    for get_product_info and run on the bounded search executor. Returns
+    False (agents unchanged) when vector search is unavailable.
+    """
+    promo_tool, suitup_tool = file_search_tools()
+    if promo_tool is None or suitup_tool is None:
+        return False
+    for agent, file_tool in ((promoselect_agent, promo_tool), (suitup_agent, suitup_tool)):
+        if file_tool not in agent.tools:
+            # New list, so runs already in flight keep the tools they started with
+            agent.tools = agent.tools + [file_tool]
+    return True
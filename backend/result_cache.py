@@ -0,0 +1,102 @@
+"""
+Per-conversation cache of recent search results for follow-up questions.
+Bounded LRU/TTL cache (ttl_cache.TTLCache) over conversations with O(1) lookups by name or SKU.
+Results are keyed by the catalog version they came from, so a reload makes them unreachable.
+"""
+
+import difflib
+import threading
+from typing import Any, Dict, List, Optional
+
+from catalog_index import tokenize
+from ttl_cache import TTLCache
+
+
+def normalize_key(text: str) -> str:
+    """Accent/case/punctuation-insensitive key ('☕ Kit Café Luno' -> 'kit cafe luno')."""
+    return " ".join(tokenize(str(text)))
+
+
+def _product_keys(product: Dict) -> set:
+    """Lookup keys for a product: its normalized SKU and name."""
+    return {normalize_key(product.get("sku", "")), normalize_key(product.get("nombre", ""))} - {""}
+
+
+class _ConversationResults:
+    """Recent results for one conversation, newest first."""
+
+    def __init__(self, max_results: int):
+        self.max_results = max_results
+        self.products: List[Dict] = []
+        self.by_key: Dict[str, Dict] = {}
+
+    def add(self, products: List[Dict]) -> None:
+        new_keys = set().union(*(_product_keys(p) for p in products)) if products else set()
+        # Newer results replace older entries for the same product
+        kept = [p for p in self.products if not (_product_keys(p) & new_keys)]
+        self.products = (list(products) + kept)[:self.max_results]
+        self.by_key = {}
+        for product in reversed(self.products):
+            for key in _product_keys(product):
+                self.by_key[key] = product
+
+    def find(self, query: str) -> Optional[Dict]:
+        key = normalize_key(query)
+        if not key:
+            return None
+        product = self.by_key.get(key)
+        if product is not None:
+            return product
+        # Partial name ("luno" for "Kit Café Luno"), newest results first
+        for product in self.products:
+            if key in normalize_key(product.get("nombre", "")):
+                return product
+        close = difflib.get_close_matches(key, list(self.by_key), n=1, cutoff=0.75)
+        return self.by_key[close[0]] if close else None
+
+
+class SearchResultCache:
+    """
+    Search results keyed by conversation and catalog version.
+
+    Holds at most ``max_conversations`` entries (least recently used are
+    evicted first) and drops a conversation's results ``ttl_seconds`` after
+    its latest search. Lookups always name the catalog version in use, so
+    follow-ups never see results from a reloaded-away catalog; those entries
+    are never read again and age out of the cache.
+    """
+
+    def __init__(self, max_conversations: int = 1000, ttl_seconds: float = 3600, max_results: int = 30):
+        self.max_results = max_results
+        self._cache: TTLCache[_ConversationResults] = TTLCache(max_conversations, ttl_seconds)
+        # Guards the result lists, which store() updates in place
+        self._lock = threading.Lock()
+
+    def store(self, conversation_key: str, products: List[Dict], catalog_version: int = 0) -> None:
+        """Remember ``products`` (found in ``catalog_version``) as the latest results for the conversation."""
+        if not products:
+            return
+        key = (conversation_key, catalog_version)
+        with self._lock:
+            results = self._cache.get(key) or _ConversationResults(self.max_results)
+            results.add(products)
+            # Setting again restarts the TTL
+            self._cache.set(key, results)
+
+    def lookup(self, conversation_key: str, query: str, catalog_version: int = 0) -> Optional[Dict]:
+        """Find a product by name or SKU among the conversation's recent results."""
+        with self._lock:
+            results = self._cache.get((conversation_key, catalog_version))
+            return results.find(query) if results else None
+
+    def has_results(self, conversation_key: str, catalog_version: int = 0) -> bool:
+        return self._cache.get((conversation_key, catalog_version)) is not None
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+    def __len__(self) -> int:
+        return len(self._cache)
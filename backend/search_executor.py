@@ -0,0 +1,134 @@
+"""
+Catalog search executor.
+Runs the CPU-bound catalog searches of the agent tools on a dedicated bounded thread pool, so a slow
+query neither blocks the event loop nor starves the loop's shared default executor. Each query has
+a timeout, excess load is rejected instead of queued without limit, and queue depth and latency
+are tracked for the admin endpoints.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SearchTimeout(Exception):
+    """The query did not finish within its timeout."""
+
+
+class SearchOverloaded(Exception):
+    """Every worker is busy and the queue is full."""
+
+
+class SearchExecutor:
+    """
+    Bounded thread pool for catalog searches.
+
+    At most ``max_workers`` searches run at once and ``max_queue`` more may
+    wait; further calls raise ``SearchOverloaded`` right away. ``run`` gives
+    up after ``timeout`` seconds (queue wait included) and raises
+    ``SearchTimeout``. A search that times out while queued is dropped;
+    Python threads cannot be interrupted, so one that is already running
+    holds its worker until it returns and keeps counting against the bound,
+    which is what stops repeated expensive queries from piling up.
+    """
+
+    def __init__(self, max_workers: int = 4, max_queue: int = 32, timeout: float = 5.0):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="catalog-search")
+        self._lock = threading.Lock()
+
+        self._pending = 0  # submitted and not yet returned (running + queued)
+        self._running = 0
+        self.peak_queued = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self._wait_seconds = 0.0
+        self._run_seconds = 0.0
+        self.max_run_seconds = 0.0
+
+    def _call(self, queued_at: float, fn: Callable[..., Any], args: tuple, kwargs: Dict[str, Any]) -> Any:
+        started = time.perf_counter()
+        with self._lock:
+            self._running += 1
+            self._wait_seconds += started - queued_at
+        ok = False
+        try:
+            result = fn(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._running -= 1
+                self._pending -= 1
+                self._run_seconds += elapsed
+                self.max_run_seconds = max(self.max_run_seconds, elapsed)
+                if ok:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+
+    async def run(self, fn: Callable[..., Any], *args: Any, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+        """
+        Run ``fn(*args, **kwargs)`` on the pool and await its result.
+
+        Raises:
+            SearchOverloaded: All workers busy and the queue full
+            SearchTimeout: No result within ``timeout`` (default: the executor's)
+        """
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise SearchOverloaded(f"{self._pending} searches in flight")
+            self._pending += 1
+            self.submitted += 1
+            self.peak_queued = max(self.peak_queued, self._pending - self.max_workers)
+        future = self._pool.submit(self._call, time.perf_counter(), fn, args, kwargs)
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout if timeout > 0 else None)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            name = getattr(fn, "__name__", repr(fn))
+            logger.warning(f"Search {name} timed out after {timeout:.1f}s")
+            raise SearchTimeout(f"{name} timed out after {timeout:.1f}s") from None
+        finally:
+            # Timed out or cancelled while still queued: it never runs, so release its slot here
+            if future.cancelled():
+                with self._lock:
+                    self._pending -= 1
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            started = self.completed + self.failed + self._running
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "timeout": self.timeout,
+                "running": self._running,
+                "queued": self._pending - self._running,
+                "peak_queued": self.peak_queued,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "timeouts": self.timeouts,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(1000 * self._wait_seconds / started, 2) if started else 0.0,
+                "avg_run_ms": round(1000 * self._run_seconds / (self.completed + self.failed), 2)
+                if self.completed + self.failed else 0.0,
+                "max_run_ms": round(1000 * self.max_run_seconds, 2),
+            }
@@ -0,0 +1,271 @@
+"""
+Local slot extraction.
+Fills the budget (numeric min/max price) and product type slots of the agent context straight
+from the customer's message, so the agents do not spend model turns on save_* tool calls and the
+search tools get a numeric price range to filter on.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from catalog_index import STOPWORDS, CatalogIndex, fold_text, stem, tokenize
+
+# Category words too generic to identify a product type
+GENERIC_CATEGORY_WORDS = {"acc", "todo", "otros", "marcas", "sets", "set", "personal", "casa", "y"}
+
+# Common words for a product type that differ from the catalog's category names
+CATEGORY_SYNONYMS = {
+    "pluma": "Bolígrafos", "boligrafo": "Bolígrafos", "lapicero": "Bolígrafos",
+    "cuaderno": "Libretas", "libreta": "Libretas", "agenda": "Agendas",
+    "botella": "Termos", "cilindro": "Cilindros", "termo": "Termos",
+    "playera": "Playeras", "camiseta": "Playeras", "camisa": "Playeras", "polo": "Playeras",
+    "memoria": "Usb", "bocina": "Audio", "audifono": "Audio", "sombrilla": "Paraguas",
+    "mug": "Tazas", "vaso": "Vasos", "tarro": "Tarros", "hielera": "Hieleras",
+}
+
+# Words that end the product phrase of a message: the budget, quantity or purpose follows them
+_PHRASE_STOP_WORDS = {
+    "menos", "hasta", "maximo", "max", "mas", "desde", "minimo", "entre", "alrededor", "aproximadamente",
+    "presupuesto", "precio", "que", "para", "por", "cada", "y", "o", "pero", "tengo", "necesito", "quiero",
+}
+_PHRASE_STOP_RE = re.compile(r"[,.;:!?¿¡()$\d]")
+
+# =========================
+# Prices
+# =========================
+
+# Amount with optional "$" and "mil"/"k" multiplier; not part of a word or a SKU such as "ps-22706"
+_NUMBER_RE = re.compile(r"(?<!\w)(?<![a-z]-)(\$\s*)?(\d+(?:[.,]\d+)*)(\s*(?:mil\b|k\b))?(?![\w.,])")
+_CURRENCY_WORDS = {"peso", "pesos", "mxn", "mx", "mn", "varo", "varos"}
+# Words that may follow a price without making it a quantity ("entre 100 y 200", "300 por pieza")
+_PRICE_FOLLOWERS = _CURRENCY_WORDS | {"y", "a", "al", "o", "hasta", "por", "cada", "c", "maximo", "max", "aprox", "aproximadamente"}
+
+_MAX_RE = re.compile(
+    r"(menos de|hasta|maximo|max|no mas de|no pasar de|no exceder|por debajo de|debajo de|"
+    r"inferior a|menor a|menores a|tope de|limite de|cuando mucho)\s*(de\s*)?(unos\s*)?$"
+)
+_MIN_RE = re.compile(r"(mas de|desde|minimo|arriba de|por encima de|encima de|superior a|mayor a|mayores a|a partir de)\s*(unos\s*)?$")
+_APPROX_RE = re.compile(r"(alrededor de|aproximadamente|aprox|unos|como|cerca de|rondando)\s*$")
+_RANGE_START_RE = re.compile(r"(entre|de)\s*$")
+_RANGE_JOIN_RE = re.compile(r"^\s*(y|a|al|-|hasta)\s*$")
+_BUDGET_RE = re.compile(r"presupuesto|precio|costo|cuest|pagar|gastar|invertir|budget|\bc/u\b|por pieza|cada un")
+
+# Share of the amount allowed on each side of an approximate budget ("alrededor de 300")
+APPROXIMATE_MARGIN = 0.2
+
+
+def parse_number(text: str) -> Optional[float]:
+    """'1,500' / '1.500' / '1,500.50' / '99.90' -> float (Spanish or English separators)."""
+    if "," in text and "." in text:
+        decimal = "," if text.rfind(",") > text.rfind(".") else "."
+        thousands = "." if decimal == "," else ","
+        text = text.replace(thousands, "").replace(decimal, ".")
+    else:
+        separator = "," if "," in text else "." if "." in text else None
+        if separator:
+            parts = text.split(separator)
+            if len(parts) > 2 or len(parts[-1]) == 3:
+                text = "".join(parts)  # thousands separators
+            else:
+                text = text.replace(separator, ".")
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+@dataclass
+class _Amount:
+    value: float
+    start: int
+    end: int
+    currency: bool
+    quantity: bool  # followed by a noun: "100 tazas"
+
+
+def _amounts(text: str) -> List[_Amount]:
+    amounts = []
+    for match in _NUMBER_RE.finditer(text):
+        value = parse_number(match.group(2))
+        if value is None:
+            continue
+        if match.group(3):
+            value *= 1000
+        following = re.match(r"\s*([a-z]+)", text[match.end():])
+        next_word = following.group(1) if following else ""
+        currency = bool(match.group(1)) or next_word in _CURRENCY_WORDS
+        quantity = bool(next_word) and next_word not in _PRICE_FOLLOWERS
+        amounts.append(_Amount(value, match.start(), match.end(), currency, quantity))
+    return amounts
+
+
+def parse_price_range(message: str, expecting_budget: bool = False) -> Optional[Tuple[Optional[float], Optional[float]]]:
+    """
+    (min_price, max_price) stated in a Spanish message, or None when it states no budget.
+
+    "menos de 300 pesos" -> (None, 300); "entre 100 y 200" -> (100, 200);
+    "más de 500" -> (500, None); "$1,500" -> (None, 1500). A bare number is
+    only read as a budget when it carries a currency or budget word, or when
+    ``expecting_budget`` (the agent just asked for it); numbers followed by a
+    noun ("100 tazas") are quantities.
+    """
+    text = fold_text(message)
+    budget_words = bool(_BUDGET_RE.search(text))
+    amounts = [a for a in _amounts(text) if not a.quantity]
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    found = False
+
+    i = 0
+    while i < len(amounts):
+        amount = amounts[i]
+        before = text[max(0, amount.start - 30):amount.start]
+        nxt = amounts[i + 1] if i + 1 < len(amounts) else None
+        if nxt is not None and _RANGE_JOIN_RE.match(text[amount.end:nxt.start]) and (
+            _RANGE_START_RE.search(before) or amount.currency or nxt.currency or budget_words or expecting_budget
+        ):
+            low, high = sorted((amount.value, nxt.value))
+            min_price, max_price, found = low, high, True
+            i += 2
+            continue
+        if _MAX_RE.search(before):
+            max_price, found = amount.value, True
+        elif _MIN_RE.search(before):
+            min_price, found = amount.value, True
+        elif _APPROX_RE.search(before) and (amount.currency or budget_words or expecting_budget):
+            min_price = amount.value * (1 - APPROXIMATE_MARGIN)
+            max_price = amount.value * (1 + APPROXIMATE_MARGIN)
+            found = True
+        elif amount.currency or budget_words or expecting_budget:
+            max_price, found = amount.value, True
+        i += 1
+
+    if not found:
+        return None
+    if min_price is not None and max_price is not None and min_price > max_price:
+        min_price, max_price = max_price, min_price
+    return min_price, max_price
+
+
+def format_price_range(min_price: Optional[float], max_price: Optional[float]) -> str:
+    """Human-readable budget for the ``precio`` slot."""
+    if min_price is not None and max_price is not None:
+        return f"entre ${min_price:,.0f} y ${max_price:,.0f} MXN"
+    if max_price is not None:
+        return f"hasta ${max_price:,.0f} MXN"
+    return f"desde ${min_price:,.0f} MXN"
+
+# =========================
+# Product type
+# =========================
+
+def catalog_categories(indexes: Iterable[CatalogIndex]) -> List[str]:
+    """Distinct categories of the catalogs' comma-separated ``categorias`` column."""
+    categories = set()
+    for index in indexes:
+        if "categorias" not in index.df.columns:
+            continue
+        column = index.df["categorias"]
+        values = column.cat.categories if isinstance(column.dtype, pd.CategoricalDtype) else column.dropna().unique()
+        for value in values:
+            categories.update(part.strip() for part in str(value).split(",") if part.strip())
+    return sorted(categories)
+
+
+def _category_terms(categories: Iterable[str]) -> Dict[str, str]:
+    """Stemmed word -> category, for the words that identify a category."""
+    terms: Dict[str, str] = {}
+    for category in categories:
+        for token in tokenize(category.replace(".", " ")):
+            if token not in GENERIC_CATEGORY_WORDS and len(token) > 2:
+                terms.setdefault(stem(token), category)
+    for word, category in CATEGORY_SYNONYMS.items():
+        if category in categories:
+            terms.setdefault(stem(word), category)
+    return terms
+
+
+def _product_phrase(message: str, first: re.Match) -> str:
+    words = [first.group()]
+    end = first.end()
+    for match in re.compile(r"\w+").finditer(message, end):
+        # Punctuation or a number before or in the word ends the clause
+        if _PHRASE_STOP_RE.search(message, end, match.end()) or fold_text(match.group()) in _PHRASE_STOP_WORDS:
+            break
+        words.append(match.group())
+        end = match.end()
+    while len(words) > 1 and fold_text(words[-1]) in STOPWORDS:
+        words.pop()
+    return " ".join(words).lower()
+
+
+class SlotExtractor:
+    """
+    Fills ``descripcion``/``categoria`` and ``precio``/``min_price``/``max_price``
+    on the agent context from a customer message, before the agent runs.
+
+    Prices overwrite the previous budget (the latest one stated wins) but are
+    only read from amounts with a currency or budget word, so a bare "500"
+    (often a quantity) is left to the agent and save_budget. The product type
+    is found through the catalog categories and the customer's phrase for it
+    ("plumas metálicas con grabado láser") fills an empty description; it
+    never replaces one, and the agent can still refine it with
+    save_product_description.
+    """
+
+    def __init__(self, categories: Iterable[str]):
+        self.update_categories(categories)
+
+    @classmethod
+    def from_catalogs(cls, indexes: Iterable[CatalogIndex]) -> "SlotExtractor":
+        return cls(catalog_categories(indexes))
+
+    def update_categories(self, categories: Iterable[str]) -> None:
+        self.categories = list(categories)
+        self._terms = _category_terms(self.categories)
+
+    def update_catalogs(self, indexes: Iterable[CatalogIndex]) -> None:
+        """Use the categories of newly loaded catalogs."""
+        self.update_categories(catalog_categories(indexes))
+
+    def product_type(self, message: str) -> Optional[Tuple[str, str]]:
+        """
+        (product phrase as written, category) for the first product type named in ``message``.
+
+        The phrase runs from the product word to the end of its clause, before
+        any budget, quantity or purpose: "plumas metálicas con grabado láser
+        de menos de 50 pesos" -> "plumas metálicas con grabado láser".
+        """
+        for match in re.finditer(r"\w+", message):
+            category = self._terms.get(stem(fold_text(match.group())))
+            if category is not None:
+                return _product_phrase(message, match), category
+        return None
+
+    def fill(self, context: Any, message: str) -> Dict[str, Any]:
+        """
+        Set the slots found in ``message`` on ``context``.
+
+        Returns:
+            The context fields that changed
+        """
+        changes: Dict[str, Any] = {}
+        product = self.product_type(message)
+        if product is not None:
+            words, category = product
+            # A description the agent or customer already gave is more specific than a category guess
+            if not context.descripcion:
+                changes.update(descripcion=words, categoria=category)
+
+        price_range = parse_price_range(message)
+        if price_range is not None:
+            min_price, max_price = price_range
+            changes.update(min_price=min_price, max_price=max_price, precio=format_price_range(min_price, max_price))
+
+        changes = {key: value for key, value in changes.items() if getattr(context, key) != value}
+        for key, value in changes.items():
+            setattr(context, key, value)
+        return changes
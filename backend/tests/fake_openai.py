@@ -0,0 +1,94 @@
+"""
+Local fake of the OpenAI files and vector stores API, enough for VectorStoreSync.
+"""
+
+import itertools
+import json
+from types import SimpleNamespace
+
+
+class NotFound(Exception):
+    status_code = 404
+
+
+class _Files:
+    def __init__(self, client):
+        self._client = client
+
+    def create(self, file, purpose):
+        name, content = file
+        file_id = f"file-{next(self._client._ids)}"
+        self._client.files_by_id[file_id] = {"name": name, "content": content, "purpose": purpose}
+        return SimpleNamespace(id=file_id)
+
+    def delete(self, file_id):
+        if self._client.files_by_id.pop(file_id, None) is None:
+            raise NotFound(file_id)
+
+
+class _VectorStoreFiles:
+    def __init__(self, client):
+        self._client = client
+
+    def create(self, vector_store_id, file_id):
+        content = self._client.files_by_id[file_id]["content"]
+        failed = any(marker in content for marker in self._client.fail_uploads_containing)
+        self._client.stores[vector_store_id][file_id] = {
+            "status": "failed" if failed else "in_progress",
+            "polls_left": self._client.polls_until_done,
+        }
+        return SimpleNamespace(id=file_id)
+
+    def retrieve(self, file_id, vector_store_id):
+        entry = self._client.stores[vector_store_id][file_id]
+        if entry["status"] == "in_progress":
+            if entry["polls_left"] <= 0:
+                entry["status"] = "completed"
+            entry["polls_left"] -= 1
+        return SimpleNamespace(id=file_id, status=entry["status"])
+
+    def delete(self, file_id, vector_store_id):
+        if self._client.stores[vector_store_id].pop(file_id, None) is None:
+            raise NotFound(file_id)
+
+
+class _VectorStores:
+    def __init__(self, client):
+        self._client = client
+        self.files = _VectorStoreFiles(client)
+
+    def create(self, name):
+        store_id = f"vs-{next(self._client._ids)}"
+        self._client.stores[store_id] = {}
+        return SimpleNamespace(id=store_id, name=name)
+
+    def retrieve(self, store_id):
+        if store_id not in self._client.stores:
+            raise NotFound(store_id)
+        return SimpleNamespace(id=store_id)
+
+
+class FakeOpenAI:
+    """
+    In-memory files and vector stores. Ingestion completes after
+    ``polls_until_done`` status polls; uploads whose content contains one of
+    ``fail_uploads_containing`` end as ``failed``.
+    """
+
+    def __init__(self, polls_until_done: int = 0):
+        self._ids = itertools.count(1)
+        self.files_by_id = {}
+        self.stores = {}
+        self.polls_until_done = polls_until_done
+        self.fail_uploads_containing = set()
+        self.files = _Files(self)
+        self.vector_stores = _VectorStores(self)
+
+    def store_documents(self, store_id):
+        """Documents currently attached to a store, by their ``id`` field."""
+        documents = {}
+        for file_id in self.stores[store_id]:
+            for line in self.files_by_id[file_id]["content"].decode("utf-8").splitlines():
+                document = json.loads(line)
+                documents[document["id"]] = document
+        return documents
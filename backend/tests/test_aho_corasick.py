@@ -0,0 +1,23 @@
+from aho_corasick import AhoCorasick
+
+
+def test_finds_every_occurrence_with_end_index():
+    matcher = AhoCorasick([("he", "he"), ("she", "she"), ("his", "his"), ("hers", "hers")])
+    assert sorted(matcher.iter_matches("ushers")) == [(3, "he"), (3, "she"), (5, "hers")]
+
+
+def test_overlapping_and_nested_patterns():
+    matcher = AhoCorasick([("termo", 1), ("termo kala", 2), ("kala", 3)])
+    assert [payload for _, payload in matcher.iter_matches("el termo kala azul")] == [1, 2, 3]
+
+
+def test_shared_pattern_keeps_every_payload():
+    matcher = AhoCorasick([("ps22706", "sku"), ("ps22706", "name")])
+    assert [payload for _, payload in matcher.iter_matches("ps22706")] == ["sku", "name"]
+    assert matcher.pattern_count == 2
+
+
+def test_empty_patterns_and_no_match():
+    matcher = AhoCorasick([("", 1), ("taza", 2)])
+    assert matcher.pattern_count == 1
+    assert list(matcher.iter_matches("termo de acero")) == []
@@ -0,0 +1,216 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from agents import GuardrailFunctionOutput, InputGuardrailTripwireTriggered, RawResponsesStreamEvent
+from agents.guardrail import InputGuardrailResult
+from fastapi.testclient import TestClient
+
+import api
+import main
+from conversation_store import TieredConversationStore
+
+
+class FakeStream:
+    """Stands in for RunResultStreaming: yields ``events``, then raises ``error`` or completes."""
+
+    def __init__(self, run_input, events=(), error=None, new_items=(), delay=0.0):
+        self.run_input = list(run_input)
+        self.events = list(events)
+        self.error = error
+        self.new_items = list(new_items)
+        self.delay = delay
+        self.is_complete = False
+        self.input_guardrail_results = []
+
+    async def stream_events(self):
+        for event in self.events:
+            yield event
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        self.is_complete = True
+
+    def cancel(self):
+        self.is_complete = True
+
+    def to_input_list(self):
+        return self.run_input + self.new_items
+
+
+def text_delta(text):
+    return RawResponsesStreamEvent(data=SimpleNamespace(type="response.output_text.delta", delta=text, item_id="msg"))
+
+
+def tripwire(guardrail):
+    verdict = main.GuardrailVerdict(reasoning="Fuera de tema", passed=False, tier="llm")
+    result = InputGuardrailResult(guardrail=guardrail, output=GuardrailFunctionOutput(output_info=verdict, tripwire_triggered=True))
+    return InputGuardrailTripwireTriggered(result)
+
+
+@pytest.fixture
+def store(monkeypatch, tmp_path):
+    store = TieredConversationStore(str(tmp_path / "conversations.db"), main.PromoProAgentContext, flush_interval=0)
+    monkeypatch.setattr(api, "conversation_store", store)
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def runs(monkeypatch):
+    """Queue of FakeStream factories consumed by Runner.run_streamed, one per run."""
+    queue = []
+    started = []
+
+    def run_streamed(agent, run_input, context=None):
+        started.append((agent, run_input))
+        return queue.pop(0)(run_input)
+
+    monkeypatch.setattr(api.Runner, "run_streamed", run_streamed)
+    return SimpleNamespace(queue=queue, started=started)
+
+
+def new_conversation(store, agent=main.promoselect_agent, business_unit="promoselect"):
+    state = {"input_items": [], "context": main.create_initial_context("c1"), "current_agent": agent.name}
+    state["context"].business_unit = business_unit
+    store.save("c1", state)
+    return "c1"
+
+
+def collect(req):
+    async def _collect():
+        return [item async for item in api._run_turn(req)]
+    return asyncio.run(_collect())
+
+
+def test_tripped_guardrail_discards_draft_and_rolls_back_context(store, runs):
+    conversation_id = new_conversation(store)
+    runs.queue.append(lambda run_input: FakeStream(run_input, [text_delta("Claro")], tripwire(main.relevance_guardrail)))
+
+    streamed = collect(api.ChatRequest(conversation_id=conversation_id, message="termos de menos de 300 pesos"))
+    kinds = [kind for kind, _ in streamed]
+    response = streamed[-1][1]
+
+    assert kinds.index("message_delta") < kinds.index("event")
+    tripped = [p for kind, p in streamed if kind == "event" and p.type == "guardrail_tripped"]
+    assert tripped and tripped[0].metadata["discard_draft"]
+    assert response.events == tripped
+    assert [m.content for m in response.messages] == [api.GUARDRAIL_REFUSAL]
+    assert "airline" not in api.GUARDRAIL_REFUSAL
+
+    # The budget and product type read from the rejected message were undone
+    assert response.context["max_price"] is None and response.context["descripcion"] is None
+    state = store.get(conversation_id)
+    assert state["context"].max_price is None
+    assert [item["role"] for item in state["input_items"]] == ["user", "assistant"]
+
+
+def test_failed_run_leaves_the_stored_conversation_unchanged(store, runs):
+    conversation_id = new_conversation(store)
+    runs.queue.append(lambda run_input: FakeStream(run_input, error=RuntimeError("model unavailable")))
+
+    with pytest.raises(RuntimeError):
+        collect(api.ChatRequest(conversation_id=conversation_id, message="termos de menos de 300 pesos"))
+
+    state = store.get(conversation_id)
+    assert state["input_items"] == []
+    assert state["context"].max_price is None
+
+
+@pytest.mark.parametrize("req", [
+    api.ChatRequest(conversation_id="c1", action={"type": "select_business_unit", "value": "suitup"}),
+    api.ChatRequest(conversation_id="c1", message="Suit Up"),
+])
+def test_business_unit_selection_skips_triage(store, runs, req):
+    conversation_id = new_conversation(store, main.triage_agent, business_unit=None)
+    runs.queue.append(lambda run_input: FakeStream(run_input, new_items=reply("¿Qué kit buscas?")))
+
+    streamed = collect(req)
+    events = [payload for kind, payload in streamed if kind == "event"]
+    response = streamed[-1][1]
+
+    # The specialist answered the turn; the triage model never ran
+    assert [agent for agent, _ in runs.started] == [main.suitup_agent]
+    assert response.current_agent == main.suitup_agent.name
+    handoff = next(event for event in events if event.type == "handoff")
+    assert handoff.metadata == {"source_agent": main.triage_agent.name, "target_agent": main.suitup_agent.name}
+    assert any(event.type == "tool_call" and event.content == "on_suitup_handoff" for event in events)
+    update = next(event for event in events if event.type == "context_update")
+    assert update.metadata["changes"] == {"business_unit": "suitup"}
+
+    state = store.get(conversation_id)
+    assert state["current_agent"] == main.suitup_agent.name
+    assert state["context"].business_unit == "suitup"
+    assert state["input_items"][0] == {"role": "user", "content": "SuitUp" if req.action else "Suit Up"}
+
+
+def test_unit_name_sent_to_a_specialist_is_a_normal_message(store, runs):
+    conversation_id = new_conversation(store)
+    runs.queue.append(lambda run_input: FakeStream(run_input, new_items=reply("ok")))
+    streamed = collect(api.ChatRequest(conversation_id=conversation_id, message="suitup"))
+    assert [agent for agent, _ in runs.started] == [main.promoselect_agent]
+    assert not [payload for kind, payload in streamed if kind == "event" and payload.type == "handoff"]
+
+
+def run_concurrently(*requests):
+    async def _collect(req):
+        return [item async for item in api._run_turn(req)]
+
+    async def _all():
+        return await asyncio.gather(*(_collect(req) for req in requests))
+
+    return asyncio.run(_all())
+
+
+def reply(text):
+    return [{"role": "assistant", "content": text}]
+
+
+def test_duplicate_messages_share_one_run(store, runs):
+    conversation_id = new_conversation(store)
+    runs.queue.append(lambda run_input: FakeStream(run_input, new_items=reply("uno"), delay=0.05))
+
+    req = api.ChatRequest(conversation_id=conversation_id, message="Busco termos")
+    first, second = run_concurrently(req, req.model_copy(update={"message": "busco  TERMOS"}))
+
+    assert len(runs.started) == 1
+    assert first[-1][1] is second[-1][1]
+    assert [item["content"] for item in store.get(conversation_id)["input_items"]] == ["Busco termos", "uno"]
+
+
+def test_turns_of_one_conversation_run_one_at_a_time(store, runs):
+    conversation_id = new_conversation(store)
+    runs.queue.append(lambda run_input: FakeStream(run_input, new_items=reply("uno"), delay=0.05))
+    runs.queue.append(lambda run_input: FakeStream(run_input, new_items=reply("dos")))
+
+    run_concurrently(
+        api.ChatRequest(conversation_id=conversation_id, message="primero"),
+        api.ChatRequest(conversation_id=conversation_id, message="segundo"),
+    )
+
+    # The second run saw the first turn, and neither turn was lost
+    assert [item["content"] for item in runs.started[1][1]] == ["primero", "uno", "segundo"]
+    history = [item["content"] for item in store.get(conversation_id)["input_items"]]
+    assert history == ["primero", "uno", "segundo", "dos"]
+
+
+@pytest.mark.parametrize("path", ["/admin/catalogs", "/admin/search"])
+def test_admin_endpoints_fail_closed_without_a_token(monkeypatch, path):
+    client = TestClient(api.app)
+    monkeypatch.setattr(api, "ADMIN_TOKEN", None)
+    assert client.get(path).status_code == 403
+    assert client.get(path, headers={"X-Admin-Token": ""}).status_code == 403
+
+    monkeypatch.setattr(api, "ADMIN_TOKEN", "s3cret")
+    assert client.get(path).status_code == 403
+    assert client.get(path, headers={"X-Admin-Token": "wrong"}).status_code == 403
+    assert client.get(path, headers={"X-Admin-Token": "s3cret"}).status_code == 200
+
+
+def test_reload_requires_the_admin_token(monkeypatch):
+    requested = []
+    monkeypatch.setattr(api.CATALOG_WATCHER, "request_reload", lambda: requested.append(True))
+    monkeypatch.setattr(api, "ADMIN_TOKEN", None)
+    assert TestClient(api.app).post("/admin/catalogs/reload").status_code == 403
+    assert requested == []
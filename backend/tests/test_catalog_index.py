@@ -0,0 +1,178 @@
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from catalog_index import BM25_B, BM25_K1, CatalogIndex, LazyStringColumn, search_terms
+from catalog_snapshot import CATALOGS, load_catalog, read_catalog_csv, split_side_columns
+
+SPEC = {key: CATALOGS["promo"][key] for key in ("text_columns", "result_columns", "required_columns", "side_columns")}
+
+
+def same(a, b):
+    return (pd.isna(a) and pd.isna(b)) if pd.isna(a) or pd.isna(b) else a == b
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "promo.csv"
+    pd.DataFrame({
+        "sku": [f"PS-{n}" for n in range(8)],
+        "nombre": [f"Producto {n}" for n in range(8)],
+        "descripcion": ["Termo de acero", None, "Taza", "Pluma", "Libreta", "Gorra", "Vaso", "Cilindro"],
+        # Few distinct values: stored as categoricals, with a missing one
+        "categorias": ["Termos", "Termos", "Tazas", None, "Termos", "Tazas", "Tazas", "Termos"],
+        "precio": ["150", "90", "80", "25", "60", "70", "45", "$1,200"],
+        "imagenes_url": [
+            "https://img.example/0.png",
+            None,
+            "",
+            "a.png (https://img.example/3a.png), b.png (https://img.example/3b.png)",
+            "https://img.example/ñandú.png",
+            None,
+            "https://img.example/6.png",
+            "",
+        ],
+    }).to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture(params=["snapshot", "csv"])
+def index(request, csv_path, tmp_path):
+    if request.param == "snapshot":
+        index, fingerprint = load_catalog(csv_path, root=str(tmp_path / "snapshots"), **SPEC)
+        assert fingerprint is not None
+        assert isinstance(index.df["categorias"].dtype, pd.CategoricalDtype)
+        return index
+    df, side = split_side_columns(read_catalog_csv(csv_path, SPEC["required_columns"]), SPEC["side_columns"])
+    return CatalogIndex(df, SPEC["text_columns"], SPEC["result_columns"], side_columns=side)
+
+
+def test_records_and_full_frame_match_the_csv(index, csv_path):
+    expected = read_catalog_csv(csv_path, SPEC["required_columns"]).to_dict(orient="records")
+    assert "imagenes_url" in index.side_columns and "imagenes_url" not in index.df.columns
+
+    records = index.records(range(index.size), list(expected[0]))
+    full = index.full_frame().to_dict(orient="records")
+    for row, source in enumerate(expected):
+        for column, value in source.items():
+            assert same(records[row][column], value), (row, column)
+            assert same(full[row][column], value), (row, column)
+
+
+def test_side_values_are_decoded_per_row(index):
+    assert index.side_value("imagenes_url", "sku", "PS-4") == "https://img.example/ñandú.png"
+    assert pd.isna(index.side_value("imagenes_url", "sku", "PS-1"))
+    assert index.side_value("imagenes_url", "sku", "PS-99") is None
+    assert index.records([3], ["sku", "imagenes_url"]) == [{
+        "sku": "PS-3", "imagenes_url": "a.png (https://img.example/3a.png), b.png (https://img.example/3b.png)",
+    }]
+
+
+def test_categorical_columns_filter_like_strings(index):
+    assert list(np.flatnonzero(index.contains("tazas", ["categorias"]))) == [2, 5, 6]
+    assert [r["sku"] for r in index.search("termos", columns=["categorias"], max_price=100)] == ["PS-1", "PS-4"]
+
+
+def test_lazy_column_keeps_empty_strings_apart_from_missing_values():
+    column = LazyStringColumn.from_values(["https://img.example/a.png", "", None, float("nan"), "ñ"])
+    assert len(column) == 5
+    assert column.get(0) == "https://img.example/a.png" and column.get(1) == "" and column.get(4) == "ñ"
+    assert pd.isna(column.get(2)) and pd.isna(column.get(3))
+    assert column.values()[:2] == ["https://img.example/a.png", ""]
+
+
+@pytest.fixture
+def ranked():
+    return CatalogIndex(
+        pd.DataFrame({
+            "nombre": ["Taza Luno", "Termo Kala", "Termo Maha", "Cilindro Ori", "Termo Kala", "Pluma Ori"],
+            "descripcion": [
+                "Taza de cerámica",
+                "Termo de acero inoxidable",
+                "Termo de plástico con tapa de rosca, asa, correa y mosquetón",
+                "Cilindro de acero",
+                "Termo de acero inoxidable",
+                "Pluma metálica",
+            ],
+            "categorias": ["Tazas", "Termos", "Termos", "Cilindros", "Termos", "Bolígrafos"],
+        }),
+        ["nombre", "descripcion", "categorias"],
+        ["nombre"],
+    )
+
+
+def test_bm25_ranking(ranked):
+    # Both terms first (equal scores keep catalog order); "termo" three times beats "acero" once
+    assert list(ranked.rank("termo de acero")) == [1, 4, 2, 3]
+    # Same term frequency: the shorter document ranks higher
+    assert list(ranked.rank("acero")) == [3, 1, 4]
+    assert list(ranked.rank("termo", limit=2)) == [1, 4]
+    # The rarer term decides: "ori" is in two rows, "pluma" in one
+    assert list(ranked.rank("pluma ori")) == [5, 3]
+    assert list(ranked.rank("mochila")) == []
+    assert list(ranked.rank("termo", mask=np.array([True, False, True, True, False, True]))) == [2]
+
+
+def test_bm25_scores_match_the_formula(ranked):
+    documents = [search_terms(text) for text in ranked.documents()]
+    average = sum(map(len, documents)) / len(documents)
+
+    def score(terms, document):
+        total = 0.0
+        for term in terms:
+            df = sum(term in d for d in documents)
+            tf = document.count(term)
+            if tf:
+                idf = np.log(1 + (len(documents) - df + 0.5) / (df + 0.5))
+                total += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * len(document) / average))
+        return total
+
+    for query in ("termo de acero", "pluma ori", "cilindro"):
+        expected = [score(search_terms(query), document) for document in documents]
+        np.testing.assert_allclose(ranked.bm25_scores(ranked.query_weights(query)), expected, rtol=1e-5)
+
+
+def test_partial_top_k_matches_a_full_sort():
+    rng = np.random.default_rng(7)
+    words = ["termo", "taza", "acero", "pluma", "gorra", "vaso", "libreta", "mochila"]
+    descriptions = [" ".join(rng.choice(words, size=rng.integers(1, 6))) for _ in range(400)]
+    index = CatalogIndex(pd.DataFrame({"descripcion": descriptions}), ["descripcion"], ["descripcion"])
+
+    for query in ("termo acero", "taza", "pluma gorra vaso"):
+        scores = index.bm25_scores(index.query_weights(query))
+        matched = np.flatnonzero(scores > 0)
+        expected = matched[np.argsort(-scores[matched], kind="stable")]
+        for limit in (1, 5, 37, 1000):
+            assert list(index.rank(query, limit=limit)) == list(expected[:limit])
+
+
+@pytest.fixture(scope="module")
+def promo(tmp_path_factory):
+    spec = CATALOGS["promo"]
+    index, _ = load_catalog(spec["csv_path"], root=str(tmp_path_factory.mktemp("snapshots")), **SPEC)
+    return index, read_catalog_csv(spec["csv_path"], SPEC["required_columns"])
+
+
+@pytest.mark.parametrize("keyword", [
+    "termo", "TAZA", "acero inoxidable", "cerámica", "ceramica", "vacío", "IGUAZÚ", "niño",
+    "ml", "a", "x", "ñ", "-", ",", "  ", "ps22706", "cm x", "mochila ecológica", "zzz",
+    # Patterns go through the regex engine, as with str.contains
+    "term.", "taza|termo", "^bol",
+])
+def test_contains_matches_str_contains_on_the_promo_catalog(promo, keyword):
+    index, df = promo
+    expected = np.zeros(len(df), dtype=bool)
+    for col in SPEC["text_columns"]:
+        expected |= df[col].str.contains(keyword, case=False, na=False).to_numpy()
+    assert np.array_equal(index.contains(keyword), expected)
+    assert np.array_equal(index.contains(keyword, ["nombre"]), df["nombre"].str.contains(keyword, case=False, na=False).to_numpy())
+
+
+def test_contains_rejects_invalid_patterns_like_str_contains(promo):
+    index, df = promo
+    with pytest.raises(re.error):
+        df["nombre"].str.contains("(", case=False, na=False)
+    with pytest.raises(re.error):
+        index.contains("(")
@@ -0,0 +1,120 @@
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from catalog_snapshot import CATALOGS, load_catalog, read_catalog_csv
+
+SPEC = {key: CATALOGS["promo"][key] for key in ("text_columns", "result_columns", "required_columns", "side_columns")}
+
+
+def write_catalog(path, prices=("150", "$1,200.50 MXN", "80")):
+    pd.DataFrame({
+        "sku": ["PS-1", "PS-2", "PS-3"],
+        "nombre": ["Termo Kala", "Termo Maha", "Taza Luno"],
+        "descripcion": ["Termo de acero inoxidable", None, "Taza de cerámica"],
+        "categorias": ["Termos", "Termos", "Tazas"],
+        "precio": list(prices),
+        "imagenes_url": ["https://img.example/kala.png", None, ""],
+    }).to_csv(path, index=False)
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "promo.csv"
+    write_catalog(path)
+    return str(path)
+
+
+@pytest.fixture
+def root(tmp_path):
+    return str(tmp_path / "snapshots")
+
+
+def load(csv_path, root):
+    return load_catalog(csv_path, root=root, **SPEC)
+
+
+def catalog_dir(root):
+    return Path(root) / "promo"
+
+
+def current_version(root):
+    return (catalog_dir(root) / "CURRENT").read_text()
+
+
+def assert_same_frame(index, csv_path):
+    expected = read_catalog_csv(csv_path, SPEC["required_columns"])
+    actual = index.full_frame()[list(expected.columns)]
+    pd.testing.assert_frame_equal(
+        actual.astype(object).where(actual.notna(), None),
+        expected.astype(object).where(expected.notna(), None),
+        check_dtype=False,
+    )
+
+
+def test_snapshot_round_trip_matches_the_csv(csv_path, root):
+    index, fingerprint = load(csv_path, root)
+    assert fingerprint is not None
+    assert (catalog_dir(root) / current_version(root) / "manifest.json").exists()
+    assert_same_frame(index, csv_path)
+
+    # A second load maps the same snapshot instead of rebuilding it
+    manifest = catalog_dir(root) / current_version(root) / "manifest.json"
+    built_at = json.loads(manifest.read_text())["built_at"]
+    again, again_fingerprint = load(csv_path, root)
+    assert json.loads(manifest.read_text())["built_at"] == built_at
+    assert again_fingerprint == fingerprint
+    assert [r["sku"] for r in again.search("termo", ranked=True)] == [r["sku"] for r in index.search("termo", ranked=True)]
+    assert again.records([1])[0]["precio"] == "$1,200.50 MXN"
+    assert np.isnan(again.records([1])[0]["imagenes_url"])
+
+
+def test_touched_but_unchanged_csv_reuses_the_snapshot(csv_path, root):
+    load(csv_path, root)
+    version = current_version(root)
+    stat = os.stat(csv_path)
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    load(csv_path, root)
+    assert current_version(root) == version
+
+
+def test_changed_csv_swaps_the_current_pointer(csv_path, root):
+    load(csv_path, root)
+    first = current_version(root)
+
+    write_catalog(csv_path, prices=("150", "$999", "80"))
+    index, _ = load(csv_path, root)
+    second = current_version(root)
+    assert second != first
+    assert index.records([1])[0]["precio"] == "$999"
+    # The previous version stays for workers that still have it mapped; older ones are pruned
+    assert {d.name for d in catalog_dir(root).iterdir() if d.is_dir()} == {first, second}
+
+    write_catalog(csv_path, prices=("1", "2", "3"))
+    load(csv_path, root)
+    assert first not in {d.name for d in catalog_dir(root).iterdir()}
+
+
+def test_corrupt_snapshot_falls_back_to_the_csv(csv_path, root):
+    load(csv_path, root)
+    version_dir = catalog_dir(root) / current_version(root)
+    manifest = json.loads((version_dir / "manifest.json").read_text())
+    numeric = next(c["file"] for c in manifest["columns"] if c["kind"] == "numeric")
+    (version_dir / f"{numeric}.npy").write_bytes(b"not a numpy file")
+
+    index, fingerprint = load(csv_path, root)
+    assert fingerprint is None
+    assert index.size == 3
+    assert_same_frame(index, csv_path)
+
+
+def test_unwritable_snapshot_dir_falls_back_to_the_csv(csv_path, tmp_path):
+    blocker = tmp_path / "not-a-dir"
+    blocker.write_text("")
+    index, fingerprint = load(csv_path, str(blocker))
+    assert fingerprint is None and index.size == 3
+    assert index.records([0], ["imagenes_url"]) == [{"imagenes_url": "https://img.example/kala.png"}]
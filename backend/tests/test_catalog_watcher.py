@@ -0,0 +1,122 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+import catalog_snapshot
+import tools
+from catalog_watcher import CatalogWatcher
+
+
+def write_promo(path, name="Termo Kala", price="150"):
+    pd.DataFrame({
+        "sku": ["PS-1", "PS-2"],
+        "nombre": [name, "Taza Luno"],
+        "descripcion": ["Termo de acero", "Taza de cerámica"],
+        "categorias": ["Termos", "Tazas"],
+        "precio": [price, "80"],
+        "imagenes_url": ["https://img.example/1.png", None],
+    }).to_csv(path, index=False)
+
+
+def write_suitup(path):
+    pd.DataFrame({
+        "nombre": ["Kit Café Luno"],
+        "descripcion": ["Kit de café"],
+        "productos": ["Taza, café"],
+        "precio": ["450"],
+        "imagen": ["https://img.example/kit.png"],
+    }).to_csv(path, index=False)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_changes_are_reloaded_once_the_file_settles(tmp_path):
+    path = tmp_path / "promo.csv"
+    path.write_text("sku,nombre\n")
+    seen = []
+    watcher = CatalogWatcher([str(path)], lambda: seen.append(path.read_text()), interval=0.02, settle_seconds=0.3)
+    watcher.start()
+    try:
+        # A copy in progress: the reload waits until the file stops changing
+        for n in range(3):
+            with open(path, "a") as f:
+                f.write(f"PS-{n},Producto {n}\n")
+            time.sleep(0.1)
+        wait_for(lambda: seen)
+        time.sleep(0.1)
+        assert seen == ["sku,nombre\nPS-0,Producto 0\nPS-1,Producto 1\nPS-2,Producto 2\n"]
+        assert watcher.stats()["reloads"] == 1
+    finally:
+        watcher.stop()
+
+
+def test_failed_reload_is_reported_and_retried_on_the_next_change(tmp_path):
+    path = tmp_path / "promo.csv"
+    path.write_text("a\n")
+    calls = []
+
+    def on_change():
+        calls.append(path.read_text())
+        if len(calls) == 1:
+            raise ValueError("bad catalog")
+
+    watcher = CatalogWatcher([str(path)], on_change, interval=0, settle_seconds=0)
+    watcher.start()
+    try:
+        watcher.request_reload()
+        wait_for(lambda: watcher.stats()["failures"] == 1)
+        assert watcher.stats()["last_error"] == "bad catalog"
+        watcher.request_reload()
+        wait_for(lambda: watcher.stats()["reloads"] == 1)
+        assert watcher.stats()["last_error"] is None
+    finally:
+        watcher.stop()
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    promo, suitup = tmp_path / "promo.csv", tmp_path / "suitup.csv"
+    write_promo(promo)
+    write_suitup(suitup)
+    monkeypatch.setitem(tools.CATALOGS["promo"], "csv_path", str(promo))
+    monkeypatch.setitem(tools.CATALOGS["suitup"], "csv_path", str(suitup))
+    monkeypatch.setattr(catalog_snapshot, "SNAPSHOT_ROOT", str(tmp_path / "snapshots"))
+    monkeypatch.setattr(tools, "PROMO_VECTORS_PATH", str(tmp_path / "promo_vectors.npy"))
+    monkeypatch.setattr(tools, "SUITUP_VECTORS_PATH", str(tmp_path / "suitup_vectors.npy"))
+    monkeypatch.setattr(tools, "_managed_vector_stores", False)
+    monkeypatch.setattr(tools, "_catalog_listeners", [])
+    monkeypatch.setattr(tools, "_catalogs", tools._empty_catalog_set())
+    return promo
+
+
+def test_watcher_swaps_in_a_new_catalog_set_and_notifies_listeners(data_dir):
+    first = tools.reload_catalogs()
+    assert first.version == 1 and tools.current_catalogs() is first
+
+    notified = []
+    reloaded = threading.Event()
+    tools.add_catalog_listener(lambda catalogs: (notified.append(catalogs), reloaded.set()))
+    watcher = CatalogWatcher(list(tools.CATALOGS[name]["csv_path"] for name in ("promo", "suitup")),
+                             tools.reload_catalogs, interval=0, settle_seconds=0.05)
+    watcher.start()
+    try:
+        write_promo(data_dir, name="Termo Kala Plus", price="175")
+        watcher.request_reload()
+        assert reloaded.wait(10)
+    finally:
+        watcher.stop()
+
+    second = tools.current_catalogs()
+    assert notified == [second] and second is not first
+    assert second.version == 2 and second.promo_retriever is not None
+    assert second.promo_index.records([0], ["nombre", "precio"]) == [{"nombre": "Termo Kala Plus", "precio": 175}]
+    assert second.promo_images.resolve("ps-1", 1) == "https://img.example/1.png"
+    # A search still holding the old set keeps reading the old version
+    assert first.promo_index.records([0], ["nombre"]) == [{"nombre": "Termo Kala"}]
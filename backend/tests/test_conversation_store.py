@@ -0,0 +1,168 @@
+from typing import Optional
+
+import pytest
+from pydantic import BaseModel
+
+from conversation_store import TieredConversationStore
+
+
+class Context(BaseModel):
+    business_unit: Optional[str] = None
+    max_price: Optional[float] = None
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "conversations.db")
+
+
+def open_store(path, **kwargs):
+    kwargs.setdefault("flush_interval", 0)
+    return TieredConversationStore(path, Context, **kwargs)
+
+
+def new_state():
+    return {"input_items": [], "context": Context(), "current_agent": "Triage Agent"}
+
+
+def run_turn(store, conversation_id, message, agent="Promoselect Agent", **changes):
+    state = store.get(conversation_id)
+    start = len(state["input_items"])
+    state["input_items"] += [{"role": "user", "content": message}, {"role": "assistant", "content": f"re: {message}"}]
+    for key, value in changes.items():
+        setattr(state["context"], key, value)
+    state["current_agent"] = agent
+    store.append_turn(conversation_id, state, state["input_items"][start:], changes)
+    return state
+
+
+def test_state_survives_restart(db_path):
+    store = open_store(db_path)
+    store.save("c1", new_state())
+    run_turn(store, "c1", "hola", business_unit="promoselect")
+    store.close()
+
+    restarted = open_store(db_path)
+    state = restarted.get("c1")
+    assert state["current_agent"] == "Promoselect Agent"
+    assert state["context"].business_unit == "promoselect"
+    assert [item["content"] for item in state["input_items"]] == ["hola", "re: hola"]
+    assert restarted.stats()["cold_hits"] == 1
+    restarted.close()
+
+
+def test_write_behind_flushes_on_close(db_path):
+    store = open_store(db_path, flush_interval=60)
+    store.save("c1", new_state())
+    assert store.stats()["pending_writes"] == 1
+    store.close()
+    restarted = open_store(db_path)
+    assert restarted.get("c1") is not None
+    restarted.close()
+
+
+def test_hot_tier_is_bounded_and_evicted_states_reload(db_path):
+    store = open_store(db_path, max_conversations=2)
+    for n in range(3):
+        store.save(f"c{n}", new_state())
+    stats = store.stats()
+    assert stats["hot_size"] == 2 and stats["evictions"] == 1
+
+    assert store.get("c0") is not None
+    assert store.get("missing") is None
+    stats = store.stats()
+    assert stats["cold_hits"] == 1 and stats["misses"] == 1
+    store.close()
+
+
+def test_turn_log_replays_on_top_of_snapshots(db_path):
+    store = open_store(db_path, snapshot_every=3)
+    store.save("c1", new_state())
+    for n in range(7):
+        run_turn(store, "c1", f"mensaje {n}", max_price=100.0 + n)
+    expected = store.get("c1")
+    assert store.stats()["snapshots_written"] > 1
+    store.close()
+
+    restarted = open_store(db_path)
+    state = restarted.get("c1")
+    assert state["input_items"] == expected["input_items"]
+    assert state["context"] == expected["context"] and state["context"].max_price == 106.0
+    restarted.close()
+
+
+def test_get_returns_a_copy_until_the_turn_is_committed(db_path):
+    store = open_store(db_path)
+    store.save("c1", new_state())
+
+    # A turn that fails before append_turn leaves no trace in memory or in the log
+    state = store.get("c1")
+    state["input_items"].append({"role": "user", "content": "perdido"})
+    state["context"].max_price = 300.0
+    assert store.get("c1")["input_items"] == []
+    assert store.get("c1")["context"].max_price is None
+
+    run_turn(store, "c1", "hola", max_price=200.0)
+    store.close()
+    restarted = open_store(db_path)
+    state = restarted.get("c1")
+    assert [item["content"] for item in state["input_items"]] == ["hola", "re: hola"]
+    assert state["context"].max_price == 200.0
+    restarted.close()
+
+
+def test_hot_hits_do_not_rebuild_from_sqlite(db_path):
+    store = open_store(db_path)
+    store.save("c1", new_state())
+    run_turn(store, "c1", "hola")
+    assert store.get("c1") is not None
+    stats = store.stats()
+    assert (stats["hits"], stats["cold_hits"], stats["stale_hits"]) == (2, 0, 0)
+    store.close()
+
+
+def contents(state):
+    return [item["content"] for item in state["input_items"]]
+
+
+def test_workers_see_each_others_turns(db_path):
+    first, second = open_store(db_path), open_store(db_path)
+    first.save("c1", new_state())
+    assert second.get("c1") is not None
+
+    run_turn(first, "c1", "uno", max_price=100.0)
+    state = run_turn(second, "c1", "dos")
+    assert contents(state) == ["uno", "re: uno", "dos", "re: dos"]
+    assert second.stats()["stale_hits"] == 1
+    assert contents(first.get("c1")) == contents(state)
+    assert first.get("c1")["context"].max_price == 100.0
+    first.close()
+    second.close()
+
+
+# snapshot_every=1 writes each turn as a snapshot, so the other worker's turn is already folded in
+@pytest.mark.parametrize("first_every, second_every", [(20, 20), (1, 20), (20, 1), (1, 1)])
+def test_turns_numbered_alike_by_two_workers_are_both_kept(db_path, first_every, second_every):
+    first = open_store(db_path, flush_interval=60, snapshot_every=first_every)
+    second = open_store(db_path, flush_interval=60, snapshot_every=second_every)
+    first.save("c1", new_state())
+    first.flush()
+    second.get("c1")
+    first.get("c1")
+
+    # Both log their next turn under the same seq before either flushes
+    run_turn(first, "c1", "uno", max_price=100.0)
+    run_turn(second, "c1", "dos", business_unit="suitup")
+    first.flush()
+    second.flush()
+    assert second.stats()["seq_conflicts"] == 1
+
+    state = second.get("c1")
+    assert contents(state) == ["uno", "re: uno", "dos", "re: dos"]
+    assert (state["context"].max_price, state["context"].business_unit) == (100.0, "suitup")
+    first.close()
+    second.close()
+
+    restarted = open_store(db_path)
+    assert contents(restarted.get("c1")) == ["uno", "re: uno", "dos", "re: dos"]
+    restarted.close()
@@ -0,0 +1,76 @@
+import asyncio
+
+from history_compaction import SUMMARY_PREFIX, HistoryCompactor, estimate_tokens, local_summary, transcript
+
+
+def conversation(turns, tool_output="resultado " * 200):
+    items = []
+    for n in range(turns):
+        items += [
+            {"role": "user", "content": f"busco termos {n}"},
+            {"type": "function_call", "name": "search_and_format_products", "arguments": "{}", "call_id": f"c{n}"},
+            {"type": "function_call_output", "call_id": f"c{n}", "output": tool_output},
+            {"role": "assistant", "content": f"Aquí tienes opciones {n}"},
+        ]
+    return items
+
+
+def compact(compactor, items, summary=None):
+    return asyncio.run(compactor.compact(items, summary))
+
+
+def test_short_history_is_passed_through():
+    items = conversation(2)
+    compacted, summary = compact(HistoryCompactor(token_budget=10_000), items)
+    assert compacted == items and summary is None
+
+
+def test_old_tool_outputs_are_stubbed_recent_ones_kept():
+    items = conversation(6)
+    compacted, _ = compact(HistoryCompactor(token_budget=100_000, keep_turns=2, tool_output_chars=20), items)
+    outputs = [item["output"] for item in compacted if item.get("type") == "function_call_output"]
+    assert all("caracteres omitidos" in output for output in outputs[:4])
+    assert outputs[4:] == [items[18]["output"], items[22]["output"]]
+    assert len(compacted) == len(items)
+
+
+def test_over_budget_history_is_folded_into_a_summary():
+    calls = []
+
+    async def summarizer(previous, text):
+        calls.append(text)
+        return "cliente busca termos"
+
+    items = conversation(20)
+    compactor = HistoryCompactor(summarizer, token_budget=1500, keep_turns=2, tool_output_chars=50)
+    compacted, summary = compact(compactor, items)
+
+    assert len(calls) == 1
+    assert compacted[0] == {"role": "system", "content": SUMMARY_PREFIX + "cliente busca termos"}
+    assert compacted[-1] == items[-1]
+    assert sum(estimate_tokens(item) for item in compacted) <= 1500
+    # Folding starts at a user turn, so call/output pairs stay together
+    assert items[summary["covered"]]["role"] == "user"
+
+    # Next turn reuses the summary instead of summarizing again
+    items += conversation(1)
+    _, again = compact(compactor, items, summary)
+    assert again is summary and len(calls) == 1
+
+
+def test_summarizer_failure_falls_back_to_local_summary():
+    async def failing(previous, text):
+        raise RuntimeError("model unavailable")
+
+    compacted, summary = compact(HistoryCompactor(failing, token_budget=1500, keep_turns=2), conversation(20))
+    assert summary["text"].startswith("busco termos 0 | busco termos 1")
+    assert compacted[0]["content"].startswith(SUMMARY_PREFIX)
+
+
+def test_transcript_and_local_summary():
+    items = conversation(1, tool_output="x" * 1000)
+    lines = transcript(items, max_chars_per_item=50).splitlines()
+    assert lines[0] == "user: busco termos 0"
+    assert lines[1].startswith("[herramienta] search_and_format_products")
+    assert len(lines[2]) <= 51
+    assert local_summary("antes", items) == "antes | busco termos 0"
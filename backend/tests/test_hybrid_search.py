@@ -0,0 +1,54 @@
+import pandas as pd
+
+from catalog_index import CatalogIndex
+from hybrid_search import HybridRetriever, reciprocal_rank_fusion
+from vector_index import HashedNgramEmbedder, LocalVectorIndex
+
+
+def _catalog():
+    df = pd.DataFrame({
+        "nombre": ["Termo Kala", "Taza Luno", "Pluma Zen", "Termo Maha"],
+        "descripcion": [
+            "Termo de acero inoxidable doble pared",
+            "Taza de cerámica para café",
+            "Bolígrafo metálico de tinta azul",
+            "Termo deportivo de acero",
+        ],
+        "precio": ["150", "80", "25", "400"],
+        "price_numeric": [150.0, 80.0, 25.0, 400.0],
+    })
+    index = CatalogIndex(df, ["nombre", "descripcion"], ["nombre", "precio"])
+    vectors = LocalVectorIndex.from_texts(index.documents(), HashedNgramEmbedder())
+    return index, vectors
+
+
+def test_rrf_sums_reciprocal_ranks():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 1]], k=60)
+    assert [row for row, _ in fused] == [1, 3, 2]
+    assert fused[0][1] == 1 / 61 + 1 / 62
+
+
+def test_rrf_weights_and_first_seen_ties():
+    assert [row for row, _ in reciprocal_rank_fusion([[5], [7]])] == [5, 7]
+    assert [row for row, _ in reciprocal_rank_fusion([[5], [7]], weights=[1.0, 2.0])] == [7, 5]
+
+
+def test_search_applies_price_range_to_both_legs():
+    index, vectors = _catalog()
+    retriever = HybridRetriever(index, vectors)
+    names = [r["nombre"] for r in retriever.search_records("termo de acero", max_price=200)]
+    assert names[0] == "Termo Kala"
+    assert "Termo Maha" not in names
+
+
+def test_vector_floor_keeps_nonsense_queries_empty():
+    index, vectors = _catalog()
+    assert HybridRetriever(index, vectors).search("xkcd qwerty zzzz") == []
+    # Without a floor, any shared n-gram is a vector hit
+    assert HybridRetriever(index, vectors, min_score=0.0).search("xkcd qwerty zzzz") != []
+
+
+def test_vector_index_of_another_catalog_is_ignored():
+    index, _ = _catalog()
+    other = LocalVectorIndex.from_texts(["uno", "dos"], HashedNgramEmbedder())
+    assert HybridRetriever(index, other).search("taza cafe", limit=1) == [1]
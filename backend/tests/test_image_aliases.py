@@ -0,0 +1,46 @@
+import pandas as pd
+import pytest
+
+import tools
+from catalog_index import CatalogIndex
+from image_aliases import ImageAliasTable, expand_handles, handle_key, image_handles
+
+KALA = "https://dl.airtable.com/.attachments/abc/kala.png?expires=1&signature=xyz"
+KALA_BACK = "https://dl.airtable.com/.attachments/def/kala-back.png"
+LUNO = "https://img.example/luno.png"
+
+
+@pytest.fixture
+def table():
+    index = CatalogIndex(
+        pd.DataFrame({
+            "sku": ["PS22706-TL 035", "PS-3"],
+            "nombre": ["Termo Kala", "Taza Luno"],
+            "descripcion": ["Termo de acero", "Taza de cerámica"],
+            "precio": ["150", "80"],
+            "price_numeric": [150.0, 80.0],
+            "imagenes_url": [f"kala.png ({KALA}), kala-back.png ({KALA_BACK})", LUNO],
+        }),
+        tools.CATALOGS["promo"]["text_columns"],
+        tools.CATALOGS["promo"]["result_columns"],
+    )
+    return ImageAliasTable(index, "sku", "imagenes_url")
+
+
+def test_handles_round_trip_to_urls(table):
+    handles = image_handles("PS22706-TL 035", f"{KALA}, {KALA_BACK}")
+    assert handle_key("PS22706-TL 035") == "ps22706-tl_035"
+    assert handles == ["img:ps22706-tl_035-1", "img:ps22706-tl_035-2"]
+    assert expand_handles(handles, [table]) == [KALA, KALA_BACK]
+    assert expand_handles("Foto: img:ps-3-1.", [table]) == f"Foto: {LUNO}."
+
+
+def test_upper_case_handles_are_expanded(table):
+    text = "Mira IMG:PS22706-TL_035-2 y img:PS-3-1"
+    assert expand_handles(text, [table]) == f"Mira {KALA_BACK} y {LUNO}"
+
+
+def test_unknown_handles_and_nested_values(table):
+    value = {"images": ["img:ps-3-1", "img:ps-3-9", "img:nope-1"], "price": 80}
+    assert expand_handles(value, [None, table]) == {"images": [LUNO, "img:ps-3-9", "img:nope-1"], "price": 80}
+    assert expand_handles("sin imágenes", [table]) == "sin imágenes"
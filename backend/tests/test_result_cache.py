@@ -0,0 +1,63 @@
+import ttl_cache
+from result_cache import SearchResultCache, normalize_key
+
+LUNO = {"sku": "KIT-01", "nombre": "☕ Kit Café Luno", "precio": "450"}
+KALA = {"sku": "PS-22706", "nombre": "Termo Kala", "precio": "150"}
+
+
+def test_normalize_key_folds_accents_case_and_symbols():
+    assert normalize_key("☕ Kit Café Luno") == "kit cafe luno"
+
+
+def test_lookup_by_sku_name_partial_and_fuzzy():
+    cache = SearchResultCache()
+    cache.store("c1", [LUNO, KALA])
+    assert cache.lookup("c1", "ps-22706") is KALA
+    assert cache.lookup("c1", "kit cafe luno") is LUNO
+    assert cache.lookup("c1", "luno") is LUNO
+    assert cache.lookup("c1", "termo kalla") is KALA
+    assert cache.lookup("c1", "mochila") is None
+    assert cache.lookup("c2", "luno") is None
+
+
+def test_newer_results_replace_the_same_product():
+    cache = SearchResultCache()
+    cache.store("c1", [KALA])
+    cache.store("c1", [{**KALA, "precio": "140"}])
+    assert cache.lookup("c1", "termo kala")["precio"] == "140"
+
+
+def test_lru_bound_evicts_least_recently_used():
+    cache = SearchResultCache(max_conversations=2)
+    cache.store("a", [LUNO])
+    cache.store("b", [LUNO])
+    cache.lookup("a", "luno")
+    cache.store("c", [LUNO])
+    assert len(cache) == 2
+    assert not cache.has_results("b")
+    assert cache.has_results("a") and cache.has_results("c")
+
+
+def test_results_expire_after_the_latest_search(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ttl_cache.time, "monotonic", lambda: now[0])
+    cache = SearchResultCache(ttl_seconds=60)
+    cache.store("a", [LUNO])
+    now[0] += 50
+    cache.store("a", [KALA])
+    now[0] += 50
+    assert cache.lookup("a", "luno") is LUNO
+    now[0] += 11
+    assert not cache.has_results("a")
+
+
+def test_results_from_an_older_catalog_version_are_not_served():
+    cache = SearchResultCache()
+    cache.store("a", [LUNO], catalog_version=1)
+    assert cache.has_results("a", catalog_version=1)
+    assert cache.lookup("a", "luno", catalog_version=2) is None
+    assert not cache.has_results("a", catalog_version=2)
+
+    cache.store("a", [KALA], catalog_version=2)
+    assert cache.lookup("a", "luno", catalog_version=2) is None
+    assert cache.lookup("a", "kala", catalog_version=2) is KALA
@@ -0,0 +1,80 @@
+import asyncio
+import threading
+
+import pytest
+
+from search_executor import SearchExecutor, SearchOverloaded, SearchTimeout
+
+
+@pytest.fixture
+def executor():
+    executor = SearchExecutor(max_workers=1, max_queue=1, timeout=5.0)
+    yield executor
+    executor.shutdown()
+
+
+def test_results_errors_and_counters(executor):
+    def boom():
+        raise ValueError("bad query")
+
+    async def scenario():
+        assert await executor.run(sum, [1, 2, 3]) == 6
+        with pytest.raises(ValueError):
+            await executor.run(boom)
+
+    asyncio.run(scenario())
+    stats = executor.stats()
+    assert (stats["submitted"], stats["completed"], stats["failed"]) == (2, 1, 1)
+    assert (stats["running"], stats["queued"], stats["timeouts"], stats["rejected"]) == (0, 0, 0, 0)
+
+
+def test_slow_search_times_out_and_holds_its_worker(executor):
+    release = threading.Event()
+
+    async def scenario():
+        with pytest.raises(SearchTimeout):
+            await executor.run(release.wait, timeout=0.05)
+        # Still running: the worker stays taken until the search returns
+        assert executor.stats()["running"] == 1
+        release.set()
+        assert await executor.run(lambda: "ok") == "ok"
+
+    asyncio.run(scenario())
+    stats = executor.stats()
+    assert stats["timeouts"] == 1 and stats["completed"] == 2 and stats["running"] == 0
+
+
+def test_full_queue_rejects_instead_of_waiting(executor):
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(executor.run(release.wait))
+        queued = asyncio.ensure_future(executor.run(lambda: "queued"))
+        await asyncio.sleep(0.05)
+        assert executor.stats()["queued"] == 1
+
+        with pytest.raises(SearchOverloaded):
+            await executor.run(lambda: "rejected")
+
+        release.set()
+        return await running, await queued
+
+    assert asyncio.run(scenario()) == (True, "queued")
+    stats = executor.stats()
+    assert (stats["rejected"], stats["peak_queued"], stats["completed"]) == (1, 1, 2)
+
+
+def test_search_timed_out_in_the_queue_releases_its_slot(executor):
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0.02)
+        with pytest.raises(SearchTimeout):
+            await executor.run(lambda: "never", timeout=0.05)
+        assert executor.stats()["queued"] == 0
+        release.set()
+        await running
+
+    asyncio.run(scenario())
+    assert executor.stats()["completed"] == 1
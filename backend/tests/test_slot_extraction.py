@@ -0,0 +1,111 @@
+import asyncio
+import json
+
+import pytest
+from agents.tool_context import ToolContext
+
+import main
+from slot_extraction import SlotExtractor, format_price_range, parse_number, parse_price_range
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("termos de menos de 300 pesos", (None, 300.0)),
+    ("algo entre 100 y 200", (100.0, 200.0)),
+    ("de 100 a 200 pesos", (100.0, 200.0)),
+    ("más de 500", (500.0, None)),
+    ("tengo $1,500", (None, 1500.0)),
+    ("presupuesto de 2 mil", (None, 2000.0)),
+    ("alrededor de 300 pesos", (240.0, 360.0)),
+])
+def test_price_ranges(message, expected):
+    assert parse_price_range(message) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("message", [
+    "500 piezas de termos",
+    "necesito 500",
+    "precio del modelo PS-22706",
+    "quiero 100 tazas para el 2025",
+])
+def test_quantities_and_codes_are_not_budgets(message):
+    assert parse_price_range(message) is None
+
+
+def test_expecting_budget_reads_a_bare_number():
+    assert parse_price_range("300", expecting_budget=True) == (None, 300.0)
+    assert parse_price_range("300") is None
+
+
+def test_number_formats():
+    assert parse_number("1,500") == 1500.0
+    assert parse_number("1.500,50") == 1500.5
+    assert parse_number("99.90") == 99.9
+    assert format_price_range(100, 200) == "entre $100 y $200 MXN"
+
+
+@pytest.fixture
+def extractor():
+    return SlotExtractor(["Termos", "Tazas", "Bolígrafos", "Acc. Casa"])
+
+
+def test_fill_sets_product_type_and_budget(extractor):
+    context = main.create_initial_context("s1")
+    changes = extractor.fill(context, "Busco plumas de menos de 50 pesos")
+    # min_price was already None, so it is not reported as a change
+    assert changes == {"descripcion": "plumas", "categoria": "Bolígrafos", "max_price": 50.0, "precio": "hasta $50 MXN"}
+    assert context.max_price == 50.0
+
+
+def test_fill_ignores_bare_numbers(extractor):
+    context = main.create_initial_context("s2")
+    extractor.fill(context, "termos")
+    assert extractor.fill(context, "necesito 500") == {}
+    assert context.max_price is None
+
+
+def test_fill_does_not_overwrite_a_description(extractor):
+    context = main.create_initial_context("s3")
+    context.descripcion, context.categoria = "termos de acero con grabado láser", "Termos"
+    extractor.fill(context, "y tazas?")
+    assert (context.descripcion, context.categoria) == ("termos de acero con grabado láser", "Termos")
+
+    # Budgets still follow the latest message
+    extractor.fill(context, "hasta 200 pesos")
+    extractor.fill(context, "mejor hasta 300 pesos")
+    assert context.max_price == 300.0
+
+
+@pytest.mark.parametrize("message, phrase", [
+    ("Busco plumas metálicas con grabado láser de menos de 50 pesos", "plumas metálicas con grabado láser"),
+    ("termos de acero inoxidable, 200 piezas", "termos de acero inoxidable"),
+    ("necesito 300 tazas blancas para un evento", "tazas blancas"),
+    ("termos de menos de 300 pesos", "termos"),
+])
+def test_description_keeps_the_customers_product_phrase(extractor, message, phrase):
+    context = main.create_initial_context("s4")
+    extractor.fill(context, message)
+    assert context.descripcion == phrase
+
+
+def test_prompt_note_lets_the_agent_refine_the_description(extractor):
+    context = main.create_initial_context("s5")
+    extractor.fill(context, "plumas metálicas de menos de 50 pesos")
+    note = main.captured_slots(context)
+    assert "- descripcion: plumas metálicas" in note and "- precio: hasta $50 MXN" in note
+    assert "do NOT call save_product_description" not in note
+
+
+def save_budget(context, precio):
+    raw = json.dumps({"precio": precio})
+    tool_context = ToolContext(context=context, tool_name="save_budget", tool_call_id="call-1", tool_arguments=raw)
+    return asyncio.run(main.save_budget.on_invoke_tool(tool_context, raw))
+
+
+def test_save_budget_replaces_the_numeric_range():
+    context = main.create_initial_context("s6")
+    save_budget(context, "300")
+    assert (context.min_price, context.max_price) == (None, 300.0)
+
+    save_budget(context, "lo más barato posible")
+    assert context.precio == "lo más barato posible"
+    assert (context.min_price, context.max_price) == (None, None)
@@ -0,0 +1,32 @@
+import ttl_cache
+from ttl_cache import TTLCache
+
+
+def test_lru_eviction_and_stats():
+    cache = TTLCache(max_size=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c"), len(cache)) == (1, 3, 2)
+    assert cache.stats() == {"size": 2, "hits": 3, "misses": 1, "evictions": 1, "hit_rate": 0.75}
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ttl_cache.time, "monotonic", lambda: now[0])
+    cache = TTLCache(max_size=10, ttl_seconds=60)
+    cache.set("a", 1)
+
+    now[0] += 59
+    assert cache.get("a") == 1
+    now[0] += 2
+    assert cache.get("a") is None
+    assert len(cache) == 0 and cache.stats()["evictions"] == 1
+
+    # Storing again restarts the clock
+    cache.set("a", 2)
+    now[0] += 30
+    assert cache.get("a") == 2
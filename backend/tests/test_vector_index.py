@@ -0,0 +1,103 @@
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from vector_index import HashedNgramEmbedder, LocalVectorIndex, load_or_build, texts_fingerprint
+
+TEXTS = [
+    "Termo de acero inoxidable 500 ml",
+    "Taza de cerámica blanca",
+    "Pluma metálica con grabado láser",
+    "Cilindro de plástico con tapa",
+    "Libreta ecológica de cartón",
+    "Gorra bordada de algodón",
+    "Termo de plástico con mosquetón",
+]
+QUERIES = ["termo acero", "tasa ceramica", "boligrafo metalico", "mochila"]
+
+
+class CountingEmbedder(HashedNgramEmbedder):
+    def __init__(self):
+        super().__init__()
+        self.embedded = 0
+
+    def embed(self, texts):
+        self.embedded += len(texts)
+        return super().embed(texts)
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "promo_vectors.npy")
+
+
+def meta(path):
+    return json.loads(Path(path + ".meta.json").read_text())
+
+
+def test_saved_index_is_memory_mapped_and_searches_the_same(path):
+    embedder = HashedNgramEmbedder()
+    built = LocalVectorIndex.from_texts(TEXTS, embedder)
+    built.save(path, texts_fingerprint(TEXTS))
+
+    loaded = LocalVectorIndex.load(path, embedder, texts_fingerprint(TEXTS))
+    assert isinstance(loaded.vectors, np.memmap) and not loaded.vectors.flags.writeable
+    np.testing.assert_array_equal(loaded.vectors, built.vectors)
+    assert loaded.search_many(QUERIES, k=3) == built.search_many(QUERIES, k=3)
+
+    mask = np.array([True, False, True, True, False, True, False])
+    assert loaded.search_many(QUERIES, k=3, mask=mask) == built.search_many(QUERIES, k=3, mask=mask)
+    assert loaded.search("termo", k=2) == built.search("termo", k=2)
+
+
+def test_load_rejects_other_documents_or_embedders(path):
+    embedder = HashedNgramEmbedder()
+    LocalVectorIndex.from_texts(TEXTS, embedder).save(path, texts_fingerprint(TEXTS))
+
+    assert LocalVectorIndex.load(path, embedder, texts_fingerprint(TEXTS[:-1])) is None
+    assert LocalVectorIndex.load(path, HashedNgramEmbedder(dim=256), texts_fingerprint(TEXTS)) is None
+    assert LocalVectorIndex.load(path + ".missing", embedder) is None
+
+    Path(path + ".meta.json").write_text("{not json")
+    assert LocalVectorIndex.load(path, embedder, texts_fingerprint(TEXTS)) is None
+
+
+def test_load_or_build_reuses_a_current_file(path):
+    embedder = CountingEmbedder()
+    first = load_or_build(path, TEXTS, embedder)
+    assert embedder.embedded == len(TEXTS)
+    assert meta(path) == {"rows": len(TEXTS), "dim": 512, "embedder": embedder.name, "fingerprint": texts_fingerprint(TEXTS)}
+    mtime = os.stat(path).st_mtime_ns
+
+    again = load_or_build(path, TEXTS, embedder)
+    assert embedder.embedded == len(TEXTS)
+    assert os.stat(path).st_mtime_ns == mtime
+    assert isinstance(again.vectors, np.memmap)
+    assert again.search_many(QUERIES, k=3) == first.search_many(QUERIES, k=3)
+
+
+def test_load_or_build_rebuilds_when_the_documents_change(path):
+    embedder = CountingEmbedder()
+    load_or_build(path, TEXTS, embedder)
+
+    changed = TEXTS[:-1] + ["Mochila de poliéster"]
+    index = load_or_build(path, changed, embedder)
+    assert embedder.embedded == 2 * len(TEXTS)
+    assert meta(path)["fingerprint"] == texts_fingerprint(changed)
+    assert index.search("mochila", k=1)[0][0] == len(changed) - 1
+
+    # A fingerprint passed in by the caller (e.g. from a catalog snapshot) is stored as is
+    fewer = TEXTS[:3]
+    index = load_or_build(path, fewer, embedder, fingerprint="snapshot-v2")
+    assert index.size == 3 and meta(path)["fingerprint"] == "snapshot-v2"
+
+
+def test_unwritable_path_falls_back_to_an_in_memory_index(tmp_path):
+    blocker = tmp_path / "not-a-dir"
+    blocker.write_text("")
+    index = load_or_build(str(blocker / "vectors.npy"), TEXTS, HashedNgramEmbedder())
+    assert not isinstance(index.vectors, np.memmap) and index.size == len(TEXTS)
+    assert index.search("termo acero", k=1)[0][0] == 0
@@ -0,0 +1,57 @@
+import json
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from catalog_snapshot import CATALOGS
+from vector_search import VECTOR_STORES, VectorStoreManager
+
+
+@pytest.fixture
+def promo_csv(tmp_path):
+    rows = [
+        {
+            "sku": f"PS-{n}",
+            "nombre": f"Termo {n}" if n % 3 else "Taza \"Luno\", cerámica",
+            "descripcion": "Termo de acero inoxidable con grabado láser " * (n % 4 + 1),
+            "categorias": "Termos, Acc. Casa",
+            "precio": f"{100 + n}.50",
+            "imagenes_url": "" if n % 5 == 0 else f"kala.png (https://img.example/{n}.png)",
+        }
+        for n in range(23)
+    ]
+    path = tmp_path / "promo.csv"
+    pd.DataFrame(rows).to_csv(path, index=False, encoding="utf-8-sig")
+    return str(path)
+
+
+def read_lines(paths):
+    return [line for path in paths for line in Path(path).read_text(encoding="utf-8").splitlines()]
+
+
+def test_vector_stores_export_the_served_catalogs():
+    for name, spec in VECTOR_STORES.items():
+        assert spec["csv_path"] == CATALOGS[name]["csv_path"]
+
+
+def test_chunked_sharded_export_matches_a_single_frame_export(tmp_path, promo_csv):
+    manager = VectorStoreManager()
+    single = manager.csv_to_jsonl(
+        promo_csv, str(tmp_path / "single.jsonl"), "promo", df=pd.read_csv(promo_csv, dtype=str, encoding="utf-8-sig")
+    )
+    shards = manager.csv_to_jsonl(promo_csv, str(tmp_path / "promo.jsonl"), "promo", chunk_rows=4, max_shard_bytes=1200)
+
+    assert len(single) == 1 and len(shards) > 1
+    assert [Path(path).name for path in shards[:2]] == ["promo-00000.jsonl", "promo-00001.jsonl"]
+    assert read_lines(shards) == read_lines(single)
+    for path in shards:
+        size = Path(path).stat().st_size
+        assert size <= 1200 or len(read_lines([path])) == 1
+
+    documents = [json.loads(line) for line in read_lines(shards)]
+    assert len(documents) == 23
+    assert documents[0]["metadata"]["nombre"] == 'Taza "Luno", cerámica'
+    assert documents[0]["metadata"]["imagenes_url"] == "nan"
+    assert documents[1]["text"].startswith("Producto: Termo 1 - Termo de acero")
+    assert documents[1]["metadata"]["type"] == "promotional_product"
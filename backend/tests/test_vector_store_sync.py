@@ -0,0 +1,142 @@
+import json
+
+import pytest
+
+from fake_openai import FakeOpenAI
+from vector_store_sync import VectorStoreSync
+
+
+def documents(count, changed=()):
+    rows = []
+    for n in range(count):
+        text = f"Producto {n}" + (" (nuevo precio)" if n in changed else "")
+        rows.append((f"sku-{n}", {"id": f"sku-{n}", "text": text}))
+    return rows
+
+
+@pytest.fixture
+def client():
+    return FakeOpenAI()
+
+
+@pytest.fixture
+def manifest_path(tmp_path):
+    return tmp_path / "promo.manifest.json"
+
+
+def make_sync(client, manifest_path, **kwargs):
+    sleeps = []
+    sync = VectorStoreSync(client, str(manifest_path), "Promotional Products", rows_per_chunk=10,
+                           sleep=sleeps.append, **kwargs)
+    return sync, sleeps
+
+
+def manifest(manifest_path):
+    return json.loads(manifest_path.read_text())
+
+
+def test_first_sync_creates_store_and_manifest(client, manifest_path):
+    sync, _ = make_sync(client, manifest_path)
+    result = sync.sync(documents(40))
+
+    assert result.uploaded == 4 and result.failed == 0
+    assert len(client.store_documents(result.vector_store_id)) == 40
+    saved = manifest(manifest_path)
+    assert saved["vector_store_id"] == result.vector_store_id
+    assert len(saved["rows"]) == 40 and len(saved["chunks"]) == 4
+
+
+def test_unchanged_catalog_uploads_nothing(client, manifest_path):
+    sync, _ = make_sync(client, manifest_path)
+    first = sync.sync(documents(40))
+    files = set(client.files_by_id)
+
+    again = sync.sync(documents(40))
+    assert again.vector_store_id == first.vector_store_id
+    assert (again.uploaded, again.unchanged, again.removed) == (0, 4, 0)
+    assert set(client.files_by_id) == files
+
+
+def test_changed_row_reuploads_only_its_chunk(client, manifest_path):
+    sync, _ = make_sync(client, manifest_path)
+    store_id = sync.sync(documents(40)).vector_store_id
+    before = manifest(manifest_path)["chunks"]
+
+    result = sync.sync(documents(40, changed={7}))
+    after = manifest(manifest_path)["chunks"]
+    replaced = [bucket for bucket in after if after[bucket]["file_id"] != before[bucket]["file_id"]]
+
+    assert (result.changed_rows, result.uploaded, result.unchanged, result.removed) == (1, 1, 3, 1)
+    assert len(replaced) == 1
+    assert before[replaced[0]]["file_id"] not in client.files_by_id
+    assert client.store_documents(store_id)["sku-7"]["text"] == "Producto 7 (nuevo precio)"
+    assert len(client.stores[store_id]) == 4
+
+
+def test_added_and_deleted_rows_follow_the_manifest(client, manifest_path):
+    sync, _ = make_sync(client, manifest_path)
+    store_id = sync.sync(documents(40)).vector_store_id
+
+    added = documents(42)
+    sync.sync(added)
+    assert set(client.store_documents(store_id)) == {key for key, _ in added}
+
+    remaining = [row for row in added if row[0] not in {"sku-3", "sku-41"}]
+    result = sync.sync(remaining)
+    assert result.changed_rows == 0 and result.uploaded >= 1
+    assert set(client.store_documents(store_id)) == {key for key, _ in remaining}
+    assert set(manifest(manifest_path)["rows"]) == {key for key, _ in remaining}
+
+
+def test_failed_upload_keeps_the_previous_chunk(client, manifest_path):
+    sync, _ = make_sync(client, manifest_path)
+    store_id = sync.sync(documents(40)).vector_store_id
+    before = manifest(manifest_path)["chunks"]
+
+    client.fail_uploads_containing.add(b"nuevo precio")
+    result = sync.sync(documents(40, changed={7}))
+    assert (result.uploaded, result.failed, result.removed) == (0, 1, 0)
+    assert manifest(manifest_path)["chunks"] == before
+    assert client.store_documents(store_id)["sku-7"]["text"] == "Producto 7"
+
+    client.fail_uploads_containing.clear()
+    assert sync.sync(documents(40, changed={7})).uploaded == 1
+
+
+def test_rebucketing_deletes_old_files_only_after_every_upload_succeeds(client, manifest_path):
+    sync, _ = make_sync(client, manifest_path)
+    store_id = sync.sync(documents(10)).vector_store_id
+    old_files = set(client.stores[store_id])
+
+    # 10 -> 60 rows changes the bucket count; one new chunk fails to ingest
+    client.fail_uploads_containing.add(b"Producto 55")
+    grown = documents(60)
+    result = sync.sync(grown)
+    assert result.failed == 1 and result.removed == 0
+    assert old_files <= set(client.stores[store_id])
+    assert set(client.store_documents(store_id)) >= {f"sku-{n}" for n in range(10)}
+    assert set(manifest(manifest_path)["retired"]) == old_files
+
+    client.fail_uploads_containing.clear()
+    result = sync.sync(grown)
+    assert result.failed == 0 and result.uploaded == 1 and result.removed == len(old_files)
+    assert not old_files & set(client.files_by_id)
+    assert manifest(manifest_path)["retired"] == []
+    assert set(client.store_documents(store_id)) == {key for key, _ in grown}
+
+
+def test_ingestion_is_polled_with_backoff(manifest_path):
+    client = FakeOpenAI(polls_until_done=4)
+    sync, sleeps = make_sync(client, manifest_path, poll_interval=0.5, max_poll_interval=2.0, max_workers=1)
+    assert sync.sync(documents(5)).uploaded == 1
+    assert sleeps == [0.5, 1.0, 2.0, 2.0]
+
+
+def test_missing_store_is_recreated(client, manifest_path):
+    sync, _ = make_sync(client, manifest_path)
+    store_id = sync.sync(documents(20)).vector_store_id
+    del client.stores[store_id]
+
+    result = sync.sync(documents(20))
+    assert result.vector_store_id != store_id and result.uploaded == 2
+    assert len(client.store_documents(result.vector_store_id)) == 20
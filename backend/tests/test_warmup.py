@@ -0,0 +1,85 @@
+import asyncio
+import json
+
+import pandas as pd
+import pytest
+from agents import FileSearchTool
+from agents.tool_context import ToolContext
+
+import main
+import tools
+from catalog_index import CatalogIndex
+from hybrid_search import HybridRetriever
+from vector_index import HashedNgramEmbedder, LocalVectorIndex
+
+
+def small_catalogs():
+    promo = CatalogIndex(
+        pd.DataFrame({
+            "sku": ["PS-1", "PS-2", "PS-3"],
+            "nombre": ["Termo Kala", "Termo Maha", "Taza Luno"],
+            "descripcion": ["Termo de acero inoxidable", "Termo deportivo de acero", "Taza de cerámica"],
+            "precio": ["150", "400", "80"],
+            "price_numeric": [150.0, 400.0, 80.0],
+            "imagenes_url": ["https://img.example/kala.png", "", ""],
+        }),
+        tools.CATALOGS["promo"]["text_columns"],
+        tools.CATALOGS["promo"]["result_columns"],
+    )
+    suitup = tools._empty_index("suitup")
+    vectors = LocalVectorIndex.from_texts(promo.documents(), HashedNgramEmbedder())
+    return tools.CatalogSet(
+        99, promo, suitup,
+        promo_retriever=HybridRetriever(promo, vectors),
+        **tools._image_tables(promo, suitup),
+    )
+
+
+@pytest.fixture
+def warmed_up(monkeypatch):
+    """Agents as they are after a warmup that resolved both vector stores."""
+    monkeypatch.setattr(tools, "_catalogs", small_catalogs())
+    monkeypatch.setattr(tools, "promo_file_search", FileSearchTool(vector_store_ids=["vs_promo"]))
+    monkeypatch.setattr(tools, "suitup_file_search", FileSearchTool(vector_store_ids=["vs_suitup"]))
+    for agent in (main.promoselect_agent, main.suitup_agent):
+        monkeypatch.setattr(agent, "tools", list(agent.tools))
+    was_loaded = tools.CATALOGS_LOADED.is_set()
+    tools.CATALOGS_LOADED.set()
+    assert main.use_file_search_tools()
+    yield
+    if not was_loaded:
+        tools.CATALOGS_LOADED.clear()
+
+
+def call_tool(agent, name, context, **arguments):
+    tool = next(t for t in agent.tools if getattr(t, "name", None) == name)
+    raw = json.dumps(arguments)
+    tool_context = ToolContext(context=context, tool_name=name, tool_call_id="call-1", tool_arguments=raw)
+    return asyncio.run(tool.on_invoke_tool(tool_context, raw))
+
+
+def test_local_search_tools_stay_next_to_file_search(warmed_up):
+    promo_names = [t.name for t in main.promoselect_agent.tools]
+    assert "search_and_format_products" in promo_names and "file_search" in promo_names
+    suitup_names = [t.name for t in main.suitup_agent.tools]
+    assert "search_and_format_kits" in suitup_names and "file_search" in suitup_names
+
+    # Idempotent: a second call does not add the FileSearchTool again
+    main.use_file_search_tools()
+    assert [t.name for t in main.promoselect_agent.tools].count("file_search") == 1
+
+
+def test_search_after_warmup_uses_cards_budget_cache_and_executor(warmed_up):
+    context = main.create_initial_context("warm-1")
+    context.max_price = 200.0
+    submitted = tools.SEARCH_EXECUTOR.stats()["submitted"]
+
+    output = call_tool(main.promoselect_agent, "search_and_format_products", context, keyword="termo de acero")
+
+    cards = tools.cards_from_output(output)
+    assert [card["sku"] for card in cards] == ["PS-1"]  # the parsed budget filtered out PS-2
+    assert cards[0]["images"] == ["img:ps-1-1"]
+    assert tools.SEARCH_EXECUTOR.stats()["submitted"] == submitted + 1
+
+    details = call_tool(main.promoselect_agent, "get_product_info", context, product_name="termo kala")
+    assert "SKU: PS-1" in details
@@ -2,15 +2,27 @@
 Advanced search tools for promotional products using precise + fuzzy search strategy.
 """
 
+import asyncio
 import pandas as pd
 import pathlib
+import json
 import os
 import logging
-from typing import List, Dict
-from agents import function_tool, FileSearchTool
-from openai import OpenAI
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Any, Callable, List, Dict, Optional, Tuple
+from agents import function_tool, FileSearchTool, RunContextWrapper
 from dotenv import load_dotenv
 from vector_search import vector_manager
+from catalog_index import CatalogIndex
+from catalog_snapshot import CATALOGS, load_catalog
+from catalog_watcher import CatalogWatcher
+from vector_index import HashedNgramEmbedder, load_or_build
+from image_aliases import ImageAliasTable, expand_handles, image_handles
+from hybrid_search import HybridRetriever
+from result_cache import SearchResultCache
+from search_executor import SearchExecutor, SearchOverloaded, SearchTimeout
 
 # Load environment variables from .env file
 load_dotenv()
@@ -21,36 +33,336 @@ logger = logging.getLogger(__name__)
 # CLEAN OUTPUT FORMATTING & PRODUCT STORAGE
 # ============================
 
-# Global storage for last search results (for user follow-up questions)
-_last_search_results = []
+# Recent search results per conversation (for user follow-up questions)
+SEARCH_RESULTS = SearchResultCache(
+    max_conversations=int(os.getenv("SEARCH_CACHE_MAX_CONVERSATIONS", "1000")),
+    ttl_seconds=float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "3600")),
+)
+
+def _conversation_key(context: RunContextWrapper) -> str:
+    """Key identifying the conversation a tool call belongs to."""
+    ctx = getattr(context, "context", None)
+    conversation_id = getattr(ctx, "conversation_id", None)
+    return conversation_id or f"context-{id(ctx)}"
+
+def _remember_results(context: RunContextWrapper, results: List[Dict], catalog_version: int) -> None:
+    """Store search results so get_product_info can answer follow-ups."""
+    SEARCH_RESULTS.store(_conversation_key(context), results, catalog_version)
+
+def _price_range(
+    context: RunContextWrapper, min_price: float | None, max_price: float | None
+) -> Tuple[float | None, float | None]:
+    """Price range passed by the model, or the budget already parsed into the context."""
+    if min_price is None and max_price is None:
+        ctx = getattr(context, "context", None)
+        return getattr(ctx, "min_price", None), getattr(ctx, "max_price", None)
+    return min_price, max_price
+
+# ============================
+# PRODUCT CARDS
+# ============================
+
+# Told to the model with every card payload: the cards reach the customer without it
+CARD_NOTE = (
+    "Estas tarjetas ya se muestran al cliente con imagen, precio y descripción. "
+    "Responde solo con una introducción breve (una o dos frases); no repitas nombres, precios ni enlaces."
+)
+
+def _card_text(value) -> str:
+    """Catalog value as card text ('' for missing values)."""
+    return "" if pd.isna(value) else str(value).strip()
+
+def _record_image_handles(record: Dict) -> List[str]:
+    """Image handles of a product (keyed by SKU) or kit (keyed by name) result record."""
+    if "imagenes_url" in record:
+        return image_handles(record.get("sku"), record.get("imagenes_url"))
+    return image_handles(record.get("nombre"), record.get("imagen"))
+
+def product_card(product: Dict) -> Dict:
+    """Card for one promotional product search result."""
+    return {
+        "kind": "product",
+        "sku": _card_text(product.get("sku")),
+        "name": _card_text(product.get("nombre")),
+        "description": _card_text(product.get("descripcion")),
+        "price": _card_text(product.get("precio")),
+        "currency": "MXN",
+        "images": _record_image_handles(product),
+    }
+
+def kit_card(kit: Dict) -> Dict:
+    """Card for one kit search result."""
+    return {
+        "kind": "kit",
+        "name": _card_text(kit.get("nombre")),
+        "description": _card_text(kit.get("descripcion")),
+        "products": _card_text(kit.get("productos")),
+        "price": _card_text(kit.get("precio")),
+        "currency": "MXN",
+        "images": _record_image_handles(kit),
+    }
+
+def expand_image_handles(value):
+    """Image handles in ``value`` (str, or nested list/dict) replaced with URLs from the current catalogs."""
+    catalogs = current_catalogs()
+    return expand_handles(value, (catalogs.promo_images, catalogs.suitup_images))
+
+def card_payload(cards: List[Dict]) -> str:
+    """Tool output carrying result cards (JSON the API recognizes with ``cards_from_output``)."""
+    return json.dumps({"cards": cards, "nota": CARD_NOTE}, ensure_ascii=False, separators=(",", ":"))
+
+def cards_from_output(output) -> List[Dict]:
+    """Cards in a search tool's output, or [] for any other tool output."""
+    if not isinstance(output, str) or not output.startswith('{"cards":'):
+        return []
+    try:
+        cards = json.loads(output).get("cards")
+    except ValueError:
+        return []
+    return cards if isinstance(cards, list) else []
+
+def card_text(card: Dict) -> str:
+    """Plain-text rendering of a card for clients that do not render cards."""
+    text = f"{card.get('name', '')} — {card.get('description', '')}"
+    if card.get("products"):
+        text += f" — ({card['products']})"
+    return f"{text} | {card.get('price', '')} {card.get('currency', 'MXN')}"
+
+# ============================
+# CATALOG STATE & WARMUP
+# ============================
 
-# Load CSV files into memory on module import (fast access)
+# Catalogs are memory-mapped from columnar snapshots (built from the CSVs when missing or stale)
 current_dir = pathlib.Path(__file__).parent
-PROMO_CSV_PATH = os.getenv("PROMO_CSV_PATH", str(current_dir / "../data/promo.csv"))
-SUITUP_CSV_PATH = os.getenv("SUITUP_CSV_PATH", str(current_dir / "../data/suitup.csv"))
-
-# Load DataFrames with error handling
-try:
-    PROMO_CATALOG = pd.read_csv(PROMO_CSV_PATH)
-    # Clean and convert price column
-    PROMO_CATALOG["price_numeric"] = (
-        PROMO_CATALOG["precio"].astype(str).str.replace(r"[^\d.]", "", regex=True).astype(float)
+PROMO_CSV_PATH = CATALOGS["promo"]["csv_path"]
+SUITUP_CSV_PATH = CATALOGS["suitup"]["csv_path"]
+
+# Result columns returned by the search tools
+PROMO_RESULT_COLUMNS = CATALOGS["promo"]["result_columns"]
+SUITUP_RESULT_COLUMNS = CATALOGS["suitup"]["result_columns"]
+
+# Local embedding indexes (offline semantic search, memory-mapped from .npy)
+PROMO_VECTORS_PATH = os.getenv("PROMO_VECTORS_PATH", str(current_dir / "promo_vectors.npy"))
+SUITUP_VECTORS_PATH = os.getenv("SUITUP_VECTORS_PATH", str(current_dir / "suitup_vectors.npy"))
+EMBEDDER = HashedNgramEmbedder()
+
+# Vector similarity floors, calibrated on the catalogs: on-topic queries score above them and
+# unrelated ones below. Kit documents are longer, so their scores run lower
+PROMO_VECTOR_MIN_SCORE = float(os.getenv("PROMO_VECTOR_MIN_SCORE", "0.35"))
+SUITUP_VECTOR_MIN_SCORE = float(os.getenv("SUITUP_VECTOR_MIN_SCORE", "0.25"))
+
+# How long a search issued during startup waits for the catalogs before answering empty
+CATALOG_WAIT_SECONDS = float(os.getenv("CATALOG_WAIT_SECONDS", "10"))
+
+
+@dataclass(frozen=True)
+class CatalogSet:
+    """Indexes read by the search tools; replaced as a whole, never modified in place."""
+    version: int
+    promo_index: CatalogIndex
+    suitup_index: CatalogIndex
+    promo_documents_fingerprint: Optional[str] = None
+    suitup_documents_fingerprint: Optional[str] = None
+    # Hybrid (keyword + vector) retrievers; None until the local vector indexes are loaded
+    promo_retriever: Optional[HybridRetriever] = None
+    suitup_retriever: Optional[HybridRetriever] = None
+    # Image handle -> URL lookups for the API (set by _image_tables)
+    promo_images: Optional[ImageAliasTable] = None
+    suitup_images: Optional[ImageAliasTable] = None
+
+
+def _empty_index(name: str) -> CatalogIndex:
+    return CatalogIndex(pd.DataFrame(), CATALOGS[name]["text_columns"], CATALOGS[name]["result_columns"])
+
+
+def _image_tables(promo_index: CatalogIndex, suitup_index: CatalogIndex) -> Dict[str, ImageAliasTable]:
+    return {
+        "promo_images": ImageAliasTable(promo_index, "sku", "imagenes_url"),
+        "suitup_images": ImageAliasTable(suitup_index, "nombre", "imagen"),
+    }
+
+
+def _empty_catalog_set() -> CatalogSet:
+    promo_index, suitup_index = _empty_index("promo"), _empty_index("suitup")
+    return CatalogSet(0, promo_index, suitup_index, **_image_tables(promo_index, suitup_index))
+
+
+_catalogs = _empty_catalog_set()
+_catalog_listeners: List[Callable[[CatalogSet], None]] = []
+_warmup_lock = threading.Lock()
+# Serializes warmup and reloads (each builds on the version before it)
+_catalog_lock = threading.Lock()
+_warmup_thread: Optional[threading.Thread] = None
+CATALOGS_LOADED = threading.Event()
+WARMUP_DONE = threading.Event()
+
+# Startup progress per stage: pending, ready or unavailable
+WARMUP_STATUS: Dict[str, str] = {"catalogs": "pending", "local_vectors": "pending", "vector_stores": "pending"}
+
+
+def current_catalogs() -> CatalogSet:
+    """Catalog version in use; hold on to the returned set for the whole search."""
+    return _catalogs
+
+
+def _ready_catalogs() -> CatalogSet:
+    """Current catalogs, waiting (bounded) for the first load when called during startup."""
+    if not CATALOGS_LOADED.is_set():
+        start_warmup()
+        CATALOGS_LOADED.wait(CATALOG_WAIT_SECONDS)
+    return _catalogs
+
+
+def add_catalog_listener(callback: Callable[[CatalogSet], None]) -> None:
+    """Call ``callback`` with every newly loaded catalog version (and the current one, if loaded)."""
+    _catalog_listeners.append(callback)
+    if CATALOGS_LOADED.is_set():
+        callback(_catalogs)
+
+
+def _install(catalogs: CatalogSet, notify: bool = True) -> None:
+    global _catalogs
+    _catalogs = catalogs
+    if not notify:
+        return
+    for callback in _catalog_listeners:
+        try:
+            callback(catalogs)
+        except Exception as e:
+            logger.error(f"Catalog listener failed for version {catalogs.version}: {e}")
+
+
+def _load_catalog_set(previous: CatalogSet) -> CatalogSet:
+    """
+    Load both catalog indexes as the version after ``previous`` (keyword search only).
+    
+    Raises:
+        ValueError: if a catalog that ``previous`` had comes back empty (unreadable CSV)
+    """
+    promo_index, promo_fingerprint = load_catalog(**CATALOGS["promo"])
+    suitup_index, suitup_fingerprint = load_catalog(**CATALOGS["suitup"])
+    for name, index, old in (("promo", promo_index, previous.promo_index), ("suitup", suitup_index, previous.suitup_index)):
+        if index.empty and not old.empty:
+            raise ValueError(f"Catalog {name} loaded empty; keeping version {previous.version}")
+    logger.info(f"Loaded {promo_index.size} promotional products and {suitup_index.size} promotional kits")
+    return CatalogSet(
+        previous.version + 1, promo_index, suitup_index, promo_fingerprint, suitup_fingerprint,
+        **_image_tables(promo_index, suitup_index),
+    )
+
+
+def _with_local_vectors(catalogs: CatalogSet) -> CatalogSet:
+    """``catalogs`` plus hybrid retrievers over its local vector indexes (loaded or built)."""
+    promo_vectors = load_or_build(
+        PROMO_VECTORS_PATH, catalogs.promo_index.documents(), EMBEDDER, catalogs.promo_documents_fingerprint
     )
-    logger.info(f"Loaded {len(PROMO_CATALOG)} promotional products")
-except Exception as e:
-    logger.error(f"Failed to load promo catalog: {e}")
-    PROMO_CATALOG = pd.DataFrame()
-
-try:
-    SUITUP_CATALOG = pd.read_csv(SUITUP_CSV_PATH)
-    # Clean and convert price column  
-    SUITUP_CATALOG["price_numeric"] = (
-        SUITUP_CATALOG["precio"].astype(str).str.replace(r"[^\d.]", "", regex=True).astype(float)
+    suitup_vectors = load_or_build(
+        SUITUP_VECTORS_PATH, catalogs.suitup_index.documents(), EMBEDDER, catalogs.suitup_documents_fingerprint
     )
-    logger.info(f"Loaded {len(SUITUP_CATALOG)} promotional kits")
-except Exception as e:
-    logger.error(f"Failed to load suitup catalog: {e}")
-    SUITUP_CATALOG = pd.DataFrame()
+    return replace(
+        catalogs,
+        promo_retriever=HybridRetriever(catalogs.promo_index, promo_vectors, min_score=PROMO_VECTOR_MIN_SCORE),
+        suitup_retriever=HybridRetriever(catalogs.suitup_index, suitup_vectors, min_score=SUITUP_VECTOR_MIN_SCORE),
+    )
+
+
+def reload_catalogs() -> CatalogSet:
+    """
+    Rebuild both catalogs (snapshot, price column, keyword and vector indexes)
+    and swap them in as one new version. Runs on the watcher thread; searches
+    already running finish against the set they started with. On failure the
+    current version stays in place.
+    """
+    with _catalog_lock:
+        started = time.perf_counter()
+        catalogs = _with_local_vectors(_load_catalog_set(_catalogs))
+        _install(catalogs)
+    logger.info(f"Catalogs reloaded as version {catalogs.version} in {time.perf_counter() - started:.2f}s")
+    if _managed_vector_stores:
+        _sync_vector_stores(catalogs)
+    return catalogs
+
+
+# Seconds between checks of the catalog CSVs for changes (0 = reload only on request)
+CATALOG_RELOAD_INTERVAL_SECONDS = float(os.getenv("CATALOG_RELOAD_INTERVAL_SECONDS", "30"))
+
+CATALOG_WATCHER = CatalogWatcher(
+    [PROMO_CSV_PATH, SUITUP_CSV_PATH], reload_catalogs, interval=CATALOG_RELOAD_INTERVAL_SECONDS
+)
+
+
+def warm_up() -> None:
+    """
+    Blocking startup work, run on a background thread: catalogs, then local
+    vectors, then the OpenAI vector stores. Each stage is usable as soon as
+    it finishes; a failed stage is reported and the tools keep degrading.
+    """
+    started = time.perf_counter()
+    # Baseline taken before loading, so edits made during warmup trigger a reload
+    CATALOG_WATCHER.start()
+    with _catalog_lock:
+        try:
+            catalogs = _load_catalog_set(_catalogs)
+            _install(catalogs)
+            WARMUP_STATUS["catalogs"] = "ready"
+        except Exception as e:
+            logger.error(f"Catalog warmup failed: {e}")
+            WARMUP_STATUS["catalogs"] = "unavailable"
+            catalogs = None
+        finally:
+            CATALOGS_LOADED.set()
+
+        if catalogs is not None:
+            try:
+                # Same indexes as the installed version, so listeners are not notified again
+                _install(_with_local_vectors(catalogs), notify=False)
+                WARMUP_STATUS["local_vectors"] = "ready"
+            except Exception as e:
+                logger.error(f"Local vector warmup failed: {e}")
+                WARMUP_STATUS["local_vectors"] = "unavailable"
+        else:
+            WARMUP_STATUS["local_vectors"] = "unavailable"
+
+    setup_vector_search()
+    WARMUP_DONE.set()
+    logger.info(f"Warmup finished in {time.perf_counter() - started:.2f}s: {WARMUP_STATUS}")
+
+
+def start_warmup() -> None:
+    """Start ``warm_up`` on a daemon thread (once per process)."""
+    global _warmup_thread
+    with _warmup_lock:
+        if _warmup_thread is None:
+            _warmup_thread = threading.Thread(target=warm_up, name="catalog-warmup", daemon=True)
+            _warmup_thread.start()
+
+# ============================
+# SEARCH EXECUTOR
+# ============================
+
+# CPU-bound searches run on their own bounded pool instead of the event loop's shared default executor
+SEARCH_EXECUTOR = SearchExecutor(
+    max_workers=int(os.getenv("SEARCH_MAX_WORKERS", str(min(4, os.cpu_count() or 1)))),
+    max_queue=int(os.getenv("SEARCH_MAX_QUEUE", "32")),
+    timeout=float(os.getenv("SEARCH_TIMEOUT_SECONDS", "5")),
+)
+
+# Tool output when a search is rejected or times out
+SEARCH_BUSY_MESSAGE = (
+    "El catálogo está tardando en responder en este momento. "
+    "Pide al cliente un momento y vuelve a intentar la búsqueda."
+)
+
+async def _run_search(search: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run a catalog search on SEARCH_EXECUTOR; returns SEARCH_BUSY_MESSAGE when it is overloaded or too slow."""
+    if not CATALOGS_LOADED.is_set():
+        # Wait for the first load off the search pool, so startup does not count against the timeout
+        await asyncio.to_thread(_ready_catalogs)
+    try:
+        return await SEARCH_EXECUTOR.run(search, *args, **kwargs)
+    except (SearchOverloaded, SearchTimeout) as e:
+        logger.warning(f"Catalog search unavailable: {e}")
+        return SEARCH_BUSY_MESSAGE
 
 # ============================
 # PRECISE SEARCH TOOLS (Primary)
@@ -60,13 +372,14 @@ except Exception as e:
     name_override="find_promo_products",
     description_override="Search promotional products precisely by keyword, category, and price range. Use this FIRST for specific product searches."
 )
-def find_promo_products(
+async def find_promo_products(
+    context: RunContextWrapper,
     keyword: str | None = None,
     category: str | None = None,
     min_price: float | None = None,
     max_price: float | None = None,
     limit: int = 6,
-) -> List[Dict]:
+) -> List[Dict] | str:
     """
     Search the promotional products catalog with precise filters.
     
@@ -78,36 +391,37 @@ def find_promo_products(
         limit: Maximum number of results
         
     Returns:
-        List of matching products
+        List of matching products (or a busy message when the search pool is saturated)
     """
-    if PROMO_CATALOG.empty:
-        return []
-        
-    df = PROMO_CATALOG.copy()
+    return await _run_search(_find_promo_products, context, keyword, category, min_price, max_price, limit)
 
-    # Apply filters
-    if keyword:
-        mask = (
-            df["nombre"].str.contains(keyword, case=False, na=False) |
-            df["descripcion"].str.contains(keyword, case=False, na=False)
-        )
-        df = df[mask]
-
-    if category:
-        df = df[df["categorias"].str.contains(category, case=False, na=False)]
-
-    if min_price is not None:
-        df = df[df["price_numeric"] >= min_price]
-        
-    if max_price is not None:
-        df = df[df["price_numeric"] <= max_price]
+def _find_promo_products(
+    context: RunContextWrapper,
+    keyword: str | None = None,
+    category: str | None = None,
+    min_price: float | None = None,
+    max_price: float | None = None,
+    limit: int = 6,
+) -> List[Dict]:
+    """Blocking body of find_promo_products (runs on SEARCH_EXECUTOR)."""
+    catalogs = _ready_catalogs()
+    index = catalogs.promo_index
+    if index.empty:
+        return []
 
-    # Return results
-    cols = ["sku", "nombre", "categorias", "precio", "descripcion", "imagenes_url"]
-    available_cols = [col for col in cols if col in df.columns]
-    
-    results = df[available_cols].head(limit).to_dict(orient="records")
+    # Apply filters, ranking keyword matches by relevance
+    category_mask = index.contains(category, ["categorias"]) if category else None
+    results = index.search(
+        keyword,
+        ["nombre", "descripcion"],
+        min_price=min_price,
+        max_price=max_price,
+        limit=limit,
+        ranked=True,
+        mask=category_mask,
+    )
     logger.info(f"Precise search returned {len(results)} products for query: {keyword}, category: {category}, price: {min_price}-{max_price}")
+    _remember_results(context, results, catalogs.version)
     
     return results
 
@@ -115,12 +429,13 @@ def find_promo_products(
     name_override="find_suitup_kits",
     description_override="Search promotional kits precisely by keyword, and price range. Use this FIRST for specific kit searches."
 )
-def find_suitup_kits(
+async def find_suitup_kits(
+    context: RunContextWrapper,
     keyword: str | None = None,
     min_price: float | None = None,
     max_price: float | None = None,
     limit: int = 6,
-) -> List[Dict]:
+) -> List[Dict] | str:
     """
     Search the promotional kits catalog with precise filters.
     
@@ -131,34 +446,22 @@ def find_suitup_kits(
         limit: Maximum number of results
         
     Returns:
-        List of matching kits
+        List of matching kits (or a busy message when the search pool is saturated)
     """
-    if SUITUP_CATALOG.empty:
-        return []
-        
-    df = SUITUP_CATALOG.copy()
-
-    # Apply filters
-    if keyword:
-        mask = (
-            df["nombre"].str.contains(keyword, case=False, na=False) |
-            df["descripcion"].str.contains(keyword, case=False, na=False) |
-            df["productos"].str.contains(keyword, case=False, na=False)
-        )
-        df = df[mask]
+    return await _run_search(_find_suitup_kits, context, keyword, min_price, max_price, limit)
 
-    if min_price is not None:
-        df = df[df["price_numeric"] >= min_price]
-        
-    if max_price is not None:
-        df = df[df["price_numeric"] <= max_price]
-
-    # Return results
-    cols = ["nombre", "descripcion", "productos", "precio", "imagen"]
-    available_cols = [col for col in cols if col in df.columns]
-    
-    results = df[available_cols].head(limit).to_dict(orient="records")
+def _find_suitup_kits(
+    context: RunContextWrapper,
+    keyword: str | None = None,
+    min_price: float | None = None,
+    max_price: float | None = None,
+    limit: int = 6,
+) -> List[Dict]:
+    """Blocking body of find_suitup_kits (runs on SEARCH_EXECUTOR)."""
+    catalogs = _ready_catalogs()
+    results = catalogs.suitup_index.search(keyword, min_price=min_price, max_price=max_price, limit=limit)
     logger.info(f"Precise search returned {len(results)} kits for query: {keyword}, price: {min_price}-{max_price}")
+    _remember_results(context, results, catalogs.version)
     
     return results
 
@@ -166,54 +469,79 @@ def find_suitup_kits(
 # FUZZY SEARCH TOOLS (Fallback)
 # ============================
 
-# Vector store setup
-_promo_vector_store_id = None
-_suitup_vector_store_id = None
-_promo_file_search_tool = None
-_suitup_file_search_tool = None
+# OpenAI vector store FileSearchTools, resolved by warm_up (None until then or if unavailable)
+promo_file_search: Optional[FileSearchTool] = None
+suitup_file_search: Optional[FileSearchTool] = None
+# True when the stores are synced from the catalogs here (no IDs configured in the environment)
+_managed_vector_stores = False
 
-def _setup_vector_search():
-    """Initialize vector search tools if not already set up."""
-    global _promo_vector_store_id, _suitup_vector_store_id, _promo_file_search_tool, _suitup_file_search_tool
+def file_search_tools() -> Tuple[Optional[FileSearchTool], Optional[FileSearchTool]]:
+    """(promo, suitup) FileSearchTools, None while unresolved or unavailable."""
+    return promo_file_search, suitup_file_search
+
+def setup_vector_search() -> Tuple[Optional[FileSearchTool], Optional[FileSearchTool]]:
+    """
+    Resolve the OpenAI vector stores (creating them when no IDs are configured)
+    and build the FileSearchTools; called from warm_up, never at import.
     
-    if _promo_file_search_tool is not None:
-        return
+    Returns:
+        (promo tool, suitup tool), both None when vector search is unavailable
+    """
+    global promo_file_search, suitup_file_search, _managed_vector_stores
+    
+    if promo_file_search is not None:
+        return promo_file_search, suitup_file_search
         
     try:
         # Get vector store IDs from environment or set them up
-        _promo_vector_store_id = os.getenv("PROMO_VECTOR_STORE_ID")
-        _suitup_vector_store_id = os.getenv("SUITUP_VECTOR_STORE_ID")
-        
-        if not _promo_vector_store_id or not _suitup_vector_store_id:
-            logger.info("Setting up vector stores from scratch...")
-            _promo_vector_store_id, _suitup_vector_store_id = vector_manager.setup_vector_stores()
+        promo_vector_store_id = os.getenv("PROMO_VECTOR_STORE_ID")
+        suitup_vector_store_id = os.getenv("SUITUP_VECTOR_STORE_ID")
+        
+        if not promo_vector_store_id or not suitup_vector_store_id:
+            # Incremental: only chunks changed since the last sync are uploaded
+            logger.info("Syncing vector stores with the catalogs...")
+            catalogs = _ready_catalogs()
+            promo_vector_store_id, suitup_vector_store_id = vector_manager.setup_vector_stores(
+                catalogs={"promo": catalogs.promo_images.aliased_frame(), "suitup": catalogs.suitup_images.aliased_frame()}
+            )
+            _managed_vector_stores = True
         else:
-            logger.info(f"Using existing vector stores - Promo: {_promo_vector_store_id}, SuitUp: {_suitup_vector_store_id}")
+            logger.info(f"Using existing vector stores - Promo: {promo_vector_store_id}, SuitUp: {suitup_vector_store_id}")
         
         # Create FileSearchTool instances
-        _promo_file_search_tool = FileSearchTool(
-            vector_store_ids=[_promo_vector_store_id],
+        promo_file_search = FileSearchTool(
+            vector_store_ids=[promo_vector_store_id],
             max_num_results=10  # Get more results for better filtering
         )
         
-        _suitup_file_search_tool = FileSearchTool(
-            vector_store_ids=[_suitup_vector_store_id],
+        suitup_file_search = FileSearchTool(
+            vector_store_ids=[suitup_vector_store_id],
             max_num_results=10
         )
         
+        WARMUP_STATUS["vector_stores"] = "ready"
         logger.info(f"Vector search initialized successfully")
         
     except Exception as e:
-        logger.warning(f"Could not set up vector search: {e}")
-        _promo_file_search_tool = None
-        _suitup_file_search_tool = None
-
-# Create FileSearchTool instances as actual tools for the agents
-_setup_vector_search()
+        logger.warning(f"Could not set up vector search, agents use the local search tools only: {e}")
+        WARMUP_STATUS["vector_stores"] = "unavailable"
+    
+    return promo_file_search, suitup_file_search
 
-# Export the FileSearchTool instances for use by agents
-promo_file_search = _promo_file_search_tool if _promo_file_search_tool else None
-suitup_file_search = _suitup_file_search_tool if _suitup_file_search_tool else None
+def _sync_vector_stores(catalogs: CatalogSet) -> None:
+    """Push a reloaded catalog version to the vector stores (changed chunks only)."""
+    try:
+        promo_vector_store_id, suitup_vector_store_id = vector_manager.setup_vector_stores(
+            catalogs={"promo": catalogs.promo_images.aliased_frame(), "suitup": catalogs.suitup_images.aliased_frame()}
+        )
+    except Exception as e:
+        logger.error(f"Vector store sync for catalog version {catalogs.version} failed: {e}")
+        return
+    # A store that had to be recreated has a new ID
+    if promo_file_search is not None:
+        promo_file_search.vector_store_ids = [promo_vector_store_id]
+    if suitup_file_search is not None:
+        suitup_file_search.vector_store_ids = [suitup_vector_store_id]
 
 def _parse_vector_response_and_filter(vector_response: str, max_price: float | None, limit: int) -> List[Dict]:
     """
@@ -234,42 +562,29 @@ def _parse_vector_response_and_filter(vector_response: str, max_price: float | N
     
     # Extract product names/SKUs mentioned in the vector response
     # This is a simple approach - the vector response should contain relevant product info
-    found_products = []
-    
-    if PROMO_CATALOG.empty:
+    index = _ready_catalogs().promo_index
+    if index.empty:
         return []
     
-    df = PROMO_CATALOG.copy()
-    
-    # Apply price filter first if specified
-    if max_price is not None:
-        df = df[df["price_numeric"] <= max_price]
-    
-    # Look for products mentioned in the vector response
-    # The vector response should contain product names, descriptions, or SKUs
-    lines = vector_response.split('\n')
-    for line in lines:
-        if not line.strip():
+    # Single Aho-Corasick pass over the response for every product name/SKU,
+    # restricted to the price range
+    price_mask = index.price_mask(max_price=max_price)
+    mentioned = index.mentioned_rows(vector_response, ("nombre", "sku"), price_mask)
+    
+    # Deduplicate by SKU
+    skus = index.lowered("sku")
+    found_rows = []
+    seen_skus = set()
+    for row in mentioned:
+        if skus[row] in seen_skus:
             continue
-            
-        # Try to match product names mentioned in the response
-        for _, product in df.iterrows():
-            product_name = str(product.get('nombre', '')).lower()
-            product_sku = str(product.get('sku', '')).lower()
-            
-            if (product_name and product_name in line.lower()) or (product_sku and product_sku in line.lower()):
-                cols = ["sku", "nombre", "categorias", "precio", "descripcion", "imagenes_url"]
-                available_cols = [col for col in cols if col in product.index]
-                product_dict = product[available_cols].to_dict()
-                
-                if product_dict not in found_products:
-                    found_products.append(product_dict)
-                    if len(found_products) >= limit:
-                        break
-        
-        if len(found_products) >= limit:
+        seen_skus.add(skus[row])
+        found_rows.append(row)
+        if len(found_rows) >= limit:
             break
     
+    found_products = index.records(found_rows)
+    
     logger.info(f"Extracted {len(found_products)} products from vector response")
     return found_products
 
@@ -277,25 +592,26 @@ def _parse_vector_response_and_filter(vector_response: str, max_price: float | N
     name_override="get_product_info",
     description_override="Get detailed information about a specific product from the last search results."
 )
-def get_product_info(product_name: str) -> str:
+def get_product_info(context: RunContextWrapper, product_name: str) -> str:
     """
     Get detailed information about a specific product from stored search results.
     
     Args:
-        product_name: Name of the product to get info about
+        product_name: Name or SKU of the product to get info about
         
     Returns:
         Detailed product information or not found message
     """
-    global _last_search_results
+    conversation_key = _conversation_key(context)
+    catalog_version = current_catalogs().version
     
-    if not _last_search_results:
+    if not SEARCH_RESULTS.has_results(conversation_key, catalog_version):
         return "No hay productos almacenados de búsquedas anteriores."
     
-    # Search for the product by name (case-insensitive)
-    for product in _last_search_results:
-        if product_name.lower() in product.get('nombre', '').lower():
-            return _format_single_product_detailed(product)
+    # Look up by normalized name or SKU, with a fuzzy fallback
+    product = SEARCH_RESULTS.lookup(conversation_key, product_name, catalog_version)
+    if product is not None:
+        return _format_single_product_detailed(product)
     
     return f"No se encontró información sobre '{product_name}' en los resultados anteriores."
 
@@ -306,7 +622,7 @@ def _format_single_product_detailed(product: Dict) -> str:
     precio = product.get('precio', 'N/A')
     sku = product.get('sku', 'N/A')
     categorias = product.get('categorias', 'N/A')
-    imagenes = product.get('imagenes_url', '')
+    handles = _record_image_handles(product)
     
     result = f"**{nombre}**\n"
     result += f"Precio: ${precio} MXN\n"
@@ -314,180 +630,84 @@ def _format_single_product_detailed(product: Dict) -> str:
     result += f"Categorías: {categorias}\n"
     result += f"Descripción: {descripcion}\n"
     
-    if imagenes and imagenes.strip():
-        image_links = []
-        urls = [url.strip() for url in imagenes.split(',') if url.strip()]
-        for j, url in enumerate(urls[:3], 1):
-            image_links.append(f"[Imagen {j}]({url})")
-        if image_links:
-            result += f"Imágenes: {' | '.join(image_links)}"
+    # Short handles; the API expands them to the image URLs
+    image_links = [f"[Imagen {j}]({handle})" for j, handle in enumerate(handles[:3], 1)]
+    if image_links:
+        result += f"Imágenes: {' | '.join(image_links)}"
     
     return result
 
+def _promo_search(catalogs: CatalogSet, keyword: str, min_price: float | None, max_price: float | None, limit: int) -> List[Dict]:
+    """Hybrid product search, or BM25 only while the local vectors are still loading."""
+    if catalogs.promo_retriever is None:
+        return catalogs.promo_index.search(
+            keyword, ["nombre", "descripcion"], min_price=min_price, max_price=max_price, limit=limit, ranked=True
+        )
+    return catalogs.promo_retriever.search_records(
+        keyword, min_price, max_price, limit, expansions=_extract_semantic_terms(keyword)
+    )
+
+def _suitup_search(catalogs: CatalogSet, keyword: str, min_price: float | None, max_price: float | None, limit: int) -> List[Dict]:
+    """Hybrid kit search, or BM25 only while the local vectors are still loading."""
+    if catalogs.suitup_retriever is None:
+        return catalogs.suitup_index.search(keyword, min_price=min_price, max_price=max_price, limit=limit, ranked=True)
+    return catalogs.suitup_retriever.search_records(keyword, min_price, max_price, limit)
+
 @function_tool(
     name_override="search_and_format_products",
-    description_override="Comprehensive search for promotional products using semantic + precise filtering strategy. Returns JSON with products that you must present individually."
+    description_override="Comprehensive search for promotional products using hybrid keyword + semantic ranking with price filtering. Returns product cards that are shown to the customer automatically; reply with a short lead-in only."
 )
-def search_and_format_products(keyword: str, max_price: float | None = None, limit: int = 3) -> str:
+async def search_and_format_products(
+    context: RunContextWrapper,
+    keyword: str,
+    max_price: float | None = None,
+    limit: int = 3,
+    min_price: float | None = None,
+) -> str:
     """
-    IMPROVED STRATEGY: Semantic search first for relevance, then precise filtering.
+    HYBRID STRATEGY: keyword (BM25) and semantic (vector) search fused in one pass.
     
-    1. Vector/semantic search → Find semantically relevant products 
-    2. Precise filtering → Apply price/budget constraints
-    3. Fallback to keyword search if vector search fails
+    1. Price range → Vectorized mask applied before any ranking
+    2. BM25 + vector search → Candidates generated concurrently
+    3. Reciprocal-rank fusion → Single relevance-ordered result list
     
     Args:
         keyword: Product description/query from user
-        max_price: Maximum price in MXN (optional)
+        max_price: Maximum price in MXN (optional; defaults to the customer's parsed budget)
         limit: Maximum number of results
+        min_price: Minimum price in MXN (optional; defaults to the customer's parsed budget)
         
     Returns:
-        Formatted string with product results or no results message
+        Product card payload or no results message
     """
-    logger.info(f"IMPROVED search strategy for: '{keyword}', max_price: {max_price}")
-    
-    # STEP 1: Try semantic/vector search FIRST for relevance
-    logger.info("Step 1: Trying semantic/vector search for relevance...")
-    _setup_vector_search()
-    
-    semantic_results = []
-    if _promo_file_search_tool is not None:
-        try:
-            # Try to use actual vector search via FileSearchTool
-            # This would return semantically relevant products
-            logger.info(f"Using FileSearchTool vector search for: {keyword}")
-            
-            # Note: FileSearchTool integration would happen here
-            # For now, let's implement a smarter keyword approach that focuses on semantic matching
-            
-            # Get a broader set of potentially relevant products first
-            df = PROMO_CATALOG.copy()
-            
-            # Create semantic-focused search terms
-            semantic_terms = _extract_semantic_terms(keyword)
-            logger.info(f"Semantic terms extracted: {semantic_terms}")
-            
-            semantic_matches = []
-            for term in semantic_terms:
-                # Look for semantic matches in product fields
-                mask = (
-                    df["nombre"].str.contains(term, case=False, na=False) |
-                    df["descripcion"].str.contains(term, case=False, na=False) |
-                    df["categorias"].str.contains(term, case=False, na=False)
-                )
-                matches = df[mask]
-                if not matches.empty:
-                    semantic_matches.append(matches)
-            
-            # Combine and deduplicate semantic matches
-            if semantic_matches:
-                all_matches = pd.concat(semantic_matches).drop_duplicates()
-                
-                # STEP 2: Apply precise filtering (price, etc.) to semantic results
-                if max_price is not None:
-                    all_matches = all_matches[all_matches["price_numeric"] <= max_price]
-                
-                # Get the best results
-                cols = ["sku", "nombre", "categorias", "precio", "descripcion", "imagenes_url"]
-                available_cols = [col for col in cols if col in all_matches.columns]
-                semantic_results = all_matches[available_cols].head(limit).to_dict(orient="records")
-                
-        except Exception as e:
-            logger.error(f"Vector search failed: {e}")
-    
-    logger.info(f"Semantic search returned {len(semantic_results)} results")
-    
-    # STEP 3: If semantic search found good results, return them
-    if semantic_results:
-        return _format_product_results(semantic_results)
-    
-    # STEP 4: Fallback to traditional precise search
-    logger.info("Semantic search found no results, trying traditional precise search...")
+    return await _run_search(_search_and_format_products, context, keyword, max_price, limit, min_price)
+
+def _search_and_format_products(
+    context: RunContextWrapper,
+    keyword: str,
+    max_price: float | None = None,
+    limit: int = 3,
+    min_price: float | None = None,
+) -> str:
+    """Blocking body of search_and_format_products (runs on SEARCH_EXECUTOR)."""
+    min_price, max_price = _price_range(context, min_price, max_price)
+    logger.info(f"Hybrid search for: '{keyword}', price: {min_price}-{max_price}")
     
-    precise_results = []
-    if not PROMO_CATALOG.empty:
-        df = PROMO_CATALOG.copy()
-        
-        # Apply keyword filter
-        if keyword:
-            mask = (
-                df["nombre"].str.contains(keyword, case=False, na=False) |
-                df["descripcion"].str.contains(keyword, case=False, na=False)
-            )
-            df = df[mask]
-        
-        # Apply price filter
-        if max_price is not None:
-            df = df[df["price_numeric"] <= max_price]
-        
-        # Get results
-        cols = ["sku", "nombre", "categorias", "precio", "descripcion", "imagenes_url"]
-        available_cols = [col for col in cols if col in df.columns]
-        precise_results = df[available_cols].head(limit).to_dict(orient="records")
+    results = []
+    catalogs = _ready_catalogs()
+    try:
+        results = _promo_search(catalogs, keyword, min_price, max_price, limit)
+    except Exception as e:
+        logger.error(f"Hybrid search failed: {e}")
     
-    logger.info(f"Precise search returned {len(precise_results)} results")
+    logger.info(f"Hybrid search returned {len(results)} results")
+    _remember_results(context, results, catalogs.version)
     
-    # STEP 5: Return results or no-results message
-    if precise_results:
-        return _format_product_results(precise_results)
+    if results:
+        return _format_product_results(results)
     else:
         return "No se encontraron productos que coincidan con los criterios de búsqueda."
 
-def _format_product_results_clean(results: List[Dict]) -> str:
-    """Format product search results for clean agent presentation."""
-    if not results:
-        return "No se encontraron productos."
-    
-    formatted_products = []
-    for i, product in enumerate(results, 1):
-        nombre = product.get('nombre', 'N/A')
-        descripcion = product.get('descripcion', 'N/A')
-        precio = product.get('precio', 'N/A')
-        imagenes = product.get('imagenes_url', '')
-        
-        # Format product info
-        product_info = f"**Producto {i}:** {nombre} — {descripcion} | ${precio} MXN"
-        formatted_products.append(product_info)
-        
-        # Add images if available
-        if imagenes and imagenes.strip():
-            image_links = []
-            # Split multiple image URLs and create clean links
-            urls = [url.strip() for url in imagenes.split(',') if url.strip()]
-            for j, url in enumerate(urls[:3], 1):  # Limit to 3 images
-                image_links.append(f"[Imagen {j}]({url})")
-            if image_links:
-                formatted_products.append(f"Imágenes: {' | '.join(image_links)}")
-    
-    return "\n\n".join(formatted_products)
-
-@function_tool(
-    name_override="search_products_structured", 
-    description_override="Save search criteria for vector search. The agent will use FileSearchTool automatically for vector search."
-)
-def search_products_structured(keyword: str, max_price: float | None = None, limit: int = 3) -> str:
-    """
-    VECTOR-ONLY APPROACH: This function saves search criteria.
-    The agent has FileSearchTool in its tools list and will use it automatically for vector search.
-    
-    Args:
-        keyword: Product description/query from user
-        max_price: Maximum price in MXN (optional)  
-        limit: Maximum number of results
-        
-    Returns:
-        Instructions for the agent to use FileSearchTool
-    """
-    logger.info(f"Search criteria saved - keyword: '{keyword}', max_price: {max_price}")
-    
-    search_instruction = f"Busca productos promocionales usando la descripción: '{keyword}'"
-    if max_price:
-        search_instruction += f" con precio máximo de ${max_price} MXN"
-    
-    search_instruction += f". Busca hasta {limit} productos relevantes usando las herramientas de búsqueda vectorial disponibles."
-    
-    return search_instruction
-
 def _extract_semantic_terms(keyword: str) -> List[str]:
     """Extract semantic search terms from user query."""
     # Map common user terms to product categories/terms (PRECISE MAPPING)
@@ -523,290 +743,95 @@ def _extract_semantic_terms(keyword: str) -> List[str]:
 
 @function_tool(
     name_override="search_and_format_kits",
-    description_override="Comprehensive search for promotional kits using precise + semantic strategy. Use this after gathering description and budget."
+    description_override="Comprehensive search for promotional kits using hybrid keyword + semantic ranking with price filtering. Use this after gathering description and budget. Returns kit cards that are shown to the customer automatically; reply with a short lead-in only."
 )
-def search_and_format_kits(keyword: str, max_price: float | None = None, limit: int = 3) -> str:
+async def search_and_format_kits(
+    context: RunContextWrapper,
+    keyword: str,
+    max_price: float | None = None,
+    limit: int = 3,
+    min_price: float | None = None,
+) -> str:
     """
-    Comprehensive search that tries precise search first, then semantic search for kits.
+    Hybrid (BM25 + vector) search for kits within the price range.
     
     Args:
         keyword: Kit description/query from user
-        max_price: Maximum price in MXN (optional)
+        max_price: Maximum price in MXN (optional; defaults to the customer's parsed budget)
         limit: Maximum number of results
+        min_price: Minimum price in MXN (optional; defaults to the customer's parsed budget)
         
     Returns:
-        Formatted string with kit results or no results message
+        Kit card payload or no results message
     """
-    logger.info(f"Comprehensive kit search for: '{keyword}', max_price: {max_price}")
-    
-    # STEP 1: Try precise search first
-    precise_results = []
-    if SUITUP_CATALOG.empty:
+    return await _run_search(_search_and_format_kits, context, keyword, max_price, limit, min_price)
+
+def _search_and_format_kits(
+    context: RunContextWrapper,
+    keyword: str,
+    max_price: float | None = None,
+    limit: int = 3,
+    min_price: float | None = None,
+) -> str:
+    """Blocking body of search_and_format_kits (runs on SEARCH_EXECUTOR)."""
+    min_price, max_price = _price_range(context, min_price, max_price)
+    logger.info(f"Hybrid kit search for: '{keyword}', price: {min_price}-{max_price}")
+    
+    results = []
+    catalogs = _ready_catalogs()
+    if catalogs.suitup_index.empty:
         logger.warning("SUITUP_CATALOG is empty")
     else:
-        df = SUITUP_CATALOG.copy()
-        
-        # Apply keyword filter
-        if keyword:
-            mask = (
-                df["nombre"].str.contains(keyword, case=False, na=False) |
-                df["descripcion"].str.contains(keyword, case=False, na=False) |
-                df["productos"].str.contains(keyword, case=False, na=False)
-            )
-            df = df[mask]
-        
-        # Apply price filter
-        if max_price is not None:
-            df = df[df["price_numeric"] <= max_price]
-        
-        # Get results
-        cols = ["nombre", "descripcion", "productos", "precio", "imagen"]
-        available_cols = [col for col in cols if col in df.columns]
-        precise_results = df[available_cols].head(limit).to_dict(orient="records")
-    
-    logger.info(f"Precise kit search returned {len(precise_results)} results")
-    
-    # STEP 2: If precise search found results, format and return them
-    if precise_results:
-        return _format_kit_results(precise_results)
-    
-    # STEP 3: Try semantic/vector search as fallback
-    logger.info("Precise kit search found no results, trying semantic search...")
-    _setup_vector_search()
-    
-    semantic_results = []
-    if _suitup_file_search_tool is not None:
         try:
-            # Use vector search (this would be implemented with proper FileSearchTool integration)
-            # For now, implement keyword fallback with individual words
-            words = keyword.split()
-            for word in words:
-                if len(word) > 3:  # Skip short words
-                    df = SUITUP_CATALOG.copy()
-                    mask = (
-                        df["nombre"].str.contains(word, case=False, na=False) |
-                        df["descripcion"].str.contains(word, case=False, na=False) |
-                        df["productos"].str.contains(word, case=False, na=False)
-                    )
-                    df = df[mask]
-                    
-                    if max_price is not None:
-                        df = df[df["price_numeric"] <= max_price]
-                    
-                    if not df.empty:
-                        cols = ["nombre", "descripcion", "productos", "precio", "imagen"]
-                        available_cols = [col for col in cols if col in df.columns]
-                        semantic_results = df[available_cols].head(limit).to_dict(orient="records")
-                        break
+            results = _suitup_search(catalogs, keyword, min_price, max_price, limit)
         except Exception as e:
-            logger.error(f"Semantic kit search failed: {e}")
+            logger.error(f"Hybrid kit search failed: {e}")
     
-    logger.info(f"Semantic kit search returned {len(semantic_results)} results")
+    logger.info(f"Hybrid kit search returned {len(results)} results")
+    _remember_results(context, results, catalogs.version)
     
-    # STEP 4: Return results or no-results message
-    if semantic_results:
-        return _format_kit_results(semantic_results)
+    if results:
+        return _format_kit_results(results)
     else:
         return "No se encontraron kits que coincidan con los criterios de búsqueda."
 
 def _format_product_results(results: List[Dict]) -> str:
-    """Format product search results for agent presentation with separate messages."""
+    """Product card payload for the agent (the API shows the cards; the model only writes a lead-in)."""
     if not results:
         return "No se encontraron productos."
-    
-    # Return explicit instructions for separate messages
-    instructions = ["IMPORTANTE: Envía cada mensaje por separado. NO envíes todo como un solo mensaje."]
-    
-    for i, product in enumerate(results, 1):
-        nombre = product.get('nombre', 'N/A')
-        descripcion = product.get('descripcion', 'N/A')
-        precio = product.get('precio', 'N/A')
-        imagen = product.get('imagenes_url', '')
-        
-        instructions.append(f"\nPRODUCTO {i} - Envía 2 mensajes separados:")
-        instructions.append(f"MENSAJE {i}A: {nombre} — {descripcion} | ${precio} MXN")
-        instructions.append(f"MENSAJE {i}B: {imagen}")
-    
-    instructions.append("\nRecuerda: Envía cada mensaje individualmente, no como un bloque de texto.")
-    
-    return "\n".join(instructions)
-
-def _format_product_results_json(results: List[Dict]) -> List[Dict]:
-    """Format product search results as structured JSON for easy agent processing."""
-    if not results:
-        return []
-    
-    formatted_products = []
-    for product in results:
-        nombre = product.get('nombre', 'N/A')
-        descripcion = product.get('descripcion', 'N/A')
-        precio = product.get('precio', 'N/A')
-        imagenes = product.get('imagenes_url', '')
-        
-        formatted_products.append({
-            "name": nombre,
-            "description": descripcion,
-            "price": precio,
-            "images": imagenes
-        })
-    
-    return formatted_products
+    return card_payload([product_card(product) for product in results])
 
 def _format_kit_results(results: List[Dict]) -> str:
-    """Format kit search results for agent presentation with separate messages."""
+    """Kit card payload for the agent (the API shows the cards; the model only writes a lead-in)."""
     if not results:
         return "No se encontraron kits."
-    
-    # Return explicit instructions for separate messages
-    instructions = ["IMPORTANTE: Envía cada mensaje por separado. NO envíes todo como un solo mensaje."]
-    
-    for i, kit in enumerate(results, 1):
-        nombre = kit.get('nombre', 'N/A')
-        descripcion = kit.get('descripcion', 'N/A')
-        productos = kit.get('productos', 'N/A')
-        precio = kit.get('precio', 'N/A')
-        imagen = kit.get('imagen', '')
-        
-        instructions.append(f"\nKIT {i} - Envía 2 mensajes separados:")
-        instructions.append(f"MENSAJE {i}A: {nombre} — {descripcion} — ({productos}) | ${precio} MXN")
-        instructions.append(f"MENSAJE {i}B: {imagen}")
-    
-    instructions.append("\nRecuerda: Envía cada mensaje individualmente, no como un bloque de texto.")
-    
-    return "\n".join(instructions)
+    return card_payload([kit_card(kit) for kit in results])
 
 # ============================
 # RAW SEARCH FUNCTIONS (for direct use and testing)
 # ============================
 
-def search_and_format_products_raw(keyword: str, max_price: float = None, limit: int = 3) -> str:
+def search_and_format_products_raw(keyword: str, max_price: float = None, limit: int = 3, min_price: float = None) -> str:
     """Direct access to comprehensive product search for testing."""
     logger.info(f"Comprehensive search for: '{keyword}', max_price: {max_price}")
     
-    # STEP 1: Try precise search first
-    precise_results = []
-    if PROMO_CATALOG.empty:
+    catalogs = _ready_catalogs()
+    if catalogs.promo_index.empty:
         logger.warning("PROMO_CATALOG is empty")
-    else:
-        df = PROMO_CATALOG.copy()
-        
-        # Apply keyword filter
-        if keyword:
-            mask = (
-                df["nombre"].str.contains(keyword, case=False, na=False) |
-                df["descripcion"].str.contains(keyword, case=False, na=False)
-            )
-            df = df[mask]
-        
-        # Apply price filter
-        if max_price is not None:
-            df = df[df["price_numeric"] <= max_price]
-        
-        # Get results
-        cols = ["sku", "nombre", "categorias", "precio", "descripcion", "imagenes_url"]
-        available_cols = [col for col in cols if col in df.columns]
-        precise_results = df[available_cols].head(limit).to_dict(orient="records")
-    
-    logger.info(f"Precise search returned {len(precise_results)} results")
-    
-    # STEP 2: If precise search found results, format and return them
-    if precise_results:
-        return _format_product_results(precise_results)
-    
-    # STEP 3: Try semantic/vector search as fallback
-    logger.info("Precise search found no results, trying semantic search...")
-    
-    semantic_results = []
-    # Extract meaningful words from the query
-    words = keyword.split()
-    meaningful_words = [word for word in words if len(word) > 3]
-    
-    logger.info(f"Trying semantic search with words: {meaningful_words}")
+        return "No se encontraron productos que coincidan con los criterios de búsqueda."
     
-    for word in meaningful_words:
-        df = PROMO_CATALOG.copy()
-        mask = (
-            df["nombre"].str.contains(word, case=False, na=False) |
-            df["descripcion"].str.contains(word, case=False, na=False) |
-            df["categorias"].str.contains(word, case=False, na=False)
-        )
-        df = df[mask]
-        
-        if max_price is not None:
-            df = df[df["price_numeric"] <= max_price]
-        
-        if not df.empty:
-            cols = ["sku", "nombre", "categorias", "precio", "descripcion", "imagenes_url"]
-            available_cols = [col for col in cols if col in df.columns]
-            semantic_results = df[available_cols].head(limit).to_dict(orient="records")
-            logger.info(f"Found {len(semantic_results)} results with word: {word}")
-            break
+    results = _promo_search(catalogs, keyword, min_price, max_price, limit)
+    logger.info(f"Hybrid search returned {len(results)} results")
     
-    # If still no results, try with very broad search terms
-    if not semantic_results and max_price is not None:
-        logger.info("Trying broader search within price range...")
-        df = PROMO_CATALOG.copy()
-        df = df[df["price_numeric"] <= max_price]
-        if not df.empty:
-            # Get popular/featured products within budget
-            cols = ["sku", "nombre", "categorias", "precio", "descripcion", "imagenes_url"]
-            available_cols = [col for col in cols if col in df.columns]
-            semantic_results = df[available_cols].head(limit).to_dict(orient="records")
-            logger.info(f"Found {len(semantic_results)} results with broad price search")
-    
-    logger.info(f"Semantic search returned {len(semantic_results)} results")
-    
-    # STEP 4: Return results or no-results message
-    if semantic_results:
-        return _format_product_results(semantic_results)
+    if results:
+        return _format_product_results(results)
     else:
         return "No se encontraron productos que coincidan con los criterios de búsqueda."
 
 def find_promo_products_raw(keyword: str = None, max_price: float = None, limit: int = 3) -> List[Dict]:
     """Direct access to promo search without agents decoration."""
-    if PROMO_CATALOG.empty:
-        return []
-        
-    df = PROMO_CATALOG.copy()
-
-    # Apply filters
-    if keyword:
-        mask = (
-            df["nombre"].str.contains(keyword, case=False, na=False) |
-            df["descripcion"].str.contains(keyword, case=False, na=False)
-        )
-        df = df[mask]
-
-    if max_price is not None:
-        df = df[df["price_numeric"] <= max_price]
-
-    # Return results
-    cols = ["sku", "nombre", "categorias", "precio", "descripcion", "imagenes_url"]
-    available_cols = [col for col in cols if col in df.columns]
-    
-    return df[available_cols].head(limit).to_dict(orient="records")
+    return _ready_catalogs().promo_index.search(keyword, ["nombre", "descripcion"], max_price=max_price, limit=limit, ranked=True)
 
 def find_suitup_kits_raw(keyword: str = None, max_price: float = None, limit: int = 3) -> List[Dict]:
     """Direct access to suitup search without agents decoration."""
-    if SUITUP_CATALOG.empty:
-        return []
-        
-    df = SUITUP_CATALOG.copy()
-
-    # Apply filters
-    if keyword:
-        mask = (
-            df["nombre"].str.contains(keyword, case=False, na=False) |
-            df["descripcion"].str.contains(keyword, case=False, na=False) |
-            df["productos"].str.contains(keyword, case=False, na=False)
-        )
-        df = df[mask]
-
-    if max_price is not None:
-        df = df[df["price_numeric"] <= max_price]
-
-    # Return results
-    cols = ["nombre", "descripcion", "productos", "precio", "imagen"]
-    available_cols = [col for col in cols if col in df.columns]
-    
-    return df[available_cols].head(limit).to_dict(orient="records") 
\ No newline at end of file
+    return _ready_catalogs().suitup_index.search(keyword, max_price=max_price, limit=limit) 
\ No newline at end of file
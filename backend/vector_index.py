@@ -0,0 +1,206 @@
+"""
+Local embedding index for offline semantic search over the catalogs.
+Embeddings live in a contiguous float32 matrix saved as .npy and memory-mapped at startup.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import zlib
+from pathlib import Path
+from typing import Iterable, List, Optional, Protocol, Sequence, Tuple
+
+import numpy as np
+
+from catalog_index import STOPWORDS, fold_text, tokenize
+
+logger = logging.getLogger(__name__)
+
+
+class Embedder(Protocol):
+    """Anything that turns texts into fixed-size float32 vectors."""
+
+    name: str
+    dim: int
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        ...
+
+
+class HashedNgramEmbedder:
+    """
+    Offline embedder using the hashing trick over character n-grams and words.
+
+    Deterministic across processes (CRC32, not Python's salted hash), needs no
+    model download or network access, and tolerates typos and inflections.
+    """
+
+    def __init__(self, dim: int = 512, ngram_range: Tuple[int, int] = (3, 4)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+        self.name = f"hashed-ngram-{ngram_range[0]}-{ngram_range[1]}-{dim}"
+
+    def _features(self, text: str) -> List[str]:
+        features = []
+        lo, hi = self.ngram_range
+        for word in tokenize(text):
+            if word in STOPWORDS:
+                continue
+            features.append("w:" + word)
+            padded = f" {word} "
+            for n in range(lo, hi + 1):
+                features.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+        return features
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text or ""):
+                h = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if h & 0x80000000 else -1.0
+                matrix[row, h % self.dim] += sign
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+
+class LocalVectorIndex:
+    """
+    Brute-force cosine index over L2-normalized embeddings.
+
+    Top-k is a single matrix-vector (or matrix-matrix, for batches) product,
+    with an optional boolean pre-filter mask such as a price range.
+    """
+
+    def __init__(self, vectors: np.ndarray, embedder: Optional[Embedder] = None):
+        self.vectors = vectors
+        self.embedder = embedder
+
+    @property
+    def size(self) -> int:
+        return int(self.vectors.shape[0])
+
+    @classmethod
+    def from_texts(cls, texts: Sequence[str], embedder: Embedder) -> "LocalVectorIndex":
+        """Embed documents with the given embedder."""
+        return cls(np.ascontiguousarray(embedder.embed(texts), dtype=np.float32), embedder)
+
+    @classmethod
+    def from_embeddings(cls, vectors: np.ndarray, embedder: Optional[Embedder] = None) -> "LocalVectorIndex":
+        """Wrap precomputed embeddings (normalized here so scores are cosine)."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return cls(vectors, embedder)
+
+    def save(self, path: str, fingerprint: str = "") -> None:
+        """Write vectors to ``path`` (.npy) plus a ``.meta.json`` sidecar, atomically."""
+        path = Path(path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, self.vectors)
+        os.replace(tmp_path, path)
+        meta = {
+            "rows": self.size,
+            "dim": int(self.vectors.shape[1]) if self.vectors.ndim == 2 else 0,
+            "embedder": getattr(self.embedder, "name", None),
+            "fingerprint": fingerprint,
+        }
+        Path(str(path) + ".meta.json").write_text(json.dumps(meta))
+        logger.info(f"Saved {self.size} vectors to {path}")
+
+    @classmethod
+    def load(cls, path: str, embedder: Optional[Embedder] = None, fingerprint: str | None = None) -> Optional["LocalVectorIndex"]:
+        """
+        Memory-map vectors saved by ``save``.
+
+        Returns None when the file is missing or was built from different
+        documents or a different embedder.
+        """
+        path = Path(path)
+        meta_path = Path(str(path) + ".meta.json")
+        if not path.exists() or not meta_path.exists():
+            return None
+        try:
+            meta = json.loads(meta_path.read_text())
+        except (json.JSONDecodeError, OSError):
+            logger.warning(f"Invalid meta file for {path}, rebuilding...")
+            return None
+        if fingerprint is not None and meta.get("fingerprint") != fingerprint:
+            return None
+        if embedder is not None and meta.get("embedder") != embedder.name:
+            return None
+        vectors = np.load(path, mmap_mode="r")
+        logger.info(f"Memory-mapped {vectors.shape[0]} vectors from {path}")
+        return cls(vectors, embedder)
+
+    def embed_queries(self, queries: Sequence[str]) -> np.ndarray:
+        if self.embedder is None:
+            raise ValueError("This index has no embedder; pass query vectors instead")
+        return self.embedder.embed(queries)
+
+    def scores(self, query_vectors: np.ndarray, mask: np.ndarray | None = None) -> np.ndarray:
+        """Cosine scores, shape (queries, rows). Rows outside ``mask`` get -inf."""
+        query_vectors = np.atleast_2d(np.asarray(query_vectors, dtype=np.float32))
+        scores = query_vectors @ self.vectors.T
+        if mask is not None:
+            scores[:, ~mask] = -np.inf
+        return scores
+
+    def search_many(
+        self,
+        queries: Sequence[str] | np.ndarray,
+        k: int = 10,
+        mask: np.ndarray | None = None,
+        min_score: float = 0.0,
+    ) -> List[List[Tuple[int, float]]]:
+        """Top-k (row, score) pairs for each query, computed in one batched product."""
+        if self.size == 0 or k <= 0 or len(queries) == 0:
+            return [[] for _ in range(len(queries))]
+        query_vectors = queries if isinstance(queries, np.ndarray) else self.embed_queries(queries)
+        all_scores = self.scores(query_vectors, mask)
+        k = min(k, self.size)
+        results = []
+        for scores in all_scores:
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            results.append([(int(row), float(scores[row])) for row in top if scores[row] > min_score])
+        return results
+
+    def search(self, query: str | np.ndarray, k: int = 10, mask: np.ndarray | None = None, min_score: float = 0.0) -> List[Tuple[int, float]]:
+        """Top-k (row, score) pairs for a single query."""
+        queries = np.atleast_2d(query) if isinstance(query, np.ndarray) else [query]
+        return self.search_many(queries, k, mask, min_score)[0]
+
+
+def texts_fingerprint(texts: Iterable[str]) -> str:
+    """Stable hash of document texts, used to detect stale vector files."""
+    digest = hashlib.sha1()
+    for text in texts:
+        digest.update(fold_text(text).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def load_or_build(path: str, texts: Sequence[str], embedder: Embedder, fingerprint: str | None = None) -> LocalVectorIndex:
+    """
+    Memory-map the vector file for ``texts`` if it is current, else build and save it.
+
+    ``fingerprint`` may be passed when already known (e.g. from a catalog
+    snapshot) to skip hashing the texts. Falls back to an in-memory index
+    when the file cannot be written.
+    """
+    fingerprint = fingerprint or texts_fingerprint(texts)
+    index = LocalVectorIndex.load(path, embedder, fingerprint)
+    if index is not None and index.size == len(texts):
+        return index
+
+    logger.info(f"Building local vector index for {len(texts)} documents ({embedder.name})...")
+    index = LocalVectorIndex.from_texts(texts, embedder)
+    try:
+        index.save(path, fingerprint)
+        return LocalVectorIndex.load(path, embedder, fingerprint) or index
+    except OSError as e:
+        logger.warning(f"Could not save vector index to {path}: {e}")
+        return index
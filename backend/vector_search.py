@@ -8,145 +8,232 @@ import json
 import os
 import logging
 from pathlib import Path
-from typing import List, Dict, Optional
+from dataclasses import dataclass
+from string import Formatter
+from typing import Iterator, List, Dict, Optional, Tuple
 from openai import OpenAI
 from dotenv import load_dotenv
+from catalog_snapshot import CATALOGS
+from vector_store_sync import VectorStoreSync
 
 # Load environment variables from .env file
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+current_dir = Path(__file__).parent
+
+# Vector stores kept in sync with the catalogs, read from the same CSVs the search tools serve
+VECTOR_STORES: Dict[str, Dict[str, str]] = {
+    "promo": {"name": "Promotional Products", "csv_path": CATALOGS["promo"]["csv_path"]},
+    "suitup": {"name": "Promotional Kits", "csv_path": CATALOGS["suitup"]["csv_path"]},
+}
+
+# Sync manifests (row hashes, file IDs, vector store IDs) and upload tuning
+VECTOR_STORE_MANIFEST_DIR = os.getenv("VECTOR_STORE_MANIFEST_DIR", str(current_dir / "vector_store_manifests"))
+VECTOR_STORE_ROWS_PER_CHUNK = int(os.getenv("VECTOR_STORE_ROWS_PER_CHUNK", "500"))
+VECTOR_STORE_UPLOAD_CONCURRENCY = int(os.getenv("VECTOR_STORE_UPLOAD_CONCURRENCY", "4"))
+
+
+@dataclass(frozen=True)
+class DocumentTemplate:
+    """How one business unit's catalog rows become vector store documents."""
+    text: str                   # str.format-style template over row columns, e.g. "Kit: {nombre}"
+    metadata: Tuple[str, ...]   # columns copied (as strings) into the document metadata
+    type: str                   # metadata "type" value
+    key: str                    # column identifying a row across catalog versions (incremental sync)
+
+
+DOCUMENT_TEMPLATES: Dict[str, DocumentTemplate] = {
+    "promo": DocumentTemplate(
+        text="Producto: {nombre} - {descripcion} - Categoría: {categorias} - Precio: {precio} - SKU: {sku}",
+        metadata=("sku", "nombre", "descripcion", "categorias", "precio", "imagenes_url"),
+        type="promotional_product",
+        key="sku",
+    ),
+    "suitup": DocumentTemplate(
+        text="Kit: {nombre} - {descripcion} - Productos incluidos: {productos} - Precio: {precio}",
+        metadata=("nombre", "descripcion", "productos", "precio", "imagen"),
+        type="promotional_kit",
+        key="nombre",
+    ),
+}
+
+
+def load_document_templates(path: str) -> None:
+    """
+    Override or add business unit templates from a JSON file shaped like
+    ``{"promo": {"text": ..., "metadata": [...], "type": ..., "key": ...}}``.
+    """
+    for product_type, spec in json.loads(Path(path).read_text(encoding="utf-8")).items():
+        DOCUMENT_TEMPLATES[product_type] = DocumentTemplate(
+            text=spec["text"], metadata=tuple(spec["metadata"]), type=spec["type"], key=spec["key"]
+        )
+
+
+if os.getenv("VECTOR_DOCUMENT_TEMPLATES"):
+    load_document_templates(os.environ["VECTOR_DOCUMENT_TEMPLATES"])
+
+
+def _column_strings(df: pd.DataFrame, column: str) -> pd.Series:
+    """``str(value)`` of every row ('nan' for missing values, '' for a missing column)."""
+    if column not in df.columns:
+        return pd.Series("", index=df.index, dtype=object)
+    values = df[column]
+    return values.astype(str).where(values.notna(), "nan").astype(object)
+
+
+def render_documents(df: pd.DataFrame, template: DocumentTemplate) -> Tuple[List[str], List[Dict]]:
+    """
+    Row keys and documents for a block of catalog rows.
+    
+    Document text is assembled with column-wise string concatenation instead
+    of formatting row by row.
+    """
+    columns: Dict[str, pd.Series] = {}
+    def strings(column: str) -> pd.Series:
+        if column not in columns:
+            columns[column] = _column_strings(df, column)
+        return columns[column]
+    
+    text = pd.Series("", index=df.index, dtype=object)
+    for literal, field, _, _ in Formatter().parse(template.text):
+        if literal:
+            text = text + literal
+        if field is not None:
+            text = text + strings(field)
+    
+    names = list(template.metadata) + ["type"]
+    values = [strings(column).tolist() for column in template.metadata] + [[template.type] * len(df)]
+    documents = [
+        {"text": t, "metadata": dict(zip(names, row))}
+        for t, row in zip(text.tolist(), zip(*values))
+    ]
+    return strings(template.key).tolist(), documents
+
+
+def _frames(csv_path: str, df: Optional[pd.DataFrame], chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """The catalog in blocks of ``chunk_rows`` rows, streamed from the CSV unless ``df`` is given."""
+    if df is not None:
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+        return
+    # All columns as text: per-block type inference would differ between blocks
+    with pd.read_csv(csv_path, chunksize=chunk_rows, dtype=str, encoding="utf-8-sig") as reader:
+        for chunk in reader:
+            chunk.columns = [str(col).strip() for col in chunk.columns]
+            yield chunk
+
+
 class VectorStoreManager:
     """Manages OpenAI vector stores for promotional products search."""
     
     def __init__(self):
-        self.client = OpenAI()
+        self._client: Optional[OpenAI] = None
         self.promo_vector_store_id: Optional[str] = None
         self.suitup_vector_store_id: Optional[str] = None
-        
-    def csv_to_jsonl(self, csv_path: str, jsonl_path: str, product_type: str) -> None:
-        """Convert CSV to JSONL format for vector store ingestion."""
-        df = pd.read_csv(csv_path)
-        
-        with open(jsonl_path, 'w', encoding='utf-8') as f:
-            for _, row in df.iterrows():
-                if product_type == "promo":
-                    # Format promotional products
-                    doc = {
-                        "text": f"Producto: {row.get('nombre', '')} - {row.get('descripcion', '')} - Categoría: {row.get('categorias', '')} - Precio: {row.get('precio', '')} - SKU: {row.get('sku', '')}",
-                        "metadata": {
-                            "sku": str(row.get('sku', '')),
-                            "nombre": str(row.get('nombre', '')),
-                            "descripcion": str(row.get('descripcion', '')),
-                            "categorias": str(row.get('categorias', '')),
-                            "precio": str(row.get('precio', '')),
-                            "imagenes_url": str(row.get('imagenes_url', '')),
-                            "type": "promotional_product"
-                        }
-                    }
-                else:
-                    # Format kits
-                    doc = {
-                        "text": f"Kit: {row.get('nombre', '')} - {row.get('descripcion', '')} - Productos incluidos: {row.get('productos', '')} - Precio: {row.get('precio', '')}",
-                        "metadata": {
-                            "nombre": str(row.get('nombre', '')),
-                            "descripcion": str(row.get('descripcion', '')),
-                            "productos": str(row.get('productos', '')),
-                            "precio": str(row.get('precio', '')),
-                            "imagen": str(row.get('imagen', '')),
-                            "type": "promotional_kit"
-                        }
-                    }
-                f.write(json.dumps(doc, ensure_ascii=False) + '\n')
-        
-        logger.info(f"Converted {len(df)} rows to {jsonl_path}")
-    
-    def create_vector_store(self, name: str, jsonl_path: str) -> str:
-        """Create a vector store and upload the JSONL file."""
-        try:
-            # Try new API first, fall back to old API
-            try:
-                # New API (as of 2024)
-                vector_store = self.client.vector_stores.create(name=name)
-                logger.info(f"Created vector store (new API): {vector_store.id}")
-                
-                # Upload file
-                with open(jsonl_path, 'rb') as f:
-                    file_response = self.client.files.create(
-                        file=f,
-                        purpose='assistants'
-                    )
-                logger.info(f"Uploaded file: {file_response.id}")
-                
-                # Add file to vector store
-                self.client.vector_stores.files.create(
-                    vector_store_id=vector_store.id,
-                    file_id=file_response.id
-                )
-                logger.info(f"File added to vector store: {vector_store.id}")
-                
-            except AttributeError:
-                # Fall back to beta API
-                vector_store = self.client.beta.vector_stores.create(name=name)
-                logger.info(f"Created vector store (beta API): {vector_store.id}")
-                
-                # Upload file
-                with open(jsonl_path, 'rb') as f:
-                    file_response = self.client.files.create(
-                        file=f,
-                        purpose='assistants'
-                    )
-                logger.info(f"Uploaded file: {file_response.id}")
-                
-                # Add file to vector store
-                self.client.beta.vector_stores.files.create(
-                    vector_store_id=vector_store.id,
-                    file_id=file_response.id
-                )
-                logger.info(f"File added to vector store: {vector_store.id}")
-            
-            # Wait for processing (in production, you'd want to poll this)
-            import time
-            time.sleep(5)  # Give it a moment to process
-            
-            return vector_store.id
-            
-        except Exception as e:
-            logger.error(f"Failed to create vector store: {e}")
-            raise
     
-    def setup_vector_stores(self, force_recreate: bool = False) -> tuple[str, str]:
-        """Set up vector stores for promo and suitup catalogs."""
-        current_dir = Path(__file__).parent
-        data_dir = current_dir / "../data"
+    @property
+    def client(self) -> OpenAI:
+        """OpenAI client, created on first use so importing this module stays cheap."""
+        if self._client is None:
+            self._client = OpenAI()
+        return self._client
         
-        promo_csv = data_dir / "promo.csv"
-        suitup_csv = data_dir / "suitup.csv"
+    def csv_to_jsonl(
+        self,
+        csv_path: str,
+        jsonl_path: str,
+        product_type: str,
+        df: Optional[pd.DataFrame] = None,
+        chunk_rows: int = 10000,
+        max_shard_bytes: Optional[int] = None,
+    ) -> List[str]:
+        """
+        Convert a catalog CSV to JSONL documents for vector store ingestion.
         
-        promo_jsonl = current_dir / "promo_products.jsonl"
-        suitup_jsonl = current_dir / "suitup_kits.jsonl"
+        The CSV is streamed ``chunk_rows`` rows at a time (``df``: already
+        loaded catalog, exported in blocks the same way). With
+        ``max_shard_bytes`` the output is split into ``<name>-00000.jsonl``,
+        ``<name>-00001.jsonl``... parts of at most that size (a single larger
+        document still gets its own part), ready for parallel upload.
         
-        # Convert CSVs to JSONL
-        if force_recreate or not promo_jsonl.exists():
-            self.csv_to_jsonl(str(promo_csv), str(promo_jsonl), "promo")
+        Returns:
+            Paths of the files written
+        """
+        template = DOCUMENT_TEMPLATES[product_type]
+        base = Path(jsonl_path)
+        paths: List[str] = []
+        out = None
+        shard_bytes = 0
+        rows = 0
         
-        if force_recreate or not suitup_jsonl.exists():
-            self.csv_to_jsonl(str(suitup_csv), str(suitup_jsonl), "suitup")
+        def open_next():
+            nonlocal out, shard_bytes
+            if out is not None:
+                out.close()
+            path = base if max_shard_bytes is None else base.with_name(f"{base.stem}-{len(paths):05d}{base.suffix}")
+            out = open(path, "wb")
+            paths.append(str(path))
+            shard_bytes = 0
         
-        # Create vector stores
-        if force_recreate or not self.promo_vector_store_id:
-            self.promo_vector_store_id = self.create_vector_store(
-                "Promotional Products",
-                str(promo_jsonl)
-            )
+        try:
+            open_next()
+            for frame in _frames(csv_path, df, chunk_rows):
+                _, documents = render_documents(frame, template)
+                for document in documents:
+                    line = (json.dumps(document, ensure_ascii=False) + "\n").encode("utf-8")
+                    if max_shard_bytes is not None and shard_bytes and shard_bytes + len(line) > max_shard_bytes:
+                        open_next()
+                    out.write(line)
+                    shard_bytes += len(line)
+                rows += len(documents)
+        finally:
+            if out is not None:
+                out.close()
         
-        if force_recreate or not self.suitup_vector_store_id:
-            self.suitup_vector_store_id = self.create_vector_store(
-                "Promotional Kits",
-                str(suitup_jsonl)
-            )
+        logger.info(f"Converted {rows} rows to {len(paths)} file(s) at {jsonl_path}")
+        return paths
+    
+    def catalog_documents(self, df: pd.DataFrame, product_type: str) -> List[Tuple[str, Dict]]:
+        """(row key, document) pairs for a catalog, keyed by its template's key column."""
+        keys, documents = render_documents(df, DOCUMENT_TEMPLATES[product_type])
+        return list(zip(keys, documents))
+    
+    def store_sync(self, product_type: str) -> VectorStoreSync:
+        """Incremental sync for one catalog's vector store, with its manifest under VECTOR_STORE_MANIFEST_DIR."""
+        return VectorStoreSync(
+            self.client,
+            str(Path(VECTOR_STORE_MANIFEST_DIR) / f"{product_type}.json"),
+            VECTOR_STORES[product_type]["name"],
+            rows_per_chunk=VECTOR_STORE_ROWS_PER_CHUNK,
+            max_workers=VECTOR_STORE_UPLOAD_CONCURRENCY,
+        )
+    
+    def setup_vector_stores(
+        self,
+        force_recreate: bool = False,
+        catalogs: Optional[Dict[str, pd.DataFrame]] = None,
+    ) -> tuple[str, str]:
+        """
+        Sync the promo and suitup vector stores with the catalogs (reusing ``catalogs`` frames when given).
+        
+        Stores recorded in the sync manifests are reused and only chunks whose
+        rows changed are uploaded; ``force_recreate`` starts new stores.
+        """
+        catalogs = catalogs or {}
+        store_ids = {}
+        for product_type, spec in VECTOR_STORES.items():
+            df = catalogs.get(product_type)
+            if df is None:
+                df = pd.read_csv(spec["csv_path"])
+            result = self.store_sync(product_type).sync(self.catalog_documents(df, product_type), force_recreate)
+            if result.failed:
+                logger.warning(f"{result.failed} chunks of {spec['name']} failed to sync")
+            store_ids[product_type] = result.vector_store_id
         
+        self.promo_vector_store_id = store_ids["promo"]
+        self.suitup_vector_store_id = store_ids["suitup"]
         return self.promo_vector_store_id, self.suitup_vector_store_id
     
     def search_vector_store(self, vector_store_id: str, query: str, limit: int = 5) -> List[Dict]:
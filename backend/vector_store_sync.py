@@ -0,0 +1,277 @@
+"""
+Incremental OpenAI vector store sync.
+Catalog documents are grouped into stable hash buckets, each uploaded as one JSONL file. A manifest
+of per-row content hashes, file IDs and the vector store ID lets later syncs re-upload only the
+buckets whose rows changed (concurrently), polling ingestion status with backoff.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FORMAT = 1
+
+# Vector store file statuses after which polling stops
+TERMINAL_STATUSES = {"completed", "failed", "cancelled"}
+
+
+def row_hash(document: Dict[str, Any]) -> str:
+    """Content hash of one catalog document."""
+    raw = json.dumps(document, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def bucket_of(key: str, buckets: int) -> int:
+    """Stable bucket for a row key, so editing one row only touches its own chunk."""
+    return int(hashlib.sha1(key.encode("utf-8")).hexdigest()[:8], 16) % buckets
+
+
+def _vector_stores(client: Any) -> Any:
+    # Older SDKs only expose vector stores under the beta namespace
+    return getattr(client, "vector_stores", None) or client.beta.vector_stores
+
+
+@dataclass
+class SyncResult:
+    vector_store_id: str
+    uploaded: int = 0
+    unchanged: int = 0
+    removed: int = 0
+    failed: int = 0
+    changed_rows: int = 0
+
+
+class VectorStoreSync:
+    """
+    Keeps one OpenAI vector store in step with a list of ``(key, document)`` rows.
+
+    Rows are split into ``ceil(rows / rows_per_chunk)`` buckets by a hash of
+    their key (re-bucketed only when the catalog size drifts by more than 2x),
+    and each bucket is one JSONL file in the store. A bucket is re-uploaded
+    only when the hash of its rows changes; the previous file is detached and
+    deleted once the new one is ingested, and a failed upload leaves the old
+    file in place for the next sync to retry. After a re-bucketing, the old
+    files are only deleted once every new chunk is ingested; until then they
+    are kept under ``retired`` in the manifest, so the store never loses rows
+    to a failed upload. The manifest is written after the store is updated.
+
+    ``client`` is an ``openai.OpenAI`` client or any object exposing the same
+    ``files`` and ``vector_stores`` methods (e.g. a local fake in tests).
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        manifest_path: str,
+        name: str,
+        rows_per_chunk: int = 500,
+        max_workers: int = 4,
+        poll_interval: float = 0.5,
+        max_poll_interval: float = 8.0,
+        timeout: float = 600.0,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.client = client
+        self.manifest_path = Path(manifest_path)
+        self.name = name
+        self.rows_per_chunk = rows_per_chunk
+        self.max_workers = max_workers
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.timeout = timeout
+        self._sleep = sleep
+        self._slug = re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-") or "catalog"
+
+    # =========================
+    # Manifest
+    # =========================
+
+    def load_manifest(self) -> Dict[str, Any]:
+        try:
+            manifest = json.loads(self.manifest_path.read_text())
+        except (OSError, json.JSONDecodeError):
+            return {}
+        return manifest if manifest.get("format") == MANIFEST_FORMAT else {}
+
+    def _save_manifest(self, manifest: Dict[str, Any]) -> None:
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_name(self.manifest_path.name + f".tmp-{os.getpid()}")
+        tmp_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=1))
+        os.replace(tmp_path, self.manifest_path)
+
+    # =========================
+    # OpenAI calls
+    # =========================
+
+    def _store_exists(self, store_id: str) -> bool:
+        try:
+            _vector_stores(self.client).retrieve(store_id)
+            return True
+        except Exception as e:
+            if getattr(e, "status_code", None) == 404:
+                return False
+            raise
+
+    def _wait_for_file(self, store_id: str, file_id: str) -> str:
+        """Poll a vector store file until ingestion ends, backing off up to ``max_poll_interval``."""
+        delay = self.poll_interval
+        deadline = time.monotonic() + self.timeout
+        while True:
+            status = _vector_stores(self.client).files.retrieve(file_id=file_id, vector_store_id=store_id).status
+            if status in TERMINAL_STATUSES:
+                return status
+            if time.monotonic() + delay > deadline:
+                return "timeout"
+            self._sleep(delay)
+            delay = min(delay * 2, self.max_poll_interval)
+
+    def _upload_chunk(self, store_id: str, bucket: int, content: bytes) -> Tuple[int, Optional[str], str]:
+        """Upload and attach one chunk; returns (bucket, file id, final status)."""
+        file_id = None
+        try:
+            uploaded = self.client.files.create(
+                file=(f"{self._slug}-{bucket:04d}.jsonl", content), purpose="assistants"
+            )
+            file_id = uploaded.id
+            _vector_stores(self.client).files.create(vector_store_id=store_id, file_id=file_id)
+            status = self._wait_for_file(store_id, file_id)
+        except Exception as e:
+            logger.error(f"Uploading chunk {bucket} of {self.name} failed: {e}")
+            status = "failed"
+        if status != "completed" and file_id is not None:
+            self._remove_file(store_id, file_id)
+        return bucket, file_id, status
+
+    def _remove_file(self, store_id: str, file_id: str) -> None:
+        """Detach a file from the store and delete it (best effort)."""
+        try:
+            _vector_stores(self.client).files.delete(file_id=file_id, vector_store_id=store_id)
+        except Exception as e:
+            logger.warning(f"Could not detach {file_id} from {store_id}: {e}")
+        try:
+            self.client.files.delete(file_id)
+        except Exception as e:
+            logger.warning(f"Could not delete file {file_id}: {e}")
+
+    # =========================
+    # Sync
+    # =========================
+
+    def _bucket_count(self, rows: int, previous: Optional[int]) -> int:
+        ideal = max(1, math.ceil(rows / self.rows_per_chunk))
+        if previous and ideal / 2 <= previous <= ideal * 2:
+            return previous
+        return ideal
+
+    def sync(self, documents: List[Tuple[str, Dict[str, Any]]], force_recreate: bool = False) -> SyncResult:
+        """
+        Bring the vector store in line with ``documents`` (creating it if needed).
+
+        Returns:
+            What was uploaded, kept, removed and failed
+        """
+        started = time.perf_counter()
+        manifest = {} if force_recreate else self.load_manifest()
+        store_id = manifest.get("vector_store_id")
+        if store_id and not self._store_exists(store_id):
+            logger.warning(f"Vector store {store_id} for {self.name} no longer exists, recreating")
+            store_id, manifest = None, {}
+        if not store_id:
+            store_id = _vector_stores(self.client).create(name=self.name).id
+            manifest = {}
+            logger.info(f"Created vector store {store_id} for {self.name}")
+        result = SyncResult(store_id)
+
+        # Unique keys (duplicate SKUs/names get a suffix) and their content hashes
+        rows: Dict[str, str] = {}
+        keyed: List[Tuple[str, Dict[str, Any]]] = []
+        for key, document in documents:
+            unique, n = key, 1
+            while unique in rows:
+                n += 1
+                unique = f"{key}#{n}"
+            rows[unique] = row_hash(document)
+            keyed.append((unique, document))
+        old_rows = manifest.get("rows", {})
+        result.changed_rows = sum(old_rows.get(key) != digest for key, digest in rows.items())
+
+        buckets = self._bucket_count(len(keyed), manifest.get("buckets"))
+        old_chunks: Dict[str, Dict[str, Any]] = manifest.get("chunks", {}) if manifest.get("buckets") == buckets else {}
+        # Files from a different bucketing are all replaced, but only deleted once every new chunk is in
+        retired: List[str] = list(manifest.get("retired", []))
+        if not old_chunks:
+            retired += [c["file_id"] for c in manifest.get("chunks", {}).values()]
+        stale_files: List[str] = []
+
+        grouped: Dict[int, List[Tuple[str, Dict[str, Any]]]] = {}
+        for key, document in keyed:
+            grouped.setdefault(bucket_of(key, buckets), []).append((key, document))
+
+        chunks: Dict[str, Dict[str, Any]] = {}
+        uploads: Dict[int, Tuple[str, bytes]] = {}
+        for bucket, members in sorted(grouped.items()):
+            digest = hashlib.sha1("".join(f"{key}\0{rows[key]}\n" for key, _ in members).encode("utf-8")).hexdigest()
+            previous = old_chunks.get(str(bucket))
+            if previous and previous["hash"] == digest:
+                chunks[str(bucket)] = previous
+                result.unchanged += 1
+                continue
+            content = "".join(json.dumps(document, ensure_ascii=False) + "\n" for _, document in members)
+            uploads[bucket] = (digest, content.encode("utf-8"))
+        # Buckets that no longer have rows
+        for bucket, chunk in old_chunks.items():
+            if int(bucket) not in grouped:
+                stale_files.append(chunk["file_id"])
+
+        if uploads:
+            logger.info(f"Uploading {len(uploads)} of {len(grouped)} chunks for {self.name} ({result.changed_rows} changed rows)")
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="vector-store-upload") as pool:
+                futures = [pool.submit(self._upload_chunk, store_id, b, content) for b, (_, content) in uploads.items()]
+                for future in futures:
+                    bucket, file_id, status = future.result()
+                    previous = old_chunks.get(str(bucket))
+                    if status == "completed":
+                        chunks[str(bucket)] = {"hash": uploads[bucket][0], "file_id": file_id, "rows": len(grouped[bucket])}
+                        result.uploaded += 1
+                        if previous:
+                            stale_files.append(previous["file_id"])
+                    else:
+                        logger.error(f"Chunk {bucket} of {self.name} ended as {status}; will retry next sync")
+                        result.failed += 1
+                        if previous:
+                            chunks[str(bucket)] = previous
+
+        if retired and result.failed:
+            logger.warning(f"Keeping {len(retired)} files of the previous bucketing of {self.name} until every chunk syncs")
+        elif retired:
+            stale_files += retired
+            retired = []
+        for file_id in stale_files:
+            self._remove_file(store_id, file_id)
+        result.removed = len(stale_files)
+
+        self._save_manifest({
+            "format": MANIFEST_FORMAT,
+            "name": self.name,
+            "vector_store_id": store_id,
+            "buckets": buckets,
+            "rows": rows,
+            "chunks": chunks,
+            "retired": retired,
+            "synced_at": time.time(),
+        })
+        logger.info(
+            f"Synced {self.name} to {store_id} in {time.perf_counter() - started:.2f}s: "
+            f"{result.uploaded} uploaded, {result.unchanged} unchanged, {result.removed} removed, {result.failed} failed"
+        )
+        return result
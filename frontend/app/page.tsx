@@ -3,8 +3,8 @@
 import { useEffect, useState } from "react";
 import { AgentPanel } from "@/components/agent-panel";
 import { Chat } from "@/components/Chat";
-import type { Agent, AgentEvent, GuardrailCheck, Message } from "@/lib/types";
-import { callChatAPI } from "@/lib/api";
+import type { Agent, AgentEvent, ChatAction, GuardrailCheck, Message } from "@/lib/types";
+import { callChatAPI, streamChatAPI } from "@/lib/api";
 
 export default function Home() {
   const [messages, setMessages] = useState<Message[]>([]);
@@ -46,7 +46,7 @@ export default function Home() {
   }, []);
 
   // Send a user message
-  const handleSendMessage = async (content: string) => {
+  const handleSendMessage = async (content: string, action?: ChatAction) => {
     const userMsg: Message = {
       id: Date.now().toString(),
       content,
@@ -57,18 +57,52 @@ export default function Home() {
     setMessages((prev) => [...prev, userMsg]);
     setIsLoading(true);
 
-    const data = await callChatAPI(content, conversationId ?? "");
+    // Draft assistant message filled in from streamed text deltas
+    const draftId = "draft-" + Date.now().toString();
+    const liveGuardrails: GuardrailCheck[] = [];
+    const data = await streamChatAPI(content, conversationId ?? "", (kind, payload) => {
+      if (kind === "message_delta") {
+        setIsLoading(false);
+        setMessages((prev) => {
+          const draft = prev.find((m) => m.id === draftId);
+          if (draft) {
+            return prev.map((m) =>
+              m.id === draftId ? { ...m, content: m.content + payload.content } : m
+            );
+          }
+          return [
+            ...prev,
+            {
+              id: draftId,
+              content: payload.content,
+              role: "assistant",
+              agent: payload.agent,
+              timestamp: new Date(),
+            },
+          ];
+        });
+      } else if (kind === "event") {
+        if (payload.type === "guardrail_tripped") {
+          // The message was rejected: drop the streamed draft, the refusal comes with the response
+          setMessages((prev) => prev.filter((m) => m.id !== draftId));
+        }
+        setEvents((prev) => [...prev, { ...payload, timestamp: payload.timestamp ?? Date.now() }]);
+      } else if (kind === "guardrail") {
+        liveGuardrails.push(payload);
+        setGuardrails([...liveGuardrails]);
+      }
+    }, action);
+
+    // Final response replaces the draft with the parsed messages
+    setMessages((prev) => prev.filter((m) => m.id !== draftId));
+    if (!data) {
+      setIsLoading(false);
+      return;
+    }
 
     if (!conversationId) setConversationId(data.conversation_id);
     setCurrentAgent(data.current_agent);
     setContext(data.context);
-    if (data.events) {
-      const stamped = data.events.map((e: any) => ({
-        ...e,
-        timestamp: e.timestamp ?? Date.now(),
-      }));
-      setEvents((prev) => [...prev, ...stamped]);
-    }
     if (data.agents) setAgents(data.agents);
     // Update guardrails state
     if (data.guardrails) setGuardrails(data.guardrails);
@@ -80,6 +114,8 @@ export default function Home() {
         role: "assistant",
         agent: m.agent,
         timestamp: new Date(),
+        type: m.type,
+        card: m.card,
       }));
       setMessages((prev) => [...prev, ...responses]);
     }
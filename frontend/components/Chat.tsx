@@ -1,13 +1,14 @@
 "use client";
 
 import React, { useState, useRef, useEffect, useCallback } from "react";
-import type { Message } from "@/lib/types";
+import type { ChatAction, Message } from "@/lib/types";
 import ReactMarkdown from "react-markdown";
 import { BusinessUnitSelector } from "./business-unit-selector";
+import { ResultCardView } from "./result-card";
 
 interface ChatProps {
   messages: Message[];
-  onSendMessage: (message: string) => void;
+  onSendMessage: (message: string, action?: ChatAction) => void;
   /** Whether waiting for assistant response */
   isLoading?: boolean;
 }
@@ -45,7 +46,11 @@ export function Chat({ messages, onSendMessage, isLoading }: ChatProps) {
     (unit: "promoselect" | "suitup") => {
       setSelectedBusinessUnit(unit);
       setShowBusinessSelector(false);
-      onSendMessage(unit === "promoselect" ? "Promoselect" : "SuitUp");
+      // The action lets the server route directly to the specialist agent
+      onSendMessage(unit === "promoselect" ? "Promoselect" : "SuitUp", {
+        type: "select_business_unit",
+        value: unit,
+      });
     },
     [onSendMessage]
   );
@@ -71,6 +76,15 @@ export function Chat({ messages, onSendMessage, isLoading }: ChatProps) {
       <div className="flex-1 overflow-y-auto min-h-0 md:px-4 pt-4 pb-20">
         {messages.map((msg, idx) => {
           if (msg.content === "DISPLAY_BUSINESS_SELECTOR") return null; // Skip rendering marker message
+          if (msg.type === "card" && msg.card) {
+            return (
+              <div key={idx} className="flex mb-5 text-sm justify-start">
+                <div className="mr-4 md:mr-24 max-w-[80%]">
+                  <ResultCardView card={msg.card} />
+                </div>
+              </div>
+            );
+          }
           return (
             <div
               key={idx}
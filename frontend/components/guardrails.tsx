@@ -78,6 +78,11 @@ export function Guardrails({ guardrails, inputGuardrails }: GuardrailsProps) {
                     Failed
                   </Badge>
                 )}
+                {gr.input && gr.tier && (
+                  <span className="mt-2 ml-2 self-center font-light text-zinc-400">
+                    via {gr.tier}
+                  </span>
+                )}
               </div>
             </CardContent>
           </Card>
@@ -0,0 +1,37 @@
+"use client";
+
+import type { ResultCard } from "@/lib/types";
+
+interface ResultCardViewProps {
+  card: ResultCard;
+}
+
+// Product or kit returned by a search tool, rendered without going through the model
+export function ResultCardView({ card }: ResultCardViewProps) {
+  const image = card.images[0];
+  return (
+    <div className="flex gap-3 rounded-[16px] rounded-bl-[4px] border border-gray-200 bg-white p-3 shadow-sm">
+      {image && (
+        <img
+          src={image}
+          alt={card.name}
+          className="h-24 w-24 flex-none rounded-md object-cover"
+          loading="lazy"
+        />
+      )}
+      <div className="flex min-w-0 flex-col gap-1">
+        <div className="font-medium text-zinc-900">{card.name}</div>
+        {card.description && (
+          <div className="text-xs text-zinc-600">{card.description}</div>
+        )}
+        {card.products && (
+          <div className="text-xs text-zinc-500">Incluye: {card.products}</div>
+        )}
+        <div className="text-sm font-semibold text-zinc-900">
+          {card.price} {card.currency}
+        </div>
+        {card.sku && <div className="text-xs text-zinc-400">SKU {card.sku}</div>}
+      </div>
+    </div>
+  );
+}
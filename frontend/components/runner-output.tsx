@@ -9,6 +9,7 @@ import {
   WrenchIcon,
   RefreshCw,
   MessageSquareMore,
+  ShieldAlert,
 } from "lucide-react";
 import { PanelSection } from "./panel-section";
 
@@ -31,6 +32,8 @@ function EventIcon({ type }: { type: string }) {
       return <WrenchIcon className={className} />;
     case "context_update":
       return <RefreshCw className={className} />;
+    case "guardrail_tripped":
+      return <ShieldAlert className={className} />;
     default:
       return null;
   }
@@ -1,3 +1,5 @@
+import type { ChatAction } from "./types";
+
 // Helper to call the server
 export async function callChatAPI(message: string, conversationId: string) {
   try {
@@ -13,3 +15,51 @@ export async function callChatAPI(message: string, conversationId: string) {
     return null;
   }
 }
+
+// Stream a chat turn from /chat/stream (server-sent events).
+// onEvent receives every event (message_delta, message, event, guardrail);
+// resolves with the final ChatResponse carried by the "done" event.
+export async function streamChatAPI(
+  message: string,
+  conversationId: string,
+  onEvent: (kind: string, data: any) => void,
+  action?: ChatAction
+) {
+  try {
+    const res = await fetch("/chat/stream", {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ conversation_id: conversationId, message, action }),
+    });
+    if (!res.ok || !res.body) throw new Error(`Chat API error: ${res.status}`);
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    let final: any = null;
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      let boundary;
+      while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+        const chunk = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        let kind = "message";
+        let data = "";
+        for (const line of chunk.split("\n")) {
+          if (line.startsWith("event: ")) kind = line.slice(7);
+          else if (line.startsWith("data: ")) data += line.slice(6);
+        }
+        if (!data) continue;
+        const parsed = JSON.parse(data);
+        if (kind === "error") throw new Error(parsed.detail);
+        if (kind === "done") final = parsed;
+        else onEvent(kind, parsed);
+      }
+    }
+    return final;
+  } catch (err) {
+    console.error("Error streaming message:", err);
+    return null;
+  }
+}
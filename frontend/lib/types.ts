@@ -1,9 +1,30 @@
+/** Search result card sent by the server alongside the agent's text */
+export interface ResultCard {
+  kind: "product" | "kit"
+  sku?: string
+  name: string
+  description: string
+  products?: string
+  price: string
+  currency: string
+  images: string[]
+}
+
 export interface Message {
   id: string
   content: string
   role: "user" | "assistant"
   agent?: string
   timestamp: Date
+  /** "card" messages carry a ResultCard; content is its plain-text fallback */
+  type?: "text" | "card"
+  card?: ResultCard
+}
+
+/** Structured UI action routed by the server without a model call */
+export interface ChatAction {
+  type: "select_business_unit"
+  value: "promoselect" | "suitup"
 }
 
 export interface Agent {
@@ -15,7 +36,15 @@ export interface Agent {
   input_guardrails: string[]
 }
 
-export type EventType = "message" | "handoff" | "tool_call" | "tool_output" | "context_update"
+export type EventType =
+  | "message"
+  | "message_delta"
+  | "card"
+  | "handoff"
+  | "tool_call"
+  | "tool_output"
+  | "context_update"
+  | "guardrail_tripped"
 
 export interface AgentEvent {
   id: string
@@ -32,6 +61,9 @@ export interface AgentEvent {
     context_key?: string
     context_value?: any
     changes?: Record<string, any>
+    card?: ResultCard
+    guardrail?: string
+    discard_draft?: boolean
   }
 }
 
@@ -42,5 +74,7 @@ export interface GuardrailCheck {
   reasoning: string
   passed: boolean
   timestamp: Date
+  /** Which guardrail tier decided: fast_path, cache, local or llm */
+  tier?: string
 }
 
@@ -3,11 +3,16 @@ const nextConfig = {
   devIndicators: false,
   // Proxy /chat requests to the backend server
   async rewrites() {
+    // Use environment variable for backend URL, fallback to localhost for development
+    const chatUrl = process.env.BACKEND_URL || "http://127.0.0.1:8000/chat";
     return [
       {
         source: "/chat",
-        // Use environment variable for backend URL, fallback to localhost for development
-        destination: process.env.BACKEND_URL || "http://127.0.0.1:8000/chat",
+        destination: chatUrl,
+      },
+      {
+        source: "/chat/stream",
+        destination: `${chatUrl}/stream`,
       },
     ];
   },